@@ -0,0 +1,337 @@
+import sqlite3
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from database_handler import DatabaseHandler
+from data_processor import DataProcessor
+from chart_generator import ChartGenerator
+from compliance import ComplianceEngine
+from distortion import (REPORTED_THD_TABLES, compute_distortion, get_distortion_info, is_distortion_table,
+                        unknown_distortion)
+from harmonic_matrix import build_order_matrix
+from long_format_adapter import LongFormatAdapter
+from notifier import Notifier, get_notifier
+from progress_estimate import TABLE_OVERHEAD_ROWS
+from resonance import collect_resonances, find_resonances
+from schema_catalog import get_table_classification
+from waveform_fft import compute_waveform_spectra
+
+# Part of the chart cache key: bump whenever the charts produced for the same database change
+PIPELINE_VERSION = "2"
+
+class AnalysisPipeline:
+    """Turn the tables of a harmonic database into chart entries, one table at a time"""
+    
+    def __init__(self, db_path: str, data_processor: Optional[DataProcessor] = None,
+                 chart_generator: Optional[ChartGenerator] = None, chart_height: int = 300,
+                 notifier: Optional[Notifier] = None):
+        self.notifier = notifier or get_notifier()
+        self.db_handler = DatabaseHandler(db_path, notifier)
+        self.data_processor = data_processor or DataProcessor(notifier)
+        self.chart_generator = chart_generator or ChartGenerator(notifier)
+        self.chart_height = chart_height
+        self._demand_currents = None  # ID -> demand current (I_L) from HALimits, read once
+        self._compliance_engine = None  # limits of the study (IHAStudyCaseAlert), read once
+        self._compliance_loaded = False
+        self._fundamental_frequency = None  # Hz, from SystemFrequency or IHASource, read once
+        self._waveform_spectra = None  # waveform table -> (FFT spectra, missing spectrum kinds), computed once
+    
+    def open(self) -> bool:
+        """Connect to the database"""
+        return self.db_handler.connect()
+    
+    def close(self):
+        """Close the database connection"""
+        self.db_handler.disconnect()
+    
+    def get_table_plan(self) -> List[str]:
+        """Get the tables to process in display order"""
+        return list(self._get_classification()['plan'])
+    
+    def get_table_weights(self) -> Dict[str, int]:
+        """Estimate the work of every planned table from its row count, without reading any rows"""
+        classification = self._get_classification()
+        catalog = self.db_handler.get_catalog()
+        weights = {}
+        for table_name in classification['plan']:
+            if classification['tables'].get(table_name, {'handler': 'skip'})['handler'] == 'skip':
+                weights[table_name] = 1  # never read
+            else:
+                weights[table_name] = catalog.get(table_name, {}).get('row_estimate', 0) + TABLE_OVERHEAD_ROWS
+        return weights
+    
+    def process_table(self, table_name: str) -> List[Dict]:
+        """Build the chart entries of one table; an empty list means the table is skipped"""
+        # Handler decided from the schema alone: tables with nothing to plot are never read
+        entry = self._get_classification()['tables'].get(table_name, {'handler': 'skip'})
+        if entry['handler'] == 'skip':
+            return []
+        
+        # Long-format tables (.HA1S tabulations) hold one spectrum per ID
+        if entry['handler'] == 'long_format':
+            return self._process_long_format_table(table_name, entry['adapter'])
+        
+        # Read table data; tables too large to plot in full are streamed through a min-max decimator,
+        # so memory follows the chunk and the plotted points instead of the table
+        row_estimate = self.db_handler.get_catalog().get(table_name, {}).get('row_estimate', 0)
+        if row_estimate > self.data_processor.MAX_POINTS:
+            df = self.db_handler.read_table_decimated(table_name, self.data_processor.MAX_POINTS)
+        else:
+            df = self.db_handler.read_table(table_name)
+        if df is None:
+            return []
+        
+        # Prepare data for plotting
+        df_prepared, is_valid = self.data_processor.prepare_dataframe_for_plotting(df, table_name)
+        if not is_valid:
+            return []
+        
+        chart_type = entry['chart_type']
+        chart = self._build_chart(df_prepared, table_name, chart_type)
+        charts = [chart] if chart is not None else []
+        if chart_type == 'waveform':
+            charts += self._build_waveform_spectrum_charts(table_name)
+        return charts
+    
+    def _get_classification(self) -> Dict:
+        """Get the handler of every table, cached across files sharing the same schema"""
+        return get_table_classification(*self.db_handler.get_schema(), self.data_processor)
+    
+    def _process_long_format_table(self, table_name: str, adapter: LongFormatAdapter) -> List[Dict]:
+        """Build one harmonic order spectrum per ID of a long-format table"""
+        try:
+            ids, orders, values, series_keys = adapter.read_columns(self.db_handler.connection, table_name)
+        except sqlite3.Error as e:
+            self.notifier.warning(f"Error reading table {table_name}: {e}")
+            return []
+        
+        series = adapter.split_series(ids, orders, values)
+        if adapter.chart_type == 'frequency_scan':
+            return self._process_frequency_scan(table_name, ids, orders, values, series)
+        
+        # THD/TDD of every series in one batched pass, for tables whose values are % of the fundamental
+        series_ids = [series_id for series_id, _, _ in series]
+        if is_distortion_table(table_name):
+            distortion = self._compute_table_distortion(ids, orders, values, [series_keys[series_id]
+                                                                              for series_id in series_ids])
+        else:
+            distortion = unknown_distortion(series_ids)
+            reported_thd = self._read_reported_thd(table_name)
+            if reported_thd:
+                # The study's own THD (e.g. VTHDReport for VHDReport), checked against the limits like a computed one
+                distortion['thd'] = np.array([reported_thd.get(series_keys[series_id]['element'], np.nan)
+                                              for series_id in series_ids], dtype=float)
+        
+        # Limit checks of every row and series in one pass; only flagged rows become violation entries
+        compliance = None
+        engine = self._get_compliance_engine()
+        if engine is not None:
+            compliance = engine.evaluate(table_name, [series_keys[series_id]['element'] for series_id in series_ids],
+                                         ids, orders, values, distortion['thd'])
+        violations = (ComplianceEngine.collect_violations(compliance, table_name, distortion['ids'], orders, values,
+                                                          distortion['thd'])
+                      if compliance is not None else None)
+        
+        charts = []
+        if len(series) > 1:
+            # Whole-network view first: every ID against every order in one heatmap
+            heatmap = self._build_heatmap_chart(table_name, adapter, ids, orders, values)
+            if heatmap is not None:
+                thd = distortion['thd']
+                if np.isfinite(thd).any():
+                    worst = int(np.nanargmax(thd))
+                    heatmap['info'].update(max_thd=float(thd[worst]), max_thd_id=str(distortion['ids'][worst]))
+                if violations is not None:
+                    # The whole table's list, so IDs without a plottable spectrum still reach the report
+                    heatmap['info']['violations'] = [entry for entries in violations for entry in entries]
+                    heatmap['info']['violating_ids'] = sum(1 for entries in violations if entries)
+                charts.append(heatmap)
+        
+        for index, (series_id, x, y) in enumerate(series):
+            df = pd.DataFrame({'ValueX': x, 'ValueY': y})
+            info = get_distortion_info(distortion, index)
+            if compliance is not None:
+                info.update(ComplianceEngine.get_series_limits(compliance, index), violations=violations[index])
+            chart = self._build_chart(df, adapter.get_series_name(table_name, series_id), 'spectrum_order', info)
+            if chart is not None:
+                if compliance is not None:
+                    self.chart_generator.add_limit_lines(chart['figure'], info)
+                charts.append(chart)
+        return charts
+    
+    def _process_frequency_scan(self, table_name: str, ids: np.ndarray, frequencies: np.ndarray,
+                                impedances: np.ndarray, series: List) -> List[Dict]:
+        """Build one impedance vs frequency chart per bus, with its resonances marked"""
+        # Peaks of every bus found in one pass over the whole scan
+        series_ids = [series_id for series_id, _, _ in series]
+        resonances = collect_resonances(find_resonances(ids, frequencies, impedances), table_name, series_ids,
+                                        self._get_fundamental_frequency())
+        
+        charts = []
+        for index, (series_id, x, y) in enumerate(series):
+            df = pd.DataFrame({'ValueX': x, 'ValueY': y})
+            chart = self._build_chart(df, LongFormatAdapter.get_series_name(table_name, series_id), 'frequency_scan',
+                                      {'resonances': resonances[index]})
+            if chart is not None:
+                self.chart_generator.add_resonance_markers(chart['figure'], resonances[index])
+                charts.append(chart)
+        return charts
+    
+    def _get_fundamental_frequency(self) -> Optional[float]:
+        """Get the system frequency from SystemFrequency (.hfpdb) or IHASource (.HA1S), when the file has one"""
+        if self._fundamental_frequency is None:
+            self._fundamental_frequency = 0.0
+            for table_name, column in (("SystemFrequency", "Frequency"), ("IHASource", "FundamentalFrequency")):
+                if column not in self.db_handler.get_column_names(table_name):
+                    continue
+                try:
+                    row = self.db_handler.connection.execute(
+                        f'SELECT MAX("{column}") FROM "{table_name}" WHERE "{column}" > 0'
+                    ).fetchone()
+                except sqlite3.Error:
+                    continue
+                if row and row[0]:
+                    self._fundamental_frequency = float(row[0])
+                    break
+        return self._fundamental_frequency or None
+    
+    def _build_waveform_spectrum_charts(self, table_name: str) -> List[Dict]:
+        """Build the FFT spectra of a waveform whose Spectrum_Hz/Spectrum_Order tables are missing"""
+        spectra, missing = self._get_waveform_spectra().get(table_name, (None, ()))
+        if spectra is None:
+            return []
+        
+        charts = []
+        if 'hz' in missing:
+            df = pd.DataFrame({'ValueX': spectra['hz'], 'ValueY': spectra['hz_amplitude']})
+            charts.append(self._build_chart(df, f"{table_name} · FFT Hz", 'fft_hz'))
+        if 'order' in missing:
+            df = pd.DataFrame({'ValueX': spectra['orders'], 'ValueY': spectra['order_amplitude']})
+            charts.append(self._build_chart(df, f"{table_name} · FFT Orden", 'fft_order'))
+        return [chart for chart in charts if chart is not None]
+    
+    def _get_waveform_spectra(self) -> Dict[str, Tuple[Dict, set]]:
+        """Compute the spectra of every waveform lacking stored ones, batched on the first waveform processed"""
+        if self._waveform_spectra is None:
+            table_names = self.db_handler.get_table_names() or []
+            kinds = defaultdict(set)
+            for name in table_names:
+                group = self.data_processor.get_table_group(name)
+                if group is not None:
+                    kinds[group[0]].add(group[1])
+            
+            # Waveform table -> spectrum kinds its group does not store
+            missing = {}
+            for name in table_names:
+                group = self.data_processor.get_table_group(name)
+                if group is not None and group[1] == 'waveform':
+                    absent = {'hz', 'order'} - kinds[group[0]]
+                    if absent:
+                        missing[name] = absent
+            
+            waveforms = {}
+            for name in missing:
+                waveform = self._read_waveform(name)
+                if waveform is not None:
+                    waveforms[name] = waveform
+            
+            spectra = compute_waveform_spectra(waveforms, self._get_fundamental_frequency())
+            self._waveform_spectra = {name: (spectrum, missing[name]) for name, spectrum in spectra.items()}
+        return self._waveform_spectra
+    
+    def _read_waveform(self, table_name: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Get the full-resolution (time, amplitude) arrays of a waveform table, sorted by time"""
+        # Not prepared for plotting: its sampling would thin out the high harmonics
+        columns = self.db_handler.read_xy_columns(table_name)
+        if columns is None:
+            return None
+        
+        t, y = columns
+        valid = np.isfinite(t) & np.isfinite(y)
+        t, first = np.unique(t[valid], return_index=True)  # sorted, repeated instants dropped
+        return t, y[valid][first]
+    
+    def _get_compliance_engine(self) -> Optional[ComplianceEngine]:
+        """Get the limit checker of the study, built once from its alert settings"""
+        if not self._compliance_loaded:
+            self._compliance_engine = ComplianceEngine.from_connection(self.db_handler.connection)
+            self._compliance_loaded = True
+        return self._compliance_engine
+    
+    def _compute_table_distortion(self, ids: np.ndarray, orders: np.ndarray, values: np.ndarray,
+                                  series_keys: List[Dict]) -> Dict[str, np.ndarray]:
+        """THD of every series of a table, plus TDD where fundamental and demand currents are known"""
+        fundamental_amps = demand_amps = None
+        demand_currents = self._get_demand_currents()
+        if demand_currents and any('FundA' in keys for keys in series_keys):
+            # The fundamental current is part of each series' key, no extra query needed
+            fundamental_amps = np.array([keys.get('FundA') or np.nan for keys in series_keys], dtype=float)
+            demand_amps = np.array([demand_currents.get(keys['element'], np.nan) for keys in series_keys],
+                                   dtype=float)
+        
+        return compute_distortion(ids, orders, values, fundamental_amps, demand_amps)
+    
+    def _read_reported_thd(self, table_name: str) -> Dict[str, float]:
+        """Get the THD the study reports for the elements of a table without a computable one"""
+        if table_name not in REPORTED_THD_TABLES:
+            return {}
+        source_table, id_column, thd_column = REPORTED_THD_TABLES[table_name]
+        if not {id_column, thd_column}.issubset(self.db_handler.get_column_names(source_table)):
+            return {}
+        try:
+            cursor = self.db_handler.connection.execute(f'SELECT "{id_column}", "{thd_column}" FROM "{source_table}"')
+            return {str(element).strip(): float(thd) for element, thd in cursor.fetchall() if thd is not None}
+        except sqlite3.Error as e:
+            self.notifier.warning(f"Error reading {source_table}: {e}")
+            return {}
+    
+    def _get_demand_currents(self) -> Dict[str, float]:
+        """Get the demand current (I_L) of each branch from HALimits, when the study has it"""
+        if self._demand_currents is None:
+            self._demand_currents = {}
+            if {"ID", "FundA"}.issubset(self.db_handler.get_column_names("HALimits")):
+                try:
+                    cursor = self.db_handler.connection.execute('SELECT "ID", "FundA" FROM "HALimits"')
+                    self._demand_currents = {str(series_id).strip(): float(amps)
+                                             for series_id, amps in cursor.fetchall() if amps}
+                except sqlite3.Error as e:
+                    self.notifier.warning(f"Error reading HALimits: {e}")
+        return self._demand_currents
+    
+    def _build_heatmap_chart(self, table_name: str, adapter: LongFormatAdapter, ids: np.ndarray,
+                             orders: np.ndarray, values: np.ndarray) -> Optional[Dict]:
+        row_labels, col_orders, matrix = build_order_matrix(ids, orders, values)
+        try:
+            figure = self.chart_generator.create_heatmap_chart(row_labels, col_orders, matrix, table_name,
+                                                               adapter.value_label, height=self.chart_height)
+        except Exception as e:
+            self.notifier.error(f"❌ Error creando mapa de calor para {table_name}: {e}")
+            return None
+        
+        return {
+            'table_name': table_name,
+            'figure': figure,
+            'type': 'heatmap',
+            'info': self.chart_generator.get_matrix_info(row_labels, col_orders, matrix)
+        }
+    
+    def _build_chart(self, df: pd.DataFrame, chart_name: str, chart_type: str,
+                     extra_info: Optional[Dict] = None) -> Optional[Dict]:
+        # Create chart with grid height for better performance
+        figure = self.chart_generator.create_chart(df, chart_name, chart_type, height=self.chart_height)
+        if figure is None:
+            return None
+        
+        if extra_info is None:
+            info = self.chart_generator.get_chart_info(df, chart_type)
+        else:
+            # Already computed for the whole table
+            info = {**self.chart_generator.get_chart_info(df), **extra_info}
+        
+        return {
+            'table_name': chart_name,
+            'figure': figure,
+            'type': chart_type,
+            'info': info
+        }
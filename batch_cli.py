@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Headless batch mode for the Harmonic Spectrum Analyzer
+
+Processes .hfpdb/.HA1S databases into HTML reports without Streamlit,
+running several files in parallel worker processes.
+
+Usage:
+    python batch_cli.py STUDY_DIR [-o REPORTS_DIR] [-j 4] [--recursive]
+    python batch_cli.py case1.hfpdb case2.HA1S -o reports/
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+from progress_estimate import ProgressEstimate, format_eta, largest_first
+
+SUPPORTED_EXTENSIONS = {'.hfpdb', '.ha1s'}
+
+logger = logging.getLogger("harmonic.batch")
+
+def collect_input_files(paths: List[str], recursive: bool = False) -> List[Path]:
+    """Expand files and directories into the list of databases to process"""
+    files = []
+    for raw_path in paths:
+        path = Path(raw_path)
+        if path.is_dir():
+            candidates = path.rglob('*') if recursive else path.iterdir()
+            files.extend(sorted(p for p in candidates if p.is_file() and p.suffix.lower() in SUPPORTED_EXTENSIONS))
+        elif path.is_file():
+            files.append(path)
+        else:
+            logger.warning("Skipping %s: not found", raw_path)
+    
+    # Keep the first occurrence of each file
+    unique_files = []
+    seen = set()
+    for path in files:
+        resolved = path.resolve()
+        if resolved not in seen:
+            seen.add(resolved)
+            unique_files.append(path)
+    return unique_files
+
+def get_report_paths(files: List[Path], output_dir: Optional[Path]) -> List[Path]:
+    """Report file for each database: <name>_reporte.html next to it or in output_dir, never shared"""
+    reports = []
+    taken = set()
+    for db_path in files:
+        target_dir = output_dir if output_dir is not None else db_path.parent
+        extension = db_path.suffix.lstrip('.')
+        
+        # Same stem with another extension, then same file name in another folder, then a counter
+        names = [db_path.stem, f"{db_path.stem}_{extension}"]
+        if db_path.resolve().parent.name:
+            names.append(f"{db_path.resolve().parent.name}_{db_path.stem}_{extension}")
+        names.extend(f"{names[-1]}_{count}" for count in range(2, len(files) + 2))
+        
+        for name in names:
+            report_path = target_dir / f"{name}_reporte.html"
+            # Compared case-insensitively: a.hfpdb and A.hfpdb clash on Windows and macOS
+            key = str(report_path.resolve()).lower()
+            if key not in taken:
+                break
+        taken.add(key)
+        reports.append(report_path)
+    return reports
+
+def configure_logging(level: int, log_file: Optional[str] = None):
+    """Log to stderr (and optionally a file) with the process name of each worker"""
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    logging.basicConfig(
+        level=level,
+        format="%(asctime)s %(levelname)-7s [%(processName)s] %(message)s",
+        handlers=handlers,
+        force=True
+    )
+
+def init_worker(log_level: int, log_file: Optional[str] = None):
+    """Route the processing modules' messages to logging inside a worker process"""
+    from notifier import LoggingNotifier, set_notifier
+    configure_logging(logging.INFO, log_file)
+    logging.getLogger("harmonic.pipeline").setLevel(log_level)
+    set_notifier(LoggingNotifier("harmonic.pipeline"))
+
+def process_database_file(db_path: str, report_path: str, background_color: str = "#ffffff") -> Dict:
+    """Analyze one database and write its HTML report"""
+    from analysis_pipeline import AnalysisPipeline
+    from report_generator import ReportGenerator
+    
+    start = time.perf_counter()
+    result = {
+        'input': db_path,
+        'output': report_path,
+        'charts': 0,
+        'skipped': 0,
+        'seconds': 0.0,
+        'ok': False,
+        'error': None
+    }
+    
+    pipeline = AnalysisPipeline(db_path)
+    try:
+        if not pipeline.open():
+            raise RuntimeError("could not connect to the database")
+        
+        tables = pipeline.get_table_plan()
+        if not tables:
+            raise RuntimeError("no tables found in the database")
+        
+        charts_data = []
+        for table_name in tables:
+            charts = pipeline.process_table(table_name)
+            if not charts:
+                result['skipped'] += 1
+            else:
+                charts_data.extend(charts)
+        result['charts'] = len(charts_data)
+        
+        if not charts_data:
+            raise RuntimeError("no plottable tables found")
+        
+        db_name = Path(db_path).name
+        if not ReportGenerator().generate_html_report(charts_data, db_name, report_path, background_color):
+            raise RuntimeError("report generation failed")
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = str(e)
+    finally:
+        pipeline.close()
+        result['seconds'] = time.perf_counter() - start
+    
+    return result
+
+def estimate_database_work(db_path: str) -> int:
+    """Estimated rows to process in a database, from its schema and row estimates alone"""
+    from analysis_pipeline import AnalysisPipeline
+    
+    pipeline = AnalysisPipeline(db_path)
+    try:
+        if pipeline.open():
+            return sum(pipeline.get_table_weights().values())
+    except Exception as e:
+        logger.debug("Could not estimate %s: %s", db_path, e)
+    finally:
+        pipeline.close()
+    return 0  # unreadable files fail fast in their worker, so they go last
+
+def run_batch(files: List[Path], output_dir: Optional[Path], jobs: int, background_color: str,
+              log_level: int, log_file: Optional[str] = None) -> List[Dict]:
+    """Process every file, in parallel when more than one job is allowed"""
+    tasks = [(str(path), str(report_path)) for path, report_path in zip(files, get_report_paths(files, output_dir))]
+    results = []
+    
+    # Largest files first: a big file started last would keep one worker busy after the rest finish
+    weights = {db_path: estimate_database_work(db_path) for db_path, _ in tasks}
+    report_paths = dict(tasks)
+    tasks = [(db_path, report_paths[db_path]) for db_path in largest_first(weights)]
+    estimate = ProgressEstimate(weights)
+    
+    if jobs <= 1 or len(tasks) == 1:
+        init_worker(log_level, log_file)
+        for db_path, report_path in tasks:
+            result = process_database_file(db_path, report_path, background_color)
+            estimate.complete(db_path)
+            log_result(result, estimate)
+            results.append(result)
+        return results
+    
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                             initargs=(log_level, log_file)) as executor:
+        futures = {
+            executor.submit(process_database_file, db_path, report_path, background_color): db_path
+            for db_path, report_path in tasks
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:  # the worker process itself died
+                result = {'input': futures[future], 'output': None, 'charts': 0, 'skipped': 0,
+                          'seconds': 0.0, 'ok': False, 'error': str(e)}
+            estimate.complete(futures[future])
+            log_result(result, estimate)
+            results.append(result)
+    return results
+
+def log_result(result: Dict, estimate: Optional[ProgressEstimate] = None):
+    if result['ok']:
+        logger.info("✅ %s -> %s (%d charts, %d skipped, %.1fs)", result['input'], result['output'],
+                    result['charts'], result['skipped'], result['seconds'])
+    else:
+        logger.error("❌ %s: %s", result['input'], result['error'])
+    
+    if estimate is not None and estimate.fraction < 1.0:
+        eta_seconds = estimate.eta_seconds()
+        logger.info("Progress %.0f%%%s", estimate.fraction * 100,
+                    f", {format_eta(eta_seconds)} left" if eta_seconds is not None else "")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Generate HTML harmonic reports from .hfpdb/.HA1S databases without the web UI"
+    )
+    parser.add_argument('paths', nargs='+', help="Database files and/or directories containing them")
+    parser.add_argument('-o', '--output-dir', help="Directory for the reports (default: next to each database)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Number of files processed in parallel (default: CPU count)")
+    parser.add_argument('-r', '--recursive', action='store_true', help="Search directories recursively")
+    parser.add_argument('--background', default="#ffffff", help="Report background color")
+    parser.add_argument('--log-file', help="Also write the log to this file")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Log every message of the processing modules")
+    args = parser.parse_args(argv)
+    
+    # Per-table messages of the processing modules are only shown with --verbose
+    log_level = logging.INFO if args.verbose else logging.WARNING
+    configure_logging(logging.INFO, args.log_file)
+    
+    files = collect_input_files(args.paths, args.recursive)
+    if not files:
+        logger.error("No .hfpdb or .HA1S files found")
+        return 2
+    
+    output_dir = Path(args.output_dir) if args.output_dir else None
+    if output_dir is not None:
+        output_dir.mkdir(parents=True, exist_ok=True)
+    
+    jobs = max(1, min(args.jobs, len(files)))
+    logger.info("Processing %d file(s) with %d worker(s)", len(files), jobs)
+    
+    start = time.perf_counter()
+    results = run_batch(files, output_dir, jobs, args.background, log_level, args.log_file)
+    failed = [result for result in results if not result['ok']]
+    
+    logger.info("Done in %.1fs: %d report(s) written, %d failed",
+                time.perf_counter() - start, len(results) - len(failed), len(failed))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark for session chart serialization
+
+Compares the original Plotly to_json/from_json path with the chart
+serializer codecs on a synthetic session of 300 charts.
+
+Usage:
+    python benchmark_serialization.py [--charts 300] [--repeat 3]
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+from chart_generator import ChartGenerator
+from chart_serializer import get_chart_serializer, orjson
+from session_manager import SessionManager
+
+def build_session_charts(chart_count: int) -> list:
+    """Build a synthetic session mixing the chart types produced by the analyzer"""
+    generator = ChartGenerator()
+    rng = np.random.default_rng(42)
+    chart_types = ['waveform', 'spectrum_hz', 'spectrum_order', 'generic']
+    charts_data = []
+    
+    for i in range(chart_count):
+        chart_type = chart_types[i % len(chart_types)]
+        if chart_type == 'waveform':
+            x = np.linspace(0, 0.04, 2000)
+            y = 100 * np.sin(2 * np.pi * 50 * x) + rng.normal(0, 2, x.size)
+        elif chart_type == 'spectrum_hz':
+            x = np.arange(1, 51) * 50.0
+            y = rng.uniform(0, 10, x.size)
+        elif chart_type == 'spectrum_order':
+            x = np.arange(1, 51, dtype=float)
+            y = rng.uniform(0, 10, x.size)
+        else:
+            x = np.arange(500, dtype=float)
+            y = rng.normal(0, 1, x.size).cumsum()
+        
+        df = pd.DataFrame({'ValueX': x, 'ValueY': y})
+        table_name = f"Bench_{chart_type}_{i}"
+        charts_data.append({
+            'table_name': table_name,
+            'chart_type': chart_type,
+            'figure': generator.create_chart(df, table_name, chart_type),
+            'info': generator.get_chart_info(df),
+            'data_points': len(df)
+        })
+    
+    return charts_data
+
+def legacy_dumps(charts_data: list) -> str:
+    """Original serialization: one to_json per figure wrapped in json.dumps"""
+    serializable_data = []
+    for chart in charts_data:
+        chart_copy = chart.copy()
+        chart_copy['figure_json'] = chart_copy.pop('figure').to_json()
+        serializable_data.append(chart_copy)
+    return json.dumps(serializable_data, default=str)
+
+def legacy_loads(charts_json: str) -> list:
+    """Original deserialization with validated pio.from_json"""
+    charts_data = json.loads(charts_json)
+    for chart in charts_data:
+        chart['figure'] = pio.from_json(chart.pop('figure_json'))
+    return charts_data
+
+def best_time(func, repeat: int):
+    """Run func several times and return (best seconds, last result)"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark session chart serialization")
+    parser.add_argument('--charts', type=int, default=300, help="Number of charts in the session")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+    
+    print(f"🔧 Building {args.charts} charts...")
+    charts_data = build_session_charts(args.charts)
+    
+    print(f"{'codec':<10}{'encode (s)':>12}{'decode (s)':>12}{'size (MB)':>12}")
+    
+    encode_time, payload = best_time(lambda: legacy_dumps(charts_data), args.repeat)
+    decode_time, _ = best_time(lambda: legacy_loads(payload), args.repeat)
+    print(f"{'legacy':<10}{encode_time:>12.3f}{decode_time:>12.3f}{len(payload) / 1e6:>12.2f}")
+    
+    codec_names = ['json', 'orjson'] if orjson is not None else ['json']
+    for name in codec_names:
+        # Only the (de)serialization helpers are used, the store is never opened
+        manager = SessionManager.__new__(SessionManager)
+        manager.serializer = get_chart_serializer(name)
+        encode_time, payload = best_time(lambda: manager._serialize_chart_data(charts_data), args.repeat)
+        decode_time, _ = best_time(lambda: manager._deserialize_chart_data(payload), args.repeat)
+        print(f"{name:<10}{encode_time:>12.3f}{decode_time:>12.3f}{len(payload) / 1e6:>12.2f}")
+    
+    if orjson is None:
+        print("ℹ️ orjson is not installed; install it for the fastest codec")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark for streaming table reads
+
+Compares the peak Python memory and time of reading a large waveform
+table whole (read_table + sampling) with the chunked min-max decimated
+read, on synthetic databases of growing size.
+
+Usage:
+    python benchmark_streaming.py [--rows 250000 1000000 4000000] [--points 10000]
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from data_processor import DataProcessor
+from database_handler import DatabaseHandler
+from notifier import CollectingNotifier
+
+TABLE_NAME = "Bench_Waveform"
+
+def build_database(path: str, rows: int, batch_rows: int = 200000):
+    """Write a waveform table shaped like the analyzer's (ValueX, ValueY, Phase, Quality)"""
+    connection = sqlite3.connect(path)
+    connection.execute(f'CREATE TABLE "{TABLE_NAME}" ("ValueX" REAL, "ValueY" REAL, "Phase" REAL, "Quality" TEXT)')
+    rng = np.random.default_rng(42)
+    for start in range(0, rows, batch_rows):
+        t = np.arange(start, min(start + batch_rows, rows)) * 1e-5
+        y = 100 * np.sin(2 * np.pi * 50 * t) + 5 * np.sin(2 * np.pi * 250 * t) + rng.normal(0, 1, t.size)
+        connection.executemany(f'INSERT INTO "{TABLE_NAME}" VALUES (?, ?, 0.0, \'ok\')',
+                               zip(t.tolist(), y.tolist()))
+    connection.commit()
+    connection.close()
+
+def measure(func):
+    """Run func once and return (seconds, peak traced MB, result)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1e6, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming table reads")
+    parser.add_argument('--rows', type=int, nargs='+', default=[250000, 1000000, 4000000],
+                        help="Table sizes to test")
+    parser.add_argument('--points', type=int, default=10000, help="Points kept for plotting")
+    args = parser.parse_args()
+    
+    notifier = CollectingNotifier()
+    processor = DataProcessor(notifier=notifier)
+    
+    print(f"{'rows':>10}{'method':>12}{'time (s)':>12}{'peak (MB)':>12}{'points':>10}{'y range':>22}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for rows in args.rows:
+            path = os.path.join(temp_dir, f"bench_{rows}.hfpdb")
+            print(f"🔧 Building {rows:,} rows...")
+            build_database(path, rows)
+            
+            handler = DatabaseHandler(path, notifier=notifier)
+            handler.connect()
+            
+            def read_whole():
+                df = handler.read_table(TABLE_NAME)
+                return processor.prepare_dataframe_for_plotting(df, TABLE_NAME)[0]
+            
+            methods = [
+                ('whole', read_whole),
+                ('streamed', lambda: handler.read_table_decimated(TABLE_NAME, args.points))
+            ]
+            for name, func in methods:
+                elapsed, peak, df = measure(func)
+                y_range = f"{df['ValueY'].min():.2f}..{df['ValueY'].max():.2f}"
+                print(f"{rows:>10,}{name:>12}{elapsed:>12.2f}{peak:>12.1f}{len(df):>10,}{y_range:>22}")
+            handler.disconnect()
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,23 @@
-import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
-from typing import Optional, Dict, Any
-import streamlit as st
+from typing import Optional, Dict, Any, List
+from distortion import compute_spectrum_distortion
+from notifier import Notifier, get_notifier
 
 class ChartGenerator:
     """Generate optimized Plotly charts for different data types"""
     
-    def __init__(self):
+    def __init__(self, notifier: Optional[Notifier] = None):
+        self.notifier = notifier or get_notifier()
         self.standard_width = 700
         self.standard_height = 500
         self.grid_height = 300  # Reduced height for grid view
         self.margin_config = dict(l=60, r=60, t=60, b=60)
         
+        # One color per compared file
+        self.comparison_colors = ['#667eea', '#28a745', '#ffc107', '#e83e8c', '#17a2b8', '#fd7e14', '#6f42c1', '#20c997']
+        
         # Dark theme configuration
         self.dark_theme = {
             'plot_bgcolor': 'rgba(0,0,0,0)',
@@ -42,21 +46,21 @@ class ChartGenerator:
     def validate_data(self, df: pd.DataFrame, table_name: str) -> bool:
         """Validate data before creating charts"""
         if df is None or df.empty:
-            st.warning(f"⚠️ Tabla {table_name}: Sin datos para graficar")
+            self.notifier.warning(f"⚠️ Tabla {table_name}: Sin datos para graficar")
             return False
         
         if len(df) < 2:
-            st.warning(f"⚠️ Tabla {table_name}: Insuficientes puntos de datos ({len(df)})")
+            self.notifier.warning(f"⚠️ Tabla {table_name}: Insuficientes puntos de datos ({len(df)})")
             return False
         
         # Check for required columns
         if 'ValueX' not in df.columns or 'ValueY' not in df.columns:
-            st.warning(f"⚠️ Tabla {table_name}: Faltan columnas ValueX/ValueY")
+            self.notifier.warning(f"⚠️ Tabla {table_name}: Faltan columnas ValueX/ValueY")
             return False
         
         # Check for valid numeric data
         if df['ValueX'].isna().all() or df['ValueY'].isna().all():
-            st.warning(f"⚠️ Tabla {table_name}: Datos no numéricos")
+            self.notifier.warning(f"⚠️ Tabla {table_name}: Datos no numéricos")
             return False
         
         # Check for reasonable data ranges
@@ -64,11 +68,18 @@ class ChartGenerator:
         y_range = df['ValueY'].max() - df['ValueY'].min()
         
         if x_range == 0 and y_range == 0:
-            st.warning(f"⚠️ Tabla {table_name}: Datos constantes (sin variación)")
+            self.notifier.warning(f"⚠️ Tabla {table_name}: Datos constantes (sin variación)")
             return False
         
         return True
     
+    @staticmethod
+    def copy_figure(figure: go.Figure) -> go.Figure:
+        """Copy a figure so it can be restyled without touching the stored one"""
+        # The data was validated when the figure was built, skip doing it again
+        return go.Figure({'data': figure._data, 'layout': figure._layout},
+                         skip_invalid=True, _validate=False)
+    
     def optimize_data_for_plotting(self, df: pd.DataFrame, max_points: int = 5000) -> pd.DataFrame:
         """Optimize data for plotting by sampling if necessary"""
         if len(df) <= max_points:
@@ -92,7 +103,7 @@ class ChartGenerator:
             # Ensure the result is properly sorted and clean
             result_df = sampled_df.sort_values('ValueX').reset_index(drop=True)
             
-            st.info(f"📊 Datos optimizados: {len(df):,} → {len(result_df):,} puntos")
+            self.notifier.info(f"📊 Datos optimizados: {len(df):,} → {len(result_df):,} puntos")
             return result_df
         
         return df
@@ -282,6 +293,47 @@ class ChartGenerator:
         
         return fig
     
+    def create_frequency_scan_chart(self, df: pd.DataFrame, table_name: str, height: int = None) -> go.Figure:
+        """Create an impedance vs frequency chart of a frequency scan"""
+        height = height or self.standard_height
+        
+        # Keep the curve continuous; resonance peaks are marked separately
+        df_optimized = self.optimize_data_for_plotting(df.sort_values('ValueX'))
+        
+        fig = go.Figure()
+        
+        fig.add_trace(go.Scatter(
+            x=df_optimized['ValueX'],
+            y=df_optimized['ValueY'],
+            mode='lines',
+            name=table_name,
+            line=dict(
+                width=1.5,
+                color='#17a2b8'
+            ),
+            hovertemplate='<b>Frecuencia:</b> %{x} Hz<br><b>Impedancia:</b> %{y}<extra></extra>'
+        ))
+        
+        fig.update_layout(
+            title=dict(
+                text=f"🔔 {table_name}",
+                x=0.5,
+                font=dict(size=14, color='#ffffff')
+            ),
+            width=self.standard_width,
+            height=height,
+            margin=self.margin_config,
+            showlegend=False,
+            xaxis_title="Frecuencia (Hz)",
+            yaxis_title="Impedancia",
+            **self.dark_theme
+        )
+        
+        fig.update_xaxes(tickformat='g', dtick=None)
+        fig.update_yaxes(tickformat='g', dtick=None)
+        
+        return fig
+    
     def create_generic_chart(self, df: pd.DataFrame, table_name: str, height: int = None) -> go.Figure:
         """Create optimized generic scatter chart"""
         height = height or self.standard_height
@@ -347,19 +399,180 @@ class ChartGenerator:
             # Create chart based on type
             if chart_type == 'waveform':
                 return self.create_waveform_chart(df, table_name, height)
-            elif chart_type == 'spectrum_hz':
+            elif chart_type in ('spectrum_hz', 'fft_hz'):
                 return self.create_spectrum_hz_chart(df, table_name, height)
-            elif chart_type == 'spectrum_order':
+            elif chart_type in ('spectrum_order', 'fft_order'):
                 return self.create_spectrum_order_chart(df, table_name, height)
+            elif chart_type == 'frequency_scan':
+                return self.create_frequency_scan_chart(df, table_name, height)
             else:
                 return self.create_generic_chart(df, table_name, height)
                 
         except Exception as e:
-            st.error(f"❌ Error creando gráfico para {table_name}: {e}")
+            self.notifier.error(f"❌ Error creando gráfico para {table_name}: {e}")
             return None
     
-    def get_chart_info(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """Get chart information and statistics"""
+    def create_comparison_chart(self, x: np.ndarray, values: np.ndarray, labels: List[str], table_name: str,
+                                chart_type: str, height: int = None) -> go.Figure:
+        """Create a chart overlaying one trace per file on a common x axis (NaN = no data)"""
+        height = height or self.standard_height
+        fig = go.Figure()
+        
+        for row, label in enumerate(labels):
+            color = self.comparison_colors[row % len(self.comparison_colors)]
+            if chart_type in ('spectrum_hz', 'spectrum_order'):
+                # Grouped bars with integer category labels, as in the single-file spectra
+                fig.add_trace(go.Bar(
+                    x=x.astype(int).astype(str),
+                    y=np.round(values[row], 1),
+                    name=label,
+                    marker=dict(color=color),
+                    hovertemplate=f'<b>{label}</b><br>%{{x}}: %{{y}}<extra></extra>'
+                ))
+            else:
+                fig.add_trace(go.Scatter(
+                    x=x,
+                    y=values[row],
+                    mode='lines',
+                    name=label,
+                    line=dict(width=1.5, color=color),
+                    hovertemplate=f'<b>{label}</b><br>X: %{{x}}<br>Y: %{{y}}<extra></extra>'
+                ))
+        
+        axis_titles = {
+            'waveform': ("Tiempo (s)", "Amplitud"),
+            'spectrum_hz': ("Frecuencia (Hz)", "Magnitud"),
+            'spectrum_order': ("Orden", "Magnitud"),
+            'frequency_scan': ("Frecuencia (Hz)", "Impedancia")
+        }
+        xaxis_title, yaxis_title = axis_titles.get(chart_type, ("Valor X", "Valor Y"))
+        
+        fig.update_layout(
+            title=dict(
+                text=f"🔀 {table_name}",
+                x=0.5,
+                font=dict(size=14, color='#ffffff')
+            ),
+            width=self.standard_width,
+            height=height,
+            margin=self.margin_config,
+            showlegend=True,
+            legend=dict(orientation='h', yanchor='bottom', y=1.02, x=0),
+            xaxis_title=xaxis_title,
+            yaxis_title=yaxis_title,
+            barmode='group',
+            bargap=0.1,
+            **self.dark_theme
+        )
+        
+        if chart_type in ('spectrum_hz', 'spectrum_order'):
+            fig.update_xaxes(type='category')
+        fig.update_yaxes(tickformat='g', dtick=None)
+        
+        return fig
+    
+    def create_heatmap_chart(self, row_labels: np.ndarray, orders: np.ndarray, matrix: np.ndarray,
+                             table_name: str, value_label: str = "Magnitud", height: int = None) -> go.Figure:
+        """Create a heatmap of an ID × harmonic order matrix"""
+        height = height or self.standard_height
+        
+        fig = go.Figure(go.Heatmap(
+            z=np.round(matrix, 2),
+            x=orders.astype(int).astype(str),
+            y=row_labels,
+            colorscale='Viridis',
+            hoverongaps=False,
+            colorbar=dict(title=dict(text=value_label), thickness=12),
+            hovertemplate=f'<b>%{{y}}</b><br><b>Orden:</b> %{{x}}<br><b>{value_label}:</b> %{{z}}<extra></extra>'
+        ))
+        
+        fig.update_layout(
+            title=dict(
+                text=f"🌡️ {table_name}",
+                x=0.5,
+                font=dict(size=14, color='#ffffff')
+            ),
+            width=self.standard_width,
+            height=height,
+            margin=self.margin_config,
+            showlegend=False,
+            xaxis_title="Orden",
+            **self.dark_theme
+        )
+        
+        fig.update_xaxes(type='category', showgrid=False)
+        fig.update_yaxes(type='category', showgrid=False, autorange='reversed')
+        
+        return fig
+    
+    def add_limit_lines(self, fig: go.Figure, limits: Dict[str, float]) -> go.Figure:
+        """Draw the individual harmonic limits of a spectrum as dashed horizontal lines"""
+        if 'ihd_marginal' in limits:
+            fig.add_hline(y=limits['ihd_marginal'], line=dict(color='#ffc107', width=1, dash='dot'),
+                          annotation_text=f"Marginal {limits['ihd_marginal']:g}%",
+                          annotation_font=dict(color='#ffc107', size=10))
+        if 'ihd_limit' in limits:
+            fig.add_hline(y=limits['ihd_limit'], line=dict(color='#dc3545', width=1, dash='dash'),
+                          annotation_text=f"Límite {limits['ihd_limit']:g}%",
+                          annotation_font=dict(color='#dc3545', size=10))
+        return fig
+    
+    def add_resonance_markers(self, fig: go.Figure, resonances: List[Dict]) -> go.Figure:
+        """Mark the resonance peaks of a frequency scan with their frequency and harmonic order"""
+        if not resonances:
+            return fig
+        
+        labels = [f"{resonance['frequency']:g} Hz" + (f" (h {resonance['order']:.1f})" if resonance['order'] else "")
+                  for resonance in resonances]
+        fig.add_trace(go.Scatter(
+            x=[resonance['frequency'] for resonance in resonances],
+            y=[resonance['magnitude'] for resonance in resonances],
+            mode='markers+text',
+            name="Resonancias",
+            text=labels,
+            textposition='top center',
+            textfont=dict(color='#dc3545', size=10),
+            marker=dict(size=9, color='#dc3545', symbol='triangle-down'),
+            hovertemplate='<b>Resonancia:</b> %{text}<br><b>Impedancia:</b> %{y}<extra></extra>'
+        ))
+        return fig
+    
+    def get_matrix_info(self, row_labels: np.ndarray, orders: np.ndarray, matrix: np.ndarray) -> Dict[str, Any]:
+        """Get chart information for an ID × order matrix"""
+        if matrix.size == 0 or np.isnan(matrix).all():
+            return {}
+        
+        # Cell with the highest value
+        row, col = np.unravel_index(np.nanargmax(matrix), matrix.shape)
+        return {
+            'data_points': int(np.count_nonzero(~np.isnan(matrix))),
+            'x_range': (float(orders[0]), float(orders[-1])),
+            'y_range': (float(np.nanmin(matrix)), float(np.nanmax(matrix))),
+            'x_mean': float(orders.mean()),
+            'y_mean': float(np.nanmean(matrix)),
+            'has_nulls': bool(np.isnan(matrix).any()),
+            'matrix_rows': int(row_labels.size),
+            'max_id': str(row_labels[row]),
+            'max_order': float(orders[col])
+        }
+    
+    def get_comparison_info(self, x: np.ndarray, values: np.ndarray, labels: List[str]) -> Dict[str, Any]:
+        """Get chart information for an aligned comparison matrix"""
+        if x.size == 0 or np.isnan(values).all():
+            return {}
+        
+        return {
+            'data_points': int(np.count_nonzero(~np.isnan(values))),
+            'x_range': (float(x[0]), float(x[-1])),
+            'y_range': (float(np.nanmin(values)), float(np.nanmax(values))),
+            'x_mean': float(x.mean()),
+            'y_mean': float(np.nanmean(values)),
+            'has_nulls': bool(np.isnan(values).any()),
+            'compared_files': list(labels)
+        }
+    
+    def get_chart_info(self, df: pd.DataFrame, chart_type: Optional[str] = None) -> Dict[str, Any]:
+        """Get chart information and statistics (plus THD for order spectra)"""
         if df is None or df.empty:
             return {}
         
@@ -372,4 +585,8 @@ class ChartGenerator:
             'has_nulls': df.isnull().any().any()
         }
         
+        if chart_type in ('spectrum_order', 'fft_order') and 'ValueX' in df.columns and 'ValueY' in df.columns:
+            info.update(compute_spectrum_distortion(df['ValueX'].to_numpy(dtype=float),
+                                                    df['ValueY'].to_numpy(dtype=float)))
+        
         return info 
\ No newline at end of file
@@ -0,0 +1,110 @@
+from collections.abc import Sequence
+from typing import Dict, List, Optional, Set
+
+SORT_OPTIONS = [
+    "Nombre (A-Z)",
+    "Nombre (Z-A)",
+    "Tipo",
+    "Puntos de datos (↑)",
+    "Puntos de datos (↓)"
+]
+
+class ChartSelection(Sequence):
+    """Read-only view of charts selected by position, without copying the chart list"""
+    
+    def __init__(self, charts_data: List[Dict], positions: List[int]):
+        self._charts_data = charts_data
+        self._positions = positions
+    
+    def __len__(self) -> int:
+        return len(self._positions)
+    
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._charts_data[i] for i in self._positions[item]]
+        return self._charts_data[self._positions[item]]
+    
+    @property
+    def positions(self) -> List[int]:
+        """Positions of the selected charts in the original list"""
+        return self._positions
+
+class ChartIndex:
+    """Search index over the chart names and types of one analysis"""
+    
+    def __init__(self, charts_data: List[Dict]):
+        self.size = len(charts_data)
+        self.names = [chart['table_name'].lower() for chart in charts_data]
+        
+        # Trigram -> positions of the names containing it
+        self.trigrams = {}
+        for position, name in enumerate(self.names):
+            for trigram in self._trigrams(name):
+                self.trigrams.setdefault(trigram, set()).add(position)
+        
+        # Chart type -> positions
+        self.type_buckets = {}
+        for position, chart in enumerate(charts_data):
+            self.type_buckets.setdefault(chart['type'], set()).add(position)
+        
+        # Every sort option is resolved once; Python's sort is stable, as before
+        table_names = [chart['table_name'] for chart in charts_data]
+        chart_types = [chart['type'] for chart in charts_data]
+        data_points = [chart['info'].get('data_points', 0) for chart in charts_data]
+        positions = range(self.size)
+        self.orders = {
+            "Nombre (A-Z)": sorted(positions, key=lambda i: table_names[i]),
+            "Nombre (Z-A)": sorted(positions, key=lambda i: table_names[i], reverse=True),
+            "Tipo": sorted(positions, key=lambda i: chart_types[i]),
+            "Puntos de datos (↑)": sorted(positions, key=lambda i: data_points[i]),
+            "Puntos de datos (↓)": sorted(positions, key=lambda i: data_points[i], reverse=True)
+        }
+        
+        self.summary = {
+            'total_charts': self.size,
+            'total_points': sum(data_points),
+            'type_counts': {chart_type: len(bucket) for chart_type, bucket in self.type_buckets.items()},
+            'chart_types': sorted(self.type_buckets)
+        }
+    
+    @staticmethod
+    def _trigrams(text: str) -> Set[str]:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+    
+    def match_search(self, search_term: str) -> Optional[Set[int]]:
+        """Positions whose name contains every space-separated term (None means no filter)"""
+        terms = search_term.lower().split()
+        if not terms:
+            return None
+        
+        matches = None
+        for term in terms:
+            if len(term) >= 3:
+                # Candidates share every trigram of the term; a substring check confirms them
+                candidates = None
+                for trigram in self._trigrams(term):
+                    bucket = self.trigrams.get(trigram, set())
+                    candidates = bucket if candidates is None else candidates & bucket
+                    if not candidates:
+                        return set()
+            else:
+                candidates = range(self.size) if matches is None else matches
+            term_matches = {i for i in candidates if term in self.names[i]}
+            matches = term_matches if matches is None else matches & term_matches
+            if not matches:
+                return set()
+        return matches
+    
+    def select(self, charts_data: List[Dict], search_term: str = "",
+               chart_type_filter: str = "Todos", sort_by: str = SORT_OPTIONS[0]) -> ChartSelection:
+        """Get the charts matching the filters, in the requested order"""
+        order = self.orders.get(sort_by, self.orders[SORT_OPTIONS[0]])
+        matches = self.match_search(search_term)
+        
+        if chart_type_filter != "Todos":
+            bucket = self.type_buckets.get(chart_type_filter, set())
+            matches = bucket if matches is None else matches & bucket
+        
+        if matches is None:
+            return ChartSelection(charts_data, order)
+        return ChartSelection(charts_data, [i for i in order if i in matches])
@@ -0,0 +1,77 @@
+import json
+from typing import Any, Dict
+import numpy as np
+import plotly.graph_objects as go
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; stdlib json is used instead
+    orjson = None
+
+def _default_encoder(obj: Any) -> Any:
+    """Convert NumPy and other non-JSON values found in charts"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+class ChartSerializer:
+    """Base codec used to store chart payloads of analysis sessions"""
+    
+    name = "base"
+    
+    def dumps(self, obj: Any) -> str:
+        """Encode a JSON-compatible structure to text"""
+        raise NotImplementedError
+    
+    def loads(self, data: str) -> Any:
+        """Decode text produced by dumps"""
+        raise NotImplementedError
+    
+    def figure_to_dict(self, figure: go.Figure) -> Dict:
+        """Get the raw data/layout of a figure without Plotly's deep copy"""
+        # to_plotly_json() deep-copies and base64-encodes every array; the
+        # internal dicts are only read here, so they are encoded directly
+        if hasattr(figure, '_data') and hasattr(figure, '_layout'):
+            return {'data': figure._data, 'layout': figure._layout}
+        return figure.to_plotly_json()
+    
+    def figure_from_dict(self, figure_dict: Dict) -> go.Figure:
+        """Rebuild a figure from stored data without running Plotly validation"""
+        return go.Figure(figure_dict, skip_invalid=True, _validate=False)
+
+class JsonChartSerializer(ChartSerializer):
+    """Standard library codec, always available"""
+    
+    name = "json"
+    
+    def dumps(self, obj: Any) -> str:
+        return json.dumps(obj, default=_default_encoder)
+    
+    def loads(self, data: str) -> Any:
+        return json.loads(data)
+
+class OrjsonChartSerializer(ChartSerializer):
+    """orjson codec with native NumPy array support"""
+    
+    name = "orjson"
+    
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("orjson is not installed")
+        self.options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    
+    def dumps(self, obj: Any) -> str:
+        return orjson.dumps(obj, default=_default_encoder, option=self.options).decode('utf-8')
+    
+    def loads(self, data: str) -> Any:
+        return orjson.loads(data)
+
+def get_chart_serializer(name: str = None) -> ChartSerializer:
+    """Get the fastest available serializer, or a specific one by name"""
+    if name == "json":
+        return JsonChartSerializer()
+    if name == "orjson" or (name is None and orjson is not None):
+        return OrjsonChartSerializer()
+    return JsonChartSerializer()
@@ -1,16 +1,80 @@
 import streamlit as st
+import html
 import plotly.graph_objects as go
-from typing import List, Dict, Tuple
-import re
+from typing import List, Dict, Tuple, Optional, Sequence
+from collections import OrderedDict
 from math import ceil
+from instrumentation import get_render_timer
+from chart_generator import ChartGenerator
+from chart_index import ChartIndex, SORT_OPTIONS
+from thumbnails import figure_to_sparkline_svg, svg_data_uri
+from distortion import format_distortion
+from compliance import format_violations
+from resonance import format_resonances
+
+# Layout overrides applied to the stored figures for each view
+VIEW_THEMES = {
+    'grid': {
+        'height': 300,
+        'plot_bgcolor': 'rgba(0,0,0,0)',
+        'paper_bgcolor': 'rgba(0,0,0,0)',
+        'font': {'color': '#2c3e50', 'size': 11},
+        'title': {'font': {'color': '#2c3e50', 'size': 14}},
+        'xaxis': {'color': '#2c3e50', 'gridcolor': 'rgba(44,62,80,0.2)', 'linecolor': '#7f8c8d'},
+        'yaxis': {'color': '#2c3e50', 'gridcolor': 'rgba(44,62,80,0.2)', 'linecolor': '#7f8c8d'}
+    },
+    'dialog': {
+        'height': 520,
+        'plot_bgcolor': 'rgba(0,0,0,0)',
+        'paper_bgcolor': 'rgba(0,0,0,0)',
+        'font': {'color': '#2c3e50', 'size': 12},
+        'title': {'font': {'color': '#2c3e50', 'size': 16}},
+        'xaxis': {'color': '#2c3e50', 'gridcolor': 'rgba(44,62,80,0.2)', 'linecolor': '#7f8c8d'},
+        'yaxis': {'color': '#2c3e50', 'gridcolor': 'rgba(44,62,80,0.2)', 'linecolor': '#7f8c8d'}
+    }
+}
+
+VIEW_MODES = ["📊 Interactivo", "🖼️ Miniaturas", "📜 Lista continua"]
+
+class FigureVariantCache:
+    """Themed copies of chart figures, built once per figure and view theme"""
+    
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._variants = OrderedDict()  # (id(figure), theme) -> (figure, variant)
+    
+    def get(self, figure: go.Figure, theme: str) -> go.Figure:
+        """Get the themed variant of a figure; the stored figure is never modified"""
+        key = (id(figure), theme)
+        entry = self._variants.get(key)
+        # The entry keeps its source figure alive, so its id cannot be reused meanwhile
+        if entry is not None and entry[0] is figure:
+            self._variants.move_to_end(key)
+            return entry[1]
+        
+        variant = ChartGenerator.copy_figure(figure)
+        variant.update_layout(**VIEW_THEMES[theme])
+        
+        self._variants[key] = (figure, variant)
+        if len(self._variants) > self.max_entries:
+            self._variants.popitem(last=False)
+        return variant
+    
+    def clear(self):
+        """Drop every cached variant"""
+        self._variants.clear()
 
 class ChartViewer:
     """Optimized chart viewer with search, filtering, and pagination"""
     
-    def __init__(self, charts_per_page: int = 12):
+    def __init__(self, charts_per_page: int = 12, thumbnails_per_page: int = 48):
         self.charts_per_page = charts_per_page
-        
-    def render_search_and_filters(self, charts_data: List[Dict]) -> Tuple[str, str, List[str]]:
+        self.thumbnails_per_page = thumbnails_per_page
+        self.thumbnail_columns = 4
+        self.list_window = 6  # charts alive at once in the continuous list
+        self.figure_variants = FigureVariantCache()
+    
+    def render_search_and_filters(self, charts_data: List[Dict], chart_types: Optional[List[str]] = None) -> Tuple[str, str, List[str]]:
         """Render search bar and filters with professional styling"""
         st.markdown("""
         <div class="search-container">
@@ -29,7 +93,8 @@ class ChartViewer:
         
         with col2:
             # Get unique chart types
-            chart_types = list(set([chart['type'] for chart in charts_data]))
+            if chart_types is None:
+                chart_types = sorted(set(chart['type'] for chart in charts_data))
             chart_type_filter = st.selectbox(
                 "📊 Filtrar por tipo",
                 ["Todos"] + chart_types,
@@ -38,16 +103,9 @@ class ChartViewer:
         
         with col3:
             # Sort options
-            sort_options = [
-                "Nombre (A-Z)",
-                "Nombre (Z-A)", 
-                "Tipo",
-                "Puntos de datos (↑)",
-                "Puntos de datos (↓)"
-            ]
             sort_by = st.selectbox(
                 "🔄 Ordenar por",
-                sort_options,
+                SORT_OPTIONS,
                 key="chart_sort"
             )
         
@@ -56,39 +114,27 @@ class ChartViewer:
     def filter_and_sort_charts(self, charts_data: List[Dict], search_term: str, 
                               chart_type_filter: str, sort_by: str) -> List[Dict]:
         """Filter and sort charts based on criteria"""
-        filtered_charts = charts_data.copy()
-        
-        # Apply search filter
-        if search_term:
-            filtered_charts = [
-                chart for chart in filtered_charts
-                if re.search(search_term, chart['table_name'], re.IGNORECASE)
-            ]
-        
-        # Apply type filter
-        if chart_type_filter != "Todos":
-            filtered_charts = [
-                chart for chart in filtered_charts
-                if chart['type'] == chart_type_filter
-            ]
-        
-        # Apply sorting
-        if sort_by == "Nombre (A-Z)":
-            filtered_charts.sort(key=lambda x: x['table_name'])
-        elif sort_by == "Nombre (Z-A)":
-            filtered_charts.sort(key=lambda x: x['table_name'], reverse=True)
-        elif sort_by == "Tipo":
-            filtered_charts.sort(key=lambda x: x['type'])
-        elif sort_by == "Puntos de datos (↑)":
-            filtered_charts.sort(key=lambda x: x['info'].get('data_points', 0))
-        elif sort_by == "Puntos de datos (↓)":
-            filtered_charts.sort(key=lambda x: x['info'].get('data_points', 0), reverse=True)
-        
-        return filtered_charts
+        return list(ChartIndex(charts_data).select(charts_data, search_term, chart_type_filter, sort_by))
+    
+    def get_chart_index(self, charts_data: List[Dict], charts_key: Optional[str] = None) -> ChartIndex:
+        """Get the search index of a chart set, built once per chart set key"""
+        if charts_key is None:
+            return ChartIndex(charts_data)
+        return _cached_chart_index(charts_key, len(charts_data), charts_data)
+    
+    def get_chart_summary(self, charts_data: List[Dict], charts_key: Optional[str] = None) -> Dict:
+        """Get chart counts, data points and charts per type"""
+        return self.get_chart_index(charts_data, charts_key).summary
     
-    def render_pagination_controls(self, total_charts: int, current_page: int, key_suffix: str = "") -> int:
+    @staticmethod
+    def _go_to_page(page: int):
+        st.session_state.current_page = page
+    
+    def render_pagination_controls(self, total_charts: int, current_page: int, key_suffix: str = "",
+                                   per_page: Optional[int] = None) -> int:
         """Render pagination controls"""
-        total_pages = ceil(total_charts / self.charts_per_page)
+        per_page = per_page or self.charts_per_page
+        total_pages = ceil(total_charts / per_page)
         
         if total_pages <= 1:
             return current_page
@@ -99,35 +145,36 @@ class ChartViewer:
         
         col1, col2, col3, col4, col5 = st.columns([1, 1, 2, 1, 1])
         
+        # Buttons change the page in a callback, before the grid and both controls are drawn
         with col1:
-            if st.button("⏮️ Primera", disabled=current_page <= 1, key=f"pagination_first{key_suffix}"):
-                current_page = 1
+            st.button("⏮️ Primera", disabled=current_page <= 1, key=f"pagination_first{key_suffix}",
+                      on_click=self._go_to_page, args=(1,))
         
         with col2:
-            if st.button("◀️ Anterior", disabled=current_page <= 1, key=f"pagination_prev{key_suffix}"):
-                current_page -= 1
+            st.button("◀️ Anterior", disabled=current_page <= 1, key=f"pagination_prev{key_suffix}",
+                      on_click=self._go_to_page, args=(current_page - 1,))
         
         with col3:
             st.markdown(f"""
             <div style="text-align: center; padding: 0.5rem;">
                 <strong>Página {current_page} de {total_pages}</strong><br>
-                <small>Mostrando {min(self.charts_per_page, total_charts - (current_page-1)*self.charts_per_page)} de {total_charts} gráficos</small>
+                <small>Mostrando {min(per_page, total_charts - (current_page-1)*per_page)} de {total_charts} gráficos</small>
             </div>
             """, unsafe_allow_html=True)
         
         with col4:
-            if st.button("▶️ Siguiente", disabled=current_page >= total_pages, key=f"pagination_next{key_suffix}"):
-                current_page += 1
+            st.button("▶️ Siguiente", disabled=current_page >= total_pages, key=f"pagination_next{key_suffix}",
+                      on_click=self._go_to_page, args=(current_page + 1,))
         
         with col5:
-            if st.button("⏭️ Última", disabled=current_page >= total_pages, key=f"pagination_last{key_suffix}"):
-                current_page = total_pages
+            st.button("⏭️ Última", disabled=current_page >= total_pages, key=f"pagination_last{key_suffix}",
+                      on_click=self._go_to_page, args=(total_pages,))
         
         st.markdown("</div>", unsafe_allow_html=True)
         
         return current_page
     
-    def render_chart_grid(self, charts_data: List[Dict], page: int) -> None:
+    def render_chart_grid(self, charts_data: Sequence[Dict], page: int) -> None:
         """Render charts in an optimized grid layout"""
         start_idx = (page - 1) * self.charts_per_page
         end_idx = start_idx + self.charts_per_page
@@ -142,6 +189,10 @@ class ChartViewer:
             'waveform': '📈',
             'spectrum_hz': '📊', 
             'spectrum_order': '📊',
+            'heatmap': '🌡️',
+            'frequency_scan': '🔔',
+            'fft_hz': '🧮',
+            'fft_order': '🧮',
             'generic': '📊'
         }
         
@@ -175,17 +226,8 @@ class ChartViewer:
                             </div>
                             """, unsafe_allow_html=True)
                             
-                            # Render chart with reduced height for grid view
-                            chart_figure = chart['figure']
-                            chart_figure.update_layout(
-                                height=300,
-                                plot_bgcolor='rgba(0,0,0,0)',
-                                paper_bgcolor='rgba(0,0,0,0)',
-                                font={'color': '#2c3e50', 'size': 11},
-                                title={'font': {'color': '#2c3e50', 'size': 14}},
-                                xaxis={'color': '#2c3e50', 'gridcolor': 'rgba(44,62,80,0.2)', 'linecolor': '#7f8c8d'},
-                                yaxis={'color': '#2c3e50', 'gridcolor': 'rgba(44,62,80,0.2)', 'linecolor': '#7f8c8d'}
-                            )
+                            # Render the grid variant of the chart; the stored figure stays untouched
+                            chart_figure = self.figure_variants.get(chart['figure'], 'grid')
                             
                             st.plotly_chart(
                                 chart_figure, 
@@ -209,9 +251,102 @@ class ChartViewer:
                                     if info.get('y_range'):
                                         y_min, y_max = info.get('y_range')
                                         st.metric("📐 Rango Y", f"{y_min:.2f} - {y_max:.2f}")
+                                
+                                if info.get('thd') is not None:
+                                    st.caption(format_distortion(info))
+                                if info.get('violations') is not None:
+                                    st.caption(format_violations(info))
+                                if info.get('resonances') is not None:
+                                    st.caption(format_resonances(info))
     
-    def render_charts_overview(self, charts_data: List[Dict]) -> None:
-        """Render complete chart viewer with all features"""
+    def get_thumbnail(self, chart: Dict, charts_key: Optional[str] = None) -> str:
+        """Get the sparkline data URI of a chart, cached per chart set"""
+        if charts_key is None:
+            return svg_data_uri(figure_to_sparkline_svg(chart['figure']))
+        return _cached_thumbnail(charts_key, chart['table_name'], chart['figure'])
+    
+    def render_thumbnail_grid(self, charts_data: Sequence[Dict], page: int, charts_key: Optional[str] = None) -> None:
+        """Render a page of static sparklines; clicking a name opens the interactive chart"""
+        start_idx = (page - 1) * self.thumbnails_per_page
+        page_charts = charts_data[start_idx:start_idx + self.thumbnails_per_page]
+        
+        if not page_charts:
+            st.warning("🔍 No se encontraron gráficos que coincidan con los criterios de búsqueda.")
+            return
+        
+        for i in range(0, len(page_charts), self.thumbnail_columns):
+            cols = st.columns(self.thumbnail_columns)
+            for j, col in enumerate(cols):
+                if i + j >= len(page_charts):
+                    break
+                chart = page_charts[i + j]
+                with col:
+                    st.markdown(f"""
+                    <div style="text-align: center;">
+                        <img src="{self.get_thumbnail(chart, charts_key)}" style="width: 100%; height: auto;"
+                             alt="{html.escape(chart['table_name'], quote=True)}">
+                    </div>
+                    """, unsafe_allow_html=True)
+                    if st.button(chart['table_name'], key=f"thumb_{start_idx + i + j}",
+                                 help="Ver gráfico interactivo", use_container_width=True):
+                        _show_chart_dialog(chart, self.figure_variants.get(chart['figure'], 'dialog'))
+    
+    @staticmethod
+    def _scroll_list(position: int):
+        st.session_state.list_position = position
+    
+    def render_virtual_list(self, charts_data: Sequence[Dict]) -> None:
+        """Render a sliding window of the charts instead of pages"""
+        total_charts = len(charts_data)
+        window = min(self.list_window, total_charts)
+        last_position = total_charts - window + 1
+        step = max(1, window // 2)
+        
+        # 1-based index of the first chart in the window
+        position = min(max(1, st.session_state.get('list_position', 1)), last_position)
+        st.session_state.list_position = position
+        
+        if last_position > 1:
+            col1, col2, col3, col4, col5 = st.columns([1, 1, 4, 1, 1])
+            with col1:
+                st.button("⏫", key="list_top", help="Inicio", disabled=position <= 1,
+                          on_click=self._scroll_list, args=(1,), use_container_width=True)
+            with col2:
+                st.button("🔼", key="list_up", help="Subir", disabled=position <= 1,
+                          on_click=self._scroll_list, args=(max(1, position - step),), use_container_width=True)
+            with col3:
+                st.slider("📜 Posición en la lista", 1, last_position, key="list_position",
+                          label_visibility="collapsed")
+            with col4:
+                st.button("🔽", key="list_down", help="Bajar", disabled=position >= last_position,
+                          on_click=self._scroll_list, args=(min(last_position, position + step),),
+                          use_container_width=True)
+            with col5:
+                st.button("⏬", key="list_bottom", help="Final", disabled=position >= last_position,
+                          on_click=self._scroll_list, args=(last_position,), use_container_width=True)
+        
+        st.caption(f"Gráficos {position}–{position + window - 1} de {total_charts}")
+        
+        # Slot keys are fixed, so moving the window updates the same few plot elements
+        # in the browser instead of creating one per chart
+        for slot in range(window):
+            chart = charts_data[position - 1 + slot]
+            st.markdown(f"**{position + slot}. {chart['table_name']}** · "
+                        f"{chart['type'].replace('_', ' ').title()} · "
+                        f"{chart['info'].get('data_points', 0):,} puntos")
+            st.plotly_chart(
+                self.figure_variants.get(chart['figure'], 'grid'),
+                use_container_width=True,
+                key=f"list_slot_{slot}"
+            )
+    
+    @st.fragment
+    def render_charts_overview(self, charts_data: List[Dict], charts_key: Optional[str] = None) -> None:
+        """Render complete chart viewer with all features; paging and filtering rerun only this fragment"""
+        with get_render_timer().measure("chart_overview"):
+            self._render_charts_overview(charts_data, charts_key)
+    
+    def _render_charts_overview(self, charts_data: List[Dict], charts_key: Optional[str] = None) -> None:
         if not charts_data:
             st.warning("📊 No hay gráficos para mostrar.")
             return
@@ -221,16 +356,26 @@ class ChartViewer:
             st.session_state.current_page = 1
         
         # Search and filters
-        search_term, chart_type_filter, sort_by = self.render_search_and_filters(charts_data)
-        
-        # Filter and sort charts
-        filtered_charts = self.filter_and_sort_charts(
-            charts_data, search_term, chart_type_filter, sort_by
+        chart_index = self.get_chart_index(charts_data, charts_key)
+        search_term, chart_type_filter, sort_by = self.render_search_and_filters(
+            charts_data, chart_index.summary['chart_types']
         )
         
-        # Reset page if filters changed
-        if len(filtered_charts) != len(charts_data):
+        # Filter and sort charts (a view over charts_data, not a copy)
+        filtered_charts = chart_index.select(charts_data, search_term, chart_type_filter, sort_by)
+        
+        # Thumbnails fit many more charts per page than interactive figures
+        view_mode = st.radio("🗂️ Vista", VIEW_MODES, horizontal=True, key="chart_view_mode")
+        per_page = self.thumbnails_per_page if view_mode == "🖼️ Miniaturas" else self.charts_per_page
+        
+        # Back to the first page only when the filters, the view or the chart set change
+        filter_signature = (charts_key, search_term, chart_type_filter, sort_by, view_mode)
+        if st.session_state.get('chart_filter_signature') != filter_signature:
+            st.session_state.chart_filter_signature = filter_signature
             st.session_state.current_page = 1
+            st.session_state.list_position = 1
+        total_pages = max(1, ceil(len(filtered_charts) / per_page))
+        st.session_state.current_page = min(max(1, st.session_state.current_page), total_pages)
         
         # Show results summary
         st.markdown(f"""
@@ -242,35 +387,41 @@ class ChartViewer:
         if not filtered_charts:
             return
         
+        # The continuous list replaces the page buttons with a sliding window
+        if view_mode == "📜 Lista continua":
+            self.render_virtual_list(filtered_charts)
+            return
+        
         # Pagination controls (top)
         st.session_state.current_page = self.render_pagination_controls(
-            len(filtered_charts), st.session_state.current_page, "_top"
+            len(filtered_charts), st.session_state.current_page, "_top", per_page
         )
         
         # Render chart grid
-        self.render_chart_grid(filtered_charts, st.session_state.current_page)
+        if view_mode == "🖼️ Miniaturas":
+            self.render_thumbnail_grid(filtered_charts, st.session_state.current_page, charts_key)
+        else:
+            self.render_chart_grid(filtered_charts, st.session_state.current_page)
         
         # Pagination controls (bottom)
-        if len(filtered_charts) > self.charts_per_page:
+        if len(filtered_charts) > per_page:
             st.markdown("---")
             st.session_state.current_page = self.render_pagination_controls(
-                len(filtered_charts), st.session_state.current_page, "_bottom"
+                len(filtered_charts), st.session_state.current_page, "_bottom", per_page
             )
     
-    def render_chart_statistics(self, charts_data: List[Dict]) -> None:
+    def render_chart_statistics(self, charts_data: List[Dict], charts_key: Optional[str] = None) -> None:
         """Render chart statistics with professional styling"""
         if not charts_data:
             return
         
         # Calculate statistics
-        total_charts = len(charts_data)
-        total_points = sum(chart['info'].get('data_points', 0) for chart in charts_data)
+        summary = self.get_chart_summary(charts_data, charts_key)
+        total_charts = summary['total_charts']
+        total_points = summary['total_points']
         
         # Chart type distribution
-        type_counts = {}
-        for chart in charts_data:
-            chart_type = chart['type']
-            type_counts[chart_type] = type_counts.get(chart_type, 0) + 1
+        type_counts = summary['type_counts']
         
         # Display statistics with professional styling
         col1, col2, col3, col4 = st.columns(4)
@@ -337,4 +488,39 @@ class ChartViewer:
                         {count} gráficos ({percentage:.1f}%)
                     </span>
                 </div>
-                """, unsafe_allow_html=True) 
\ No newline at end of file
+                """, unsafe_allow_html=True) 
+
+# Chart sets are identified by a key (content hash or session id) and their size;
+# the leading underscore keeps Streamlit from hashing the figures themselves
+@st.cache_resource(ttl=3600, max_entries=16, show_spinner=False)
+def _cached_chart_index(charts_key: str, chart_count: int, _charts_data: List[Dict]) -> ChartIndex:
+    return ChartIndex(_charts_data)
+
+@st.cache_data(ttl=3600, max_entries=5000, show_spinner=False)
+def _cached_thumbnail(charts_key: str, table_name: str, _figure: go.Figure) -> str:
+    return svg_data_uri(figure_to_sparkline_svg(_figure))
+
+@st.dialog("🔍 Vista ampliada", width="large")
+def _show_chart_dialog(chart: Dict, figure: go.Figure):
+    """Interactive view of a chart opened from the thumbnail grid"""
+    st.plotly_chart(figure, use_container_width=True, key=f"dialog_chart_{chart['table_name']}")
+    
+    info = chart['info']
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("📊 Puntos de datos", f"{info.get('data_points', 0):,}")
+    with col2:
+        if info.get('x_range'):
+            x_min, x_max = info.get('x_range')
+            st.metric("📏 Rango X", f"{x_min:.2f} - {x_max:.2f}")
+    with col3:
+        if info.get('y_range'):
+            y_min, y_max = info.get('y_range')
+            st.metric("📐 Rango Y", f"{y_min:.2f} - {y_max:.2f}")
+    
+    if info.get('thd') is not None:
+        st.caption(format_distortion(info))
+    if info.get('violations') is not None:
+        st.caption(format_violations(info))
+    if info.get('resonances') is not None:
+        st.caption(format_resonances(info))
@@ -0,0 +1,201 @@
+import atexit
+import hashlib
+import logging
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from database_handler import DatabaseHandler
+from data_processor import DataProcessor
+from long_format_adapter import LongFormatAdapter
+from chart_generator import ChartGenerator
+from notifier import CollectingNotifier
+from schema_catalog import get_table_classification
+
+logger = logging.getLogger(__name__)
+
+def ingest_database(db_path: str, label: str) -> Dict:
+    """Read every plottable table (and every series of a long-format table) of a database into numeric (x, y) arrays"""
+    # Messages are kept per file; worker threads cannot show Streamlit alerts
+    notifier = CollectingNotifier()
+    data_processor = DataProcessor(notifier)
+    db_handler = DatabaseHandler(db_path, notifier)
+    result = {
+        'label': label,
+        'tables': {},  # table or long-format series name -> (chart type, x, y)
+        'table_order': [],
+        'skipped': 0,
+        'error': None,
+        'messages': notifier.messages
+    }
+    
+    try:
+        if not db_handler.connect():
+            raise RuntimeError("could not connect to the database")
+        
+        classification = get_table_classification(*db_handler.get_schema(), data_processor)
+        catalog = db_handler.get_catalog()
+        for table_name in classification['plan']:
+            # ValueX/ValueY and long-format tables are compared; the rest are skipped without reading them
+            entry = classification['tables'].get(table_name, {'handler': 'skip'})
+            if entry['handler'] == 'long_format':
+                _ingest_long_format_table(db_handler, table_name, entry['adapter'], result)
+                continue
+            
+            result['table_order'].append(table_name)
+            if entry['handler'] != 'xy':
+                df = None
+            elif catalog.get(table_name, {}).get('row_estimate', 0) > data_processor.MAX_POINTS:
+                # Too large to plot in full: streamed through the min-max decimator, as in AnalysisPipeline
+                df = db_handler.read_table_decimated(table_name, data_processor.MAX_POINTS)
+            else:
+                df = db_handler.read_table(table_name)
+            if df is None:
+                result['skipped'] += 1
+                continue
+            
+            df_prepared, is_valid = data_processor.prepare_dataframe_for_plotting(df, table_name)
+            if not is_valid or len(df_prepared) < 2:
+                result['skipped'] += 1
+                continue
+            
+            x = df_prepared['ValueX'].to_numpy(dtype=float)
+            y = df_prepared['ValueY'].to_numpy(dtype=float)
+            order = np.argsort(x, kind='stable')
+            result['tables'][table_name] = (entry['chart_type'], x[order], y[order])
+    except Exception as e:
+        logger.exception("Error ingesting %s", label)
+        result['error'] = str(e)
+    finally:
+        db_handler.disconnect()
+    
+    return result
+
+def _ingest_long_format_table(db_handler: DatabaseHandler, table_name: str, adapter: LongFormatAdapter,
+                              result: Dict):
+    """Add each series of a long-format (.HA1S) table as its own comparable entry, named as in the single-file charts"""
+    try:
+        series = adapter.read_series(db_handler.connection, table_name)
+    except sqlite3.Error as e:
+        db_handler.notifier.warning(f"Error reading table {table_name}: {e}")
+        series = []
+    if not series:
+        result['table_order'].append(table_name)
+        result['skipped'] += 1
+        return
+    
+    # Rows come sorted by x within each series
+    for series_id, x, y in series:
+        series_name = adapter.get_series_name(table_name, series_id)
+        result['table_order'].append(series_name)
+        if x.size < 2:
+            result['skipped'] += 1
+            continue
+        result['tables'][series_name] = (adapter.chart_type, x, y)
+
+def compute_comparison_hash(content_hashes: List[str]) -> str:
+    """Identify a comparison by the content of its files, in upload order"""
+    return hashlib.sha256(("comparison:" + ":".join(content_hashes)).encode('utf-8')).hexdigest()
+
+def align_series(xs: List[np.ndarray], ys: List[np.ndarray], exact: bool,
+                 max_points: int = 2000) -> Tuple[np.ndarray, np.ndarray]:
+    """Put several sorted series on a common x grid: one row per series, NaN where absent"""
+    # One sort of every x at once instead of a running union per series
+    all_x = np.concatenate(xs)
+    grid = np.unique(all_x)
+    
+    if exact:
+        # Discrete axes (orders, Hz bins): values only where the series has that exact x, repeated x summed;
+        # every series is placed in one pass through flat (row, column) cell numbers
+        rows = np.repeat(np.arange(len(xs)), [x.size for x in xs])
+        cells = rows * grid.size + np.searchsorted(grid, all_x)
+        sums = np.bincount(cells, weights=np.concatenate(ys), minlength=len(xs) * grid.size)
+        counts = np.bincount(cells, minlength=len(xs) * grid.size)
+        return grid, np.where(counts > 0, sums, np.nan).reshape(len(xs), grid.size)
+    
+    # Continuous axes: interpolate on the union (thinned to max_points), NaN outside each range.
+    # np.interp per series is already C speed; a flat vectorized search measured slower
+    if grid.size > max_points:
+        grid = np.linspace(grid[0], grid[-1], max_points)
+    matrix = np.full((len(xs), grid.size), np.nan)
+    for row, (x, y) in enumerate(zip(xs, ys)):
+        inside = (grid >= x[0]) & (grid <= x[-1])
+        matrix[row, inside] = np.interp(grid[inside], x, y)
+    return grid, matrix
+
+class ComparisonIngestor:
+    """Shared thread pool ingesting the databases of every comparison request"""
+    
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+    
+    def submit(self, db_path: str, label: str) -> Future:
+        """Queue one database; the future resolves to the ingest_database result"""
+        return self._executor.submit(ingest_database, db_path, label)
+    
+    def ingest_all(self, files: List[Tuple[str, str]]) -> List[Dict]:
+        """Ingest (path, label) pairs concurrently, keeping their order"""
+        futures = [self.submit(db_path, label) for db_path, label in files]
+        return [future.result() for future in futures]
+    
+    def shutdown(self):
+        """Stop accepting work and drop queued files"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def build_comparison_charts(ingested: List[Dict], chart_generator: Optional[ChartGenerator] = None,
+                            height: int = 300, min_files: int = 2) -> Tuple[List[Dict], int]:
+    """Overlay same-named tables across files; returns the chart entries and the tables left out"""
+    chart_generator = chart_generator or ChartGenerator()
+    labels = [item['label'] for item in ingested]
+    
+    # Tables in display order of the first file that has them
+    table_order = []
+    seen = set()
+    for item in ingested:
+        for table_name in item['table_order']:
+            if table_name not in seen:
+                seen.add(table_name)
+                table_order.append(table_name)
+    
+    charts_data = []
+    left_out = 0
+    for table_name in table_order:
+        present = [(label, item['tables'][table_name]) for label, item in zip(labels, ingested)
+                   if table_name in item['tables']]
+        if len(present) < min_files:
+            left_out += 1
+            continue
+        
+        chart_type = present[0][1][0]
+        file_labels = [label for label, _ in present]
+        xs = [series[1] for _, series in present]
+        ys = [series[2] for _, series in present]
+        discrete = chart_type in ('spectrum_hz', 'spectrum_order')
+        if discrete:
+            # Duplicate bins after rounding are summed by align_series, as in the single-file charts
+            xs = [np.round(x) for x in xs]
+        
+        grid, matrix = align_series(xs, ys, exact=discrete)
+        figure = chart_generator.create_comparison_chart(grid, matrix, file_labels, table_name, chart_type, height)
+        charts_data.append({
+            'table_name': table_name,
+            'figure': figure,
+            'type': chart_type,
+            'info': chart_generator.get_comparison_info(grid, matrix, file_labels)
+        })
+    
+    return charts_data, left_out
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+def get_comparison_ingestor(max_workers: int = 4) -> ComparisonIngestor:
+    """Get the process-wide ingestion pool shared by all browser sessions"""
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None:
+            _ingestor = ComparisonIngestor(max_workers)
+            atexit.register(_ingestor.shutdown)
+        return _ingestor
@@ -0,0 +1,230 @@
+import sqlite3
+from typing import Dict, List, Optional
+import numpy as np
+
+# IEEE 519-2014 Table 1 voltage distortion limits: (bus kV up to, individual %, THD %)
+IEEE519_VOLTAGE_LIMITS = [
+    (1.0, 5.0, 8.0),
+    (69.0, 3.0, 5.0),
+    (161.0, 1.5, 2.5),
+    (np.inf, 1.0, 1.5)
+]
+
+# Long-format tables whose magnitudes are % of the fundamental
+VOLTAGE_DISTORTION_TABLES = {"HABusTabulationFund", "VHDReport"}
+CURRENT_DISTORTION_TABLES = {"HABranchTabulationFund"}
+
+STATUS_OK, STATUS_MARGINAL, STATUS_CRITICAL = 0, 1, 2
+STATUS_NAMES = {STATUS_OK: "ok", STATUS_MARGINAL: "marginal", STATUS_CRITICAL: "critical"}
+
+def marginal_threshold(critical: np.ndarray, marginal: float) -> np.ndarray:
+    """Marginal limit: a % of the critical one when above it (e.g. 95), otherwise an absolute value"""
+    critical = np.asarray(critical, dtype=float)
+    return np.where(marginal > critical, critical * marginal / 100.0, marginal)
+
+def classify(values: np.ndarray, critical: np.ndarray, marginal: Optional[np.ndarray]) -> np.ndarray:
+    """Status code of every value against its limits (NaN limits never flag)"""
+    status = np.full(np.shape(values), STATUS_OK, dtype=np.int8)
+    if marginal is not None:
+        status[values > marginal] = STATUS_MARGINAL
+    status[values > critical] = STATUS_CRITICAL
+    return status
+
+class ComplianceEngine:
+    """Check harmonic magnitudes against the limits stored in an ETAP .HA1S study"""
+    
+    def __init__(self, vthd_critical: float = 8.0, vihd_critical: float = 5.0,
+                 vthd_marginal: Optional[float] = None, vihd_marginal: Optional[float] = None,
+                 rule_id: str = "", bus_kv: Optional[Dict[str, float]] = None,
+                 current_limits: Optional[Dict[tuple, float]] = None, current_marginal: Optional[float] = None):
+        self.vthd_critical = vthd_critical
+        self.vihd_critical = vihd_critical
+        self.vthd_marginal = vthd_marginal  # None disables marginal alerts
+        self.vihd_marginal = vihd_marginal
+        self.current_marginal = current_marginal  # % of each branch limit, None disables marginal alerts
+        self.rule_id = rule_id
+        self.bus_kv = bus_kv or {}  # bus ID -> nominal kV, for the IEEE 519 voltage classes
+        self.current_limits = current_limits or {}  # (branch ID, order) -> individual limit in %
+    
+    @classmethod
+    def from_connection(cls, connection: sqlite3.Connection) -> Optional['ComplianceEngine']:
+        """Build the engine from IHAStudyCaseAlert, IBusHA and HAIDistortionLimits; None if the study has no alert settings"""
+        def read(query: str) -> list:
+            try:
+                return connection.execute(query).fetchall()
+            except sqlite3.Error:
+                return []
+        
+        try:
+            cursor = connection.execute('SELECT * FROM "IHAStudyCaseAlert" LIMIT 1')
+            row = cursor.fetchone()
+        except sqlite3.Error:
+            row = None
+        if row is None:
+            return None
+        alert = dict(zip([column[0] for column in cursor.description], row))
+        
+        # Marginal alerts need the global switch and, where the study has them, the per-quantity display switches
+        marginal_enabled = bool(alert.get("MarginalLimit"))
+        voltage_marginal = marginal_enabled and bool(alert.get("ShowVoltageMarginal", 1))
+        current_marginal = marginal_enabled and bool(alert.get("ShowCurrentMarginal", 1))
+        vthd_marg, vihd_marg = alert.get("VTHDMarg"), alert.get("VIHDMarg")
+        
+        bus_kv = {str(bus_id).strip(): float(kv) for bus_id, kv in read('SELECT "IDBus", "NomlkV" FROM "IBusHA"')
+                  if kv is not None}
+        current_limits = {(str(branch_id).strip(), float(order)): float(limit) for branch_id, order, limit
+                          in read('SELECT "ID", "Order", "%Fund" FROM "HAIDistortionLimits"')
+                          if order is not None and limit is not None}
+        
+        return cls(
+            vthd_critical=float(alert.get("VTHDCrit") or 8.0),
+            vihd_critical=float(alert.get("VIHDCrit") or 5.0),
+            vthd_marginal=float(vthd_marg) if voltage_marginal and vthd_marg else None,
+            vihd_marginal=float(vihd_marg) if voltage_marginal and vihd_marg else None,
+            rule_id=alert.get("RuleID") or "",
+            bus_kv=bus_kv,
+            current_limits=current_limits,
+            current_marginal=(float(alert["CurrentMarginal"]) if current_marginal and alert.get("CurrentMarginal")
+                              else None)
+        )
+    
+    @property
+    def uses_ieee519(self) -> bool:
+        return "519" in self.rule_id
+    
+    def get_voltage_limits(self, bus_ids: np.ndarray) -> Dict[str, np.ndarray]:
+        """Critical and marginal IHD/THD limits of each bus"""
+        count = len(bus_ids)
+        ihd = np.full(count, self.vihd_critical)
+        thd = np.full(count, self.vthd_critical)
+        
+        if self.uses_ieee519 and self.bus_kv:
+            # Voltage class of every bus found with one searchsorted over the class boundaries
+            kv = np.array([self.bus_kv.get(bus_id, np.nan) for bus_id in bus_ids], dtype=float)
+            known = np.isfinite(kv)
+            boundaries = np.array([limit[0] for limit in IEEE519_VOLTAGE_LIMITS])
+            classes = np.searchsorted(boundaries, kv[known], side='left')
+            ihd[known] = np.array([limit[1] for limit in IEEE519_VOLTAGE_LIMITS])[classes]
+            thd[known] = np.array([limit[2] for limit in IEEE519_VOLTAGE_LIMITS])[classes]
+        
+        return {
+            'ihd_critical': ihd,
+            'thd_critical': thd,
+            'ihd_marginal': marginal_threshold(ihd, self.vihd_marginal) if self.vihd_marginal is not None else None,
+            'thd_marginal': marginal_threshold(thd, self.vthd_marginal) if self.vthd_marginal is not None else None
+        }
+    
+    def evaluate(self, table_name: str, element_ids: List[str], ids: np.ndarray, orders: np.ndarray,
+                 values: np.ndarray, thd: np.ndarray) -> Optional[Dict[str, np.ndarray]]:
+        """Check every (series, order) row and every series' THD of a long-format table in one pass
+        (element_ids: the bus or branch ID of each series, several series may share one)"""
+        if table_name in VOLTAGE_DISTORTION_TABLES:
+            limits = self.get_voltage_limits(element_ids)
+        elif table_name in CURRENT_DISTORTION_TABLES and self.current_limits:
+            limits = None
+        else:
+            return None
+        
+        # Row -> position of its series in element_ids (rows are grouped by series, in the same order)
+        ids = np.asarray(ids, dtype=object)
+        starts = np.concatenate(([0], np.flatnonzero(ids[1:] != ids[:-1]) + 1))
+        segment = np.repeat(np.arange(starts.size), np.diff(np.append(starts, ids.size)))
+        harmonic = orders > 1
+        
+        if limits is None:
+            # Per-branch, per-order current limits joined on integer (branch code, order) keys
+            codes = {branch_id: code for code, branch_id in enumerate(dict.fromkeys(element_ids))}
+            series_codes = np.array([codes[branch_id] for branch_id in element_ids], dtype=float)
+            limit_keys = np.array([codes.get(branch_id, -1) * 1000.0 + order
+                                   for branch_id, order in self.current_limits], dtype=float)
+            limit_values = np.array(list(self.current_limits.values()), dtype=float)
+            order_keys = np.argsort(limit_keys)
+            limit_keys, limit_values = limit_keys[order_keys], limit_values[order_keys]
+            
+            row_keys = series_codes[segment] * 1000.0 + orders
+            positions = np.minimum(np.searchsorted(limit_keys, row_keys), limit_keys.size - 1)
+            found = limit_keys[positions] == row_keys
+            row_critical = np.where(found & harmonic, limit_values[positions], np.nan)
+            row_marginal = None
+            if self.current_marginal is not None:
+                with np.errstate(invalid='ignore'):
+                    row_marginal = np.where(np.isfinite(row_critical),
+                                            marginal_threshold(row_critical, self.current_marginal), np.nan)
+            thd_critical = np.full(len(element_ids), np.nan)
+            thd_marginal = None
+        else:
+            row_critical = np.where(harmonic, limits['ihd_critical'][segment], np.nan)
+            row_marginal = (np.where(harmonic, limits['ihd_marginal'][segment], np.nan)
+                            if limits['ihd_marginal'] is not None else None)
+            thd_critical = limits['thd_critical']
+            thd_marginal = limits['thd_marginal']
+        
+        row_status = classify(values, row_critical, row_marginal)
+        with np.errstate(invalid='ignore'):
+            ihd_limit = np.fmin.reduceat(row_critical, starts)
+            ihd_marginal = np.fmin.reduceat(row_marginal, starts) if row_marginal is not None else None
+        
+        return {
+            'row_status': row_status,
+            'row_critical': row_critical,
+            'thd_status': classify(thd, thd_critical, thd_marginal),
+            'thd_critical': thd_critical,
+            'ihd_limit': ihd_limit,  # lowest individual limit of each ID, for the chart limit lines
+            'ihd_marginal': ihd_marginal,
+            'segment': segment
+        }
+    
+    @staticmethod
+    def collect_violations(result: Dict[str, np.ndarray], table_name: str, series_ids: List[str],
+                           orders: np.ndarray, values: np.ndarray, thd: np.ndarray) -> List[List[Dict]]:
+        """Violations of every ID of an evaluate() result; only flagged rows are visited"""
+        violations = [[] for _ in range(len(thd))]
+        for index in np.flatnonzero(result['thd_status'] != STATUS_OK):
+            violations[index].append({
+                'table': table_name,
+                'element': str(series_ids[index]),
+                'check': "THD",
+                'order': None,
+                'value': float(thd[index]),
+                'limit': float(result['thd_critical'][index]),
+                'level': STATUS_NAMES[int(result['thd_status'][index])]
+            })
+        
+        # Flagged rows converted to Python values in bulk rather than one scalar at a time
+        rows = np.flatnonzero(result['row_status'] != STATUS_OK)
+        flagged = zip(result['segment'][rows].tolist(), orders[rows].tolist(), values[rows].tolist(),
+                      result['row_critical'][rows].tolist(), result['row_status'][rows].tolist())
+        for index, order, value, limit, status in flagged:
+            violations[index].append({
+                'table': table_name,
+                'element': str(series_ids[index]),
+                'check': "IHD",
+                'order': order,
+                'value': value,
+                'limit': limit,
+                'level': STATUS_NAMES[status]
+            })
+        return violations
+    
+    @staticmethod
+    def get_series_limits(result: Dict[str, np.ndarray], index: int) -> Dict[str, float]:
+        """Individual harmonic limit lines of one ID"""
+        limits = {}
+        if np.isfinite(result['ihd_limit'][index]):
+            limits['ihd_limit'] = float(result['ihd_limit'][index])
+        if result['ihd_marginal'] is not None and np.isfinite(result['ihd_marginal'][index]):
+            limits['ihd_marginal'] = float(result['ihd_marginal'][index])
+        return limits
+
+def get_violation_key(violation: Dict) -> tuple:
+    """Identity of a violation; the bus voltage tables report the same harmonics, so they share one key"""
+    source = "bus voltage" if violation['table'] in VOLTAGE_DISTORTION_TABLES else violation['table']
+    return source, violation['element'], violation['check'], violation['order']
+
+def format_violations(info: Dict) -> str:
+    """One-line limit violation summary of a chart's info for display"""
+    violations = info['violations']
+    if not violations:
+        return "✅ Dentro de los límites"
+    critical = sum(1 for violation in violations if violation['level'] == 'critical')
+    return f"🚨 {len(violations)} violaciones de límite ({critical} críticas)"
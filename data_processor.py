@@ -1,13 +1,14 @@
 import pandas as pd
 import re
 from collections import defaultdict
-from typing import List, Dict, Tuple
-import streamlit as st
+from typing import List, Dict, Optional, Tuple
+from notifier import Notifier, get_notifier
 
 class DataProcessor:
     """Handle data validation and processing"""
     
-    def __init__(self):
+    def __init__(self, notifier: Optional[Notifier] = None):
+        self.notifier = notifier or get_notifier()
         self.MAX_POINTS = 10000
         self.tables_to_omit = ["DeviceID_IID", "SystemFrequency"]
         self.type_priority = {"hz": 1, "order": 2, "waveform": 3, "other": 4}
@@ -24,7 +25,7 @@ class DataProcessor:
         
         # Check data points
         if len(df) < 2:
-            st.warning(f"Table {table_name} has only {len(df)} data points. Plot may not be meaningful.")
+            self.notifier.warning(f"Table {table_name} has only {len(df)} data points. Plot may not be meaningful.")
         
         # Remove negative values for spectrum data
         if "spectrum" in table_name.lower():
@@ -32,15 +33,15 @@ class DataProcessor:
                 negative_x = df['ValueX'] < 0
                 if negative_x.any():
                     removed_count = negative_x.sum()
-                    st.info(f"Removed {removed_count} negative ValueX values from {table_name}")
+                    self.notifier.info(f"Removed {removed_count} negative ValueX values from {table_name}")
                     df = df[~negative_x]
                     if df.empty:
-                        st.warning(f"Table {table_name} became empty after removing negative values")
+                        self.notifier.warning(f"Table {table_name} became empty after removing negative values")
                         return df
         
         # Sample data if too large
         if len(df) > self.MAX_POINTS:
-            st.info(f"Sampling {self.MAX_POINTS} points from {len(df)} total points in {table_name}")
+            self.notifier.info(f"Sampling {self.MAX_POINTS} points from {len(df)} total points in {table_name}")
             df = df.sample(n=self.MAX_POINTS, random_state=42).sort_values('ValueX')
         
         return df
@@ -95,15 +96,15 @@ class DataProcessor:
     def prepare_dataframe_for_plotting(self, df: pd.DataFrame, table_name: str) -> Tuple[pd.DataFrame, bool]:
         """Prepare DataFrame for plotting with validation"""
         if df.empty:
-            st.warning(f"Table {table_name} is empty initially")
+            self.notifier.warning(f"Table {table_name} is empty initially")
             return df, False
         
         # Check required columns
         required_cols = ['ValueX', 'ValueY']
         missing_cols = [col for col in required_cols if col not in df.columns]
         if missing_cols:
-            st.error(f"Table {table_name} is missing required columns: {', '.join(missing_cols)}")
-            st.info(f"Available columns: {df.columns.tolist()}")
+            self.notifier.error(f"Table {table_name} is missing required columns: {', '.join(missing_cols)}")
+            self.notifier.info(f"Available columns: {df.columns.tolist()}")
             return df, False
         
         # Convert to numeric
@@ -117,11 +118,19 @@ class DataProcessor:
         df = self.validate_and_prepare_data(df, table_name)
         
         if df.empty:
-            st.warning(f"Table {table_name} is empty after data validation")
+            self.notifier.warning(f"Table {table_name} is empty after data validation")
             return df, False
         
         return df, True
     
+    def get_table_group(self, table_name: str) -> Optional[Tuple[str, str]]:
+        """Get the (prefix, kind) of a Spectrum_Hz/Spectrum_Order/Waveform table, or None"""
+        for pattern, type_key in self.suffix_patterns:
+            match = pattern.match(table_name)
+            if match:
+                return match.group(1), type_key
+        return None
+    
     def get_table_type(self, table_name: str) -> str:
         """Determine the type of table based on name"""
         table_name_lower = table_name.lower()
@@ -1,43 +1,107 @@
+import os
 import sqlite3
+from pathlib import Path
+import numpy as np
 import pandas as pd
-from typing import List, Optional
-import streamlit as st
+from typing import Dict, List, Optional, Tuple
+from notifier import Notifier, get_notifier
+from schema_catalog import read_row_estimates, read_schema
+from streaming_reader import read_decimated_xy, read_xy_arrays
+
+# Pragmas of read-only analysis connections: pages are read through a shared memory map
+# (one OS page cache for every process reading the same file) instead of read() copies
+READ_ONLY_PRAGMAS = (
+    "PRAGMA mmap_size = 268435456",  # 256 MB
+    "PRAGMA cache_size = -65536",  # 64 MB
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA query_only = ON"
+)
 
 class DatabaseHandler:
     """Handle SQLite database operations"""
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, notifier: Optional[Notifier] = None, read_only: bool = True):
         self.db_path = db_path
+        self.notifier = notifier or get_notifier()
+        self.read_only = read_only  # analysis databases are never written
         self.connection = None
+        self._schema = None  # (fingerprint, table -> columns), read once per connection
+        self._catalog = None  # table -> columns and row estimate, read once per connection
     
     def connect(self) -> bool:
         """Establish database connection"""
         try:
-            self.connection = sqlite3.connect(self.db_path)
+            if self.read_only:
+                self.connection = self._connect_read_only()
+            else:
+                self.connection = sqlite3.connect(self.db_path)
+            self._schema = None
+            self._catalog = None
             return True
         except sqlite3.Error as e:
-            st.error(f"Database connection error: {e}")
+            self.notifier.error(f"Database connection error: {e}")
             return False
     
+    def _connect_read_only(self) -> sqlite3.Connection:
+        """Open the file read-only; immutable (no locks, no change checks) unless a WAL may hold newer pages"""
+        path = Path(self.db_path)
+        if not path.is_file():
+            raise sqlite3.OperationalError(f"unable to open database file: {self.db_path}")
+        
+        # An immutable open ignores the -wal file, so a database still in WAL mode only gets mode=ro
+        immutable = not os.path.exists(f"{self.db_path}-wal")
+        uri = f"{path.resolve().as_uri()}?mode=ro" + ("&immutable=1" if immutable else "")
+        connection = sqlite3.connect(uri, uri=True)
+        try:
+            for pragma in READ_ONLY_PRAGMAS:
+                connection.execute(pragma)
+        except sqlite3.Error:
+            connection.close()  # e.g. not a database file
+            raise
+        return connection
+    
     def disconnect(self):
         """Close database connection"""
         if self.connection:
             self.connection.close()
             self.connection = None
+            self._schema = None
+            self._catalog = None
     
-    def get_table_names(self) -> List[str]:
-        """Get all table names from database"""
+    def get_schema(self) -> Tuple[str, Dict[str, List[str]]]:
+        """Get the schema fingerprint and every table's columns, introspected once per connection"""
         if not self.connection:
-            return []
+            return "", {}
         
-        try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = [table[0] for table in cursor.fetchall()]
-            return tables
-        except sqlite3.Error as e:
-            st.error(f"Error fetching table names: {e}")
-            return []
+        if self._schema is None:
+            try:
+                self._schema = read_schema(self.connection)
+            except sqlite3.Error as e:
+                self.notifier.error(f"Error fetching table names: {e}")
+                return "", {}
+        return self._schema
+    
+    def get_catalog(self) -> Dict[str, Dict]:
+        """Get the columns and estimated row count of every table with a few bulk queries"""
+        if not self.connection:
+            return {}
+        
+        if self._catalog is None:
+            columns = self.get_schema()[1]
+            estimates = read_row_estimates(self.connection, list(columns))
+            self._catalog = {
+                table_name: {
+                    'columns': table_columns,
+                    'row_estimate': estimates.get(table_name, (0, None))[0],
+                    'estimate_source': estimates.get(table_name, (0, None))[1]
+                }
+                for table_name, table_columns in columns.items()
+            }
+        return self._catalog
+    
+    def get_table_names(self) -> List[str]:
+        """Get all table names from database"""
+        return list(self.get_schema()[1])
     
     def read_table(self, table_name: str) -> Optional[pd.DataFrame]:
         """Read data from a specific table"""
@@ -48,8 +112,52 @@ class DatabaseHandler:
             df = pd.read_sql_query(f'SELECT * FROM "{table_name}";', self.connection)
             return df
         except (sqlite3.Error, pd.errors.DatabaseError) as e:
-            st.warning(f"Error reading table {table_name}: {e}")
+            self.notifier.warning(f"Error reading table {table_name}: {e}")
+            return None
+    
+    def read_table_decimated(self, table_name: str, max_points: int) -> Optional[pd.DataFrame]:
+        """Read the ValueX/ValueY columns of a large table in chunks, min-max decimated to max_points"""
+        if not self.connection:
             return None
+        
+        try:
+            x, y, rows = read_decimated_xy(self.connection, table_name, max_points)
+        except sqlite3.Error as e:
+            self.notifier.warning(f"Error reading table {table_name}: {e}")
+            return None
+        
+        self.notifier.info(f"Streamed {rows:,} rows of {table_name} into {x.size:,} min-max points")
+        return pd.DataFrame({'ValueX': x, 'ValueY': y})
+    
+    def read_xy_columns(self, table_name: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Read the full ValueX/ValueY columns of a table as float arrays (NaN where not numeric)"""
+        if not self.connection:
+            return None
+        
+        expected_rows = self.get_catalog().get(table_name, {}).get('row_estimate', 0)
+        try:
+            return read_xy_arrays(self.connection, table_name, expected_rows)
+        except sqlite3.Error as e:
+            self.notifier.warning(f"Error reading table {table_name}: {e}")
+            return None
+    
+    def get_column_names(self, table_name: str) -> List[str]:
+        """Get the column names of a table without reading its rows"""
+        if not self.connection:
+            return []
+        
+        columns = self.get_schema()[1]
+        if table_name in columns:
+            return list(columns[table_name])
+        
+        try:
+            # Views and missing tables are not part of the introspected schema
+            cursor = self.connection.cursor()
+            cursor.execute(f'PRAGMA table_info("{table_name}");')
+            return [col[1] for col in cursor.fetchall()]
+        except sqlite3.Error as e:
+            self.notifier.warning(f"Error getting columns of {table_name}: {e}")
+            return []
     
     def get_table_info(self, table_name: str) -> dict:
         """Get information about a table"""
@@ -70,5 +178,5 @@ class DatabaseHandler:
                 'column_info': columns
             }
         except sqlite3.Error as e:
-            st.warning(f"Error getting table info for {table_name}: {e}")
+            self.notifier.warning(f"Error getting table info for {table_name}: {e}")
             return {} 
\ No newline at end of file
@@ -0,0 +1,103 @@
+from typing import Dict, List, Optional
+import numpy as np
+
+# .HA1S tables holding whole spectra in % of the fundamental (or with their order 1 row), the only ones
+# with a meaningful THD: *Tabulation1MVA tables are on an MVA base and VHDReport lists only flagged orders
+DISTORTION_TABLE_SUFFIX = "TabulationFund"
+
+# Tables without a computable THD whose study reports one elsewhere: table -> (source table, ID column, THD column)
+REPORTED_THD_TABLES = {"VHDReport": ("VTHDReport", "BusID", "VTHD")}
+
+def is_distortion_table(table_name: str) -> bool:
+    """Check whether THD/TDD can be computed from a long-format table's magnitudes"""
+    return table_name.endswith(DISTORTION_TABLE_SUFFIX)
+
+def unknown_distortion(series_ids: List[str]) -> Dict[str, np.ndarray]:
+    """A compute_distortion result with every value unknown, for tables without a meaningful THD"""
+    unknown = np.full(len(series_ids), np.nan)
+    return {'ids': np.array(series_ids, dtype=object), 'thd': unknown, 'tdd': unknown, 'max_ihd': unknown,
+            'max_ihd_order': unknown, 'has_fundamental': np.zeros(len(series_ids), dtype=bool)}
+
+def compute_distortion(ids: np.ndarray, orders: np.ndarray, magnitudes: np.ndarray,
+                       fundamental_amps: Optional[np.ndarray] = None,
+                       demand_amps: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Compute THD, TDD and individual harmonic levels of every ID at once (rows grouped by ID)"""
+    # IDs without an order 1 row already hold % of the fundamental (.HA1S *TabulationFund tables).
+    # fundamental_amps/demand_amps follow the returned 'ids'; TDD needs both (NaN = unknown)
+    ids = np.asarray(ids, dtype=object)
+    orders = np.asarray(orders, dtype=float)
+    magnitudes = np.abs(np.asarray(magnitudes, dtype=float))
+    if ids.size == 0:
+        empty = np.array([])
+        return {'ids': np.array([], dtype=object), 'thd': empty, 'tdd': empty, 'max_ihd': empty,
+                'max_ihd_order': empty, 'has_fundamental': np.array([], dtype=bool)}
+    
+    # Segment starts where the ID changes; every reduction below is one reduceat call
+    starts = np.concatenate(([0], np.flatnonzero(ids[1:] != ids[:-1]) + 1))
+    segment = np.repeat(np.arange(starts.size), np.diff(np.append(starts, ids.size)))
+    
+    is_fundamental = orders == 1
+    is_harmonic = orders > 1
+    has_fundamental = np.logical_or.reduceat(is_fundamental, starts)
+    fundamental = np.add.reduceat(np.where(is_fundamental, magnitudes, 0.0), starts)
+    harmonic_energy = np.add.reduceat(np.where(is_harmonic, magnitudes ** 2, 0.0), starts)
+    
+    # Scale to % of the fundamental only where the fundamental is part of the data
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(has_fundamental, 100.0 / fundamental, 1.0)
+    thd = np.sqrt(harmonic_energy) * scale
+    individual = np.where(is_harmonic, magnitudes * scale[segment], -np.inf)
+    
+    max_ihd = np.maximum.reduceat(individual, starts)
+    # Order of each segment's maximum: the first harmonic row reaching it
+    at_max = is_harmonic & (individual == max_ihd[segment])
+    first_max = np.minimum.reduceat(np.where(at_max, np.arange(ids.size), ids.size), starts)
+    has_harmonics = np.isfinite(max_ihd)
+    max_ihd_order = np.where(has_harmonics, orders[np.minimum(first_max, ids.size - 1)], np.nan)
+    max_ihd = np.where(has_harmonics, max_ihd, np.nan)
+    thd = np.where(has_harmonics, thd, np.nan)
+    
+    tdd = np.full(starts.size, np.nan)
+    if fundamental_amps is not None and demand_amps is not None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tdd = np.where(np.asarray(demand_amps, dtype=float) > 0,
+                           thd * np.asarray(fundamental_amps, dtype=float) / np.asarray(demand_amps, dtype=float),
+                           np.nan)
+    
+    return {
+        'ids': ids[starts],
+        'thd': thd,
+        'tdd': tdd,
+        'max_ihd': max_ihd,
+        'max_ihd_order': max_ihd_order,
+        'has_fundamental': has_fundamental
+    }
+
+def compute_spectrum_distortion(orders: np.ndarray, magnitudes: np.ndarray) -> Dict[str, float]:
+    """Compute THD and the largest individual harmonic of a single order spectrum"""
+    result = compute_distortion(np.zeros(len(orders), dtype=object), orders, magnitudes)
+    if result['ids'].size == 0 or np.isnan(result['thd'][0]):
+        return {}
+    return {
+        'thd': float(result['thd'][0]),
+        'max_ihd': float(result['max_ihd'][0]),
+        'max_ihd_order': float(result['max_ihd_order'][0])
+    }
+
+def get_distortion_info(result: Dict[str, np.ndarray], index: int) -> Dict[str, float]:
+    """Chart info entries of one ID of a compute_distortion result"""
+    info = {}
+    for key in ('thd', 'tdd', 'max_ihd', 'max_ihd_order'):
+        value = result[key][index]
+        if np.isfinite(value):
+            info[key] = float(value)
+    return info
+
+def format_distortion(info: Dict) -> str:
+    """One-line THD/TDD/IHD summary of a chart's info for display"""
+    parts = [f"⚡ THD {info['thd']:.2f}%"]
+    if info.get('tdd') is not None:
+        parts.append(f"TDD {info['tdd']:.2f}%")
+    if info.get('max_ihd') is not None:
+        parts.append(f"IHD máx. {info['max_ihd']:.2f}% (orden {info['max_ihd_order']:g})")
+    return " · ".join(parts)
@@ -0,0 +1,14 @@
+from typing import Tuple
+import numpy as np
+
+def build_order_matrix(ids: np.ndarray, orders: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Scatter (ID, order, value) rows into a dense ID × order matrix (NaN where there is no row)"""
+    row_labels, rows = np.unique(np.asarray(ids, dtype=str), return_inverse=True)
+    col_orders = np.unique(orders)
+    
+    # The order axis is sorted, so every row's column is found by binary search
+    cols = np.searchsorted(col_orders, orders)
+    
+    matrix = np.full((row_labels.size, col_orders.size), np.nan)
+    matrix[rows, cols] = values
+    return row_labels, col_orders, matrix
@@ -0,0 +1,84 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+class RenderTimer:
+    """Record how long full-script reruns and fragment reruns take"""
+    
+    def __init__(self, max_samples: int = 500):
+        self._samples = deque(maxlen=max_samples)  # (scope, seconds)
+        self._hooks = []
+        self._lock = threading.Lock()
+    
+    def add_hook(self, hook: Callable[[str, float], None]):
+        """Register a callback receiving (scope, seconds) for every measurement"""
+        with self._lock:
+            self._hooks.append(hook)
+    
+    def record(self, scope: str, seconds: float):
+        """Store a measurement and pass it to the hooks"""
+        with self._lock:
+            self._samples.append((scope, seconds))
+            hooks = list(self._hooks)
+        
+        logger.debug("%s rendered in %.1f ms", scope, seconds * 1000)
+        for hook in hooks:
+            try:
+                hook(scope, seconds)
+            except Exception:
+                logger.exception("Render timing hook failed")
+    
+    @contextmanager
+    def measure(self, scope: str):
+        """Time the enclosed block under the given scope"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(scope, time.perf_counter() - start)
+    
+    def get_samples(self, scope: str) -> List[float]:
+        """Get the recorded durations of a scope in seconds"""
+        with self._lock:
+            return [seconds for sample_scope, seconds in self._samples if sample_scope == scope]
+    
+    def summary(self) -> Dict[str, Dict]:
+        """Get count, median, mean and max (in ms) per scope"""
+        with self._lock:
+            samples = list(self._samples)
+        
+        by_scope = {}
+        for scope, seconds in samples:
+            by_scope.setdefault(scope, []).append(seconds * 1000)
+        
+        result = {}
+        for scope, values in by_scope.items():
+            ordered = sorted(values)
+            result[scope] = {
+                'count': len(values),
+                'median_ms': ordered[len(ordered) // 2],
+                'mean_ms': sum(values) / len(values),
+                'max_ms': ordered[-1]
+            }
+        return result
+    
+    def reset(self):
+        """Forget every measurement"""
+        with self._lock:
+            self._samples.clear()
+
+_timer = None
+_timer_lock = threading.Lock()
+
+def get_render_timer() -> RenderTimer:
+    """Get the process-wide render timer"""
+    global _timer
+    with _timer_lock:
+        if _timer is None:
+            _timer = RenderTimer()
+        return _timer
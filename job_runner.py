@@ -0,0 +1,280 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from analysis_pipeline import AnalysisPipeline
+from progress_estimate import ProgressEstimate
+
+logger = logging.getLogger(__name__)
+
+class AnalysisJob:
+    """Background analysis of one uploaded database, keyed by its content hash"""
+    
+    def __init__(self, job_id: str, filename: str, file_size: int, db_path: str,
+                 session_name: Optional[str] = None):
+        self.job_id = job_id
+        self.filename = filename
+        self.file_size = file_size
+        self.db_path = db_path  # private copy of the upload, removed when the job ends
+        self.session_name = session_name
+        self.status = "queued"  # queued, running, cancelled, completed, failed
+        self.tables = []
+        self.next_index = 0  # first table not processed yet, used to resume
+        self.estimate = None  # ProgressEstimate weighted by the tables' row counts
+        self.charts_data = []
+        self.processed_count = 0
+        self.skipped_count = 0
+        self.current_table = None
+        self.error = None
+        self.session_id = None
+        self.subscribers = set()  # browser sessions following the job; it is removed when the last one leaves
+        self.updated_at = time.time()
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    @property
+    def is_active(self) -> bool:
+        """Check whether the job is queued or running"""
+        return self.status in ("queued", "running")
+    
+    @property
+    def can_resume(self) -> bool:
+        """Check whether a stopped job can continue from its last table"""
+        return self.status in ("cancelled", "failed") and os.path.exists(self.db_path)
+    
+    def get_partial_charts(self) -> List[Dict]:
+        """Get a snapshot of the charts generated so far"""
+        with self._lock:
+            return list(self.charts_data)
+    
+    def get_status(self) -> Dict:
+        """Get a consistent snapshot of the job progress"""
+        with self._lock:
+            total_tables = len(self.tables)
+            if self.estimate is not None:
+                progress = self.estimate.fraction
+                eta_seconds = self.estimate.eta_seconds() if self.status == "running" else None
+            else:
+                progress = self.next_index / total_tables if total_tables else 0.0
+                eta_seconds = None
+            return {
+                'status': self.status,
+                'total_tables': total_tables,
+                'done_tables': self.next_index,
+                'progress': progress,
+                'eta_seconds': eta_seconds,
+                'current_table': self.current_table,
+                'processed_count': self.processed_count,
+                'skipped_count': self.skipped_count,
+                'error': self.error,
+                'session_id': self.session_id
+            }
+    
+    def _set_status(self, status: str, error: Optional[str] = None):
+        with self._lock:
+            self.status = status
+            self.error = error
+            self.updated_at = time.time()
+
+class JobRegistry:
+    """Process-wide registry of background analysis jobs"""
+    
+    def __init__(self, finished_ttl: float = 3600.0, data_processor=None, chart_generator=None):
+        self.finished_ttl = finished_ttl  # seconds a stopped job is kept for resume or review
+        self.data_processor = data_processor  # shared components, None creates one per job
+        self.chart_generator = chart_generator
+        self._jobs = {}
+        self._lock = threading.Lock()
+    
+    def get_job(self, job_id: Optional[str]) -> Optional[AnalysisJob]:
+        """Get a job by its id (the content hash of the upload)"""
+        if not job_id:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def list_jobs(self) -> List[AnalysisJob]:
+        """Get every registered job, most recent first"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return sorted(jobs, key=lambda job: job.updated_at, reverse=True)
+    
+    def submit(self, job_id: str, filename: str, file_size: int, db_path: str,
+               session_manager, session_name: Optional[str] = None,
+               subscriber: Optional[str] = None) -> AnalysisJob:
+        """Start analyzing a database copy; an active job for the same content is reused"""
+        self.prune()
+        with self._lock:
+            existing = self._jobs.get(job_id)
+            if existing is not None and existing.is_active:
+                if subscriber:
+                    existing.subscribers.add(subscriber)
+                self._remove_file(db_path)
+                return existing
+            
+            job = AnalysisJob(job_id, filename, file_size, db_path, session_name)
+            if existing is not None:
+                job.subscribers.update(existing.subscribers)
+            if subscriber:
+                job.subscribers.add(subscriber)
+            self._jobs[job_id] = job
+        
+        if existing is not None:
+            self._remove_file(existing.db_path)
+        self._start(job, session_manager)
+        return job
+    
+    def attach(self, job_id: str, subscriber: str) -> Optional[AnalysisJob]:
+        """Register a browser session as following a job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.subscribers.add(subscriber)
+            return job
+    
+    def release(self, job_id: str, subscriber: str):
+        """Stop following a job; the job is removed once no browser session follows it"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.subscribers.discard(subscriber)
+            if job.subscribers:
+                return
+            del self._jobs[job_id]
+        self._dispose(job)
+    
+    def resume(self, job_id: str, session_manager, subscriber: Optional[str] = None) -> bool:
+        """Continue a cancelled or failed job from its first unprocessed table"""
+        job = self.attach(job_id, subscriber) if subscriber else self.get_job(job_id)
+        if job is None or not job.can_resume:
+            return False
+        
+        job._cancel_event.clear()
+        job._set_status("queued")
+        self._start(job, session_manager)
+        return True
+    
+    def cancel(self, job_id: str) -> bool:
+        """Ask a job to stop after the table it is processing"""
+        job = self.get_job(job_id)
+        if job is None or not job.is_active:
+            return False
+        job._cancel_event.set()
+        return True
+    
+    def remove(self, job_id: str):
+        """Forget a job and delete its database copy once it has stopped, whoever follows it"""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None:
+            self._dispose(job)
+    
+    def _dispose(self, job: AnalysisJob):
+        job._cancel_event.set()
+        if job._thread is not None:
+            job._thread.join(5.0)
+        self._remove_file(job.db_path)
+    
+    def prune(self):
+        """Drop stopped jobs older than the retention time"""
+        cutoff = time.time() - self.finished_ttl
+        for job in self.list_jobs():
+            if not job.is_active and job.updated_at < cutoff:
+                self.remove(job.job_id)
+    
+    def shutdown(self):
+        """Cancel running jobs and delete every database copy"""
+        for job in self.list_jobs():
+            self.remove(job.job_id)
+    
+    def _start(self, job: AnalysisJob, session_manager):
+        job._thread = threading.Thread(
+            target=self._run, args=(job, session_manager),
+            name=f"analysis-{job.job_id[:8]}", daemon=True
+        )
+        job._thread.start()
+    
+    def _run(self, job: AnalysisJob, session_manager):
+        """Worker loop: process the remaining tables, then save the session"""
+        job._set_status("running")
+        pipeline = AnalysisPipeline(job.db_path, self.data_processor, self.chart_generator)
+        try:
+            if not pipeline.open():
+                raise RuntimeError("Could not connect to the database")
+            
+            # The table plan is computed once so a resumed job continues where it stopped
+            if not job.tables:
+                tables = pipeline.get_table_plan()
+                if not tables:
+                    raise RuntimeError("No tables found in the database")
+                with job._lock:
+                    job.tables = tables
+            
+            # Progress follows the estimated rows of each table, known before any is read
+            if job.estimate is None:
+                estimate = ProgressEstimate(pipeline.get_table_weights())
+                with job._lock:
+                    job.estimate = estimate
+            job.estimate.restart_clock()
+            
+            while job.next_index < len(job.tables):
+                if job._cancel_event.is_set():
+                    job._set_status("cancelled")
+                    return
+                
+                table_name = job.tables[job.next_index]
+                with job._lock:
+                    job.current_table = table_name
+                
+                charts = pipeline.process_table(table_name)
+                with job._lock:
+                    if not charts:
+                        job.skipped_count += 1
+                    else:
+                        job.charts_data.extend(charts)
+                        job.processed_count += len(charts)
+                    job.estimate.complete(table_name)
+                    job.next_index += 1
+                    job.updated_at = time.time()
+            
+            # Save from the worker so the session survives a closed browser tab
+            session_data = {
+                'filename': job.filename,
+                'file_size': job.file_size,
+                'content_hash': job.job_id,
+                'charts_generated': job.get_partial_charts()
+            }
+            job.session_id = session_manager.save_session_async(session_data, job.session_name)
+            job._set_status("completed")
+            self._remove_file(job.db_path)
+        except Exception as e:
+            logger.exception("Error analyzing %s", job.filename)
+            job._set_status("failed", str(e))
+        finally:
+            pipeline.close()
+            with job._lock:
+                job.current_table = None
+    
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            if os.path.exists(path):
+                os.unlink(path)
+        except OSError as e:
+            logger.warning("Could not delete %s: %s", path, e)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_job_registry(data_processor=None, chart_generator=None) -> JobRegistry:
+    """Get the process-wide job registry, cleaned up when the interpreter exits"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = JobRegistry(data_processor=data_processor, chart_generator=chart_generator)
+            atexit.register(_registry.shutdown)
+        return _registry
@@ -0,0 +1,121 @@
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+# Columns that tell apart series sharing an ID: the study case and, for sources, the fundamental current
+SERIES_KEY_COLUMNS = ("Code", "FundA")
+
+class LongFormatAdapter:
+    """Read ETAP .HA1S tabulation tables (one row per ID and harmonic order) as per-ID spectra"""
+    
+    def __init__(self, id_column: str = "ID", x_column: str = "Order", y_column: str = "Mag",
+                 value_label: str = "Magnitud", chart_type: str = 'spectrum_order',
+                 key_columns: Tuple[str, ...] = ()):
+        self.id_column = id_column
+        self.x_column = x_column
+        self.y_column = y_column
+        self.value_label = value_label  # axis title of the values
+        self.chart_type = chart_type  # chart type of each ID's series
+        self.key_columns = tuple(key_columns)  # SERIES_KEY_COLUMNS present in the table
+    
+    def matches(self, columns: List[str]) -> bool:
+        """Check whether a table has this layout's ID, order and value columns"""
+        return {self.id_column, self.x_column, self.y_column}.issubset(columns)
+    
+    def read_columns(self, connection: sqlite3.Connection,
+                     table_name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, Dict]]:
+        """Get the series label, order and magnitude columns of a table with a single ordered query,
+        plus the element ID and key values of each series label"""
+        # Sorting in SQLite leaves each (Code, ID, FundA) series as one contiguous run of rows
+        key_sql = "".join(f', "{column}"' for column in self.key_columns)
+        sort_columns = ([column for column in self.key_columns if column == "Code"] + [self.id_column]
+                        + [column for column in self.key_columns if column != "Code"] + [self.x_column])
+        sort_sql = ", ".join(f'"{column}"' for column in sort_columns)
+        cursor = connection.execute(
+            f'SELECT "{self.id_column}"{key_sql}, "{self.x_column}", "{self.y_column}" FROM "{table_name}" '
+            f'WHERE "{self.x_column}" IS NOT NULL AND "{self.y_column}" IS NOT NULL '
+            f'ORDER BY {sort_sql}'
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return np.array([], dtype=object), np.array([]), np.array([]), {}
+        
+        columns = list(zip(*rows))
+        elements = [str(element).strip() for element in columns[0]]
+        if not self.key_columns:
+            series_keys = {element: {'element': element} for element in dict.fromkeys(elements)}
+            ids = np.array(elements, dtype=object)
+        else:
+            row_keys = list(zip(elements, *columns[1:-2]))
+            labels = self._get_series_labels(list(dict.fromkeys(row_keys)))
+            series_keys = {label: {'element': key[0], **dict(zip(self.key_columns, key[1:]))}
+                           for key, label in labels.items()}
+            if all(label == key[0] for key, label in labels.items()):
+                ids = np.array(elements, dtype=object)  # no ID is ambiguous, the usual case
+            else:
+                ids = np.array([labels[key] for key in row_keys], dtype=object)
+        return ids, np.asarray(columns[-2], dtype=float), np.asarray(columns[-1], dtype=float), series_keys
+    
+    def _get_series_labels(self, keys: List[tuple]) -> Dict[tuple, str]:
+        """Label of every (ID, *key values) series: the ID, qualified only where it is ambiguous"""
+        key_index = {column: position + 1 for position, column in enumerate(self.key_columns)}
+        codes = {key[key_index["Code"]] for key in keys} if "Code" in key_index else set()
+        series_per_element = {}
+        for key in keys:
+            element_case = (key[0], key[key_index["Code"]] if "Code" in key_index else None)
+            series_per_element[element_case] = series_per_element.get(element_case, 0) + 1
+        
+        labels = {}
+        for key in keys:
+            code = key[key_index["Code"]] if "Code" in key_index else None
+            parts = []
+            if len(codes) > 1:
+                parts.append(f"caso {code}")
+            if "FundA" in key_index and series_per_element[(key[0], code)] > 1:
+                fundamental = key[key_index["FundA"]]
+                parts.append(f"{fundamental:.2f} A" if isinstance(fundamental, (int, float)) else str(fundamental))
+            labels[key] = f"{key[0]} [{', '.join(parts)}]" if parts else key[0]
+        
+        # Values that format alike (e.g. FundA equal to two decimals) would merge two series: number the repeats
+        seen = {}
+        for key, label in labels.items():
+            seen[label] = seen.get(label, 0) + 1
+            if seen[label] > 1:
+                labels[key] = f"{label} ({seen[label]})"
+        return labels
+    
+    @staticmethod
+    def split_series(ids: np.ndarray, x: np.ndarray, y: np.ndarray) -> List[Tuple[str, np.ndarray, np.ndarray]]:
+        """Split ID-ordered columns into (ID, orders, magnitudes) per ID"""
+        if ids.size == 0:
+            return []
+        
+        # Split where the ID changes instead of querying once per ID
+        boundaries = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+        starts = np.concatenate(([0], boundaries))
+        return list(zip(ids[starts], np.split(x, boundaries), np.split(y, boundaries)))
+    
+    def read_series(self, connection: sqlite3.Connection, table_name: str) -> List[Tuple[str, np.ndarray, np.ndarray]]:
+        """Get (series label, orders, magnitudes) for every series of a table"""
+        return self.split_series(*self.read_columns(connection, table_name)[:3])
+    
+    @staticmethod
+    def get_series_name(table_name: str, series_id: str) -> str:
+        """Chart name of one ID of a long-format table"""
+        return f"{table_name} · {series_id}"
+
+# (ID, x, value) columns, value label and chart type of the known long-format layouts
+LONG_FORMAT_LAYOUTS = [
+    ("ID", "Order", "Mag", "Magnitud", 'spectrum_order'),      # HABusTabulationFund, HABranchTabulationFund...
+    ("BusID", "Order", "VHD", "VHD (%)", 'spectrum_order'),    # VHDReport
+    ("BusID", "Freq", "Mag", "Impedancia", 'frequency_scan')   # HAFreqScan
+]
+
+def get_long_format_adapter(columns: List[str]) -> Optional[LongFormatAdapter]:
+    """Get an adapter able to read a table with these columns, or None"""
+    for layout in LONG_FORMAT_LAYOUTS:
+        adapter = LongFormatAdapter(*layout, key_columns=tuple(column for column in SERIES_KEY_COLUMNS
+                                                               if column in columns))
+        if adapter.matches(columns):
+            return adapter
+    return None
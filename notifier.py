@@ -0,0 +1,101 @@
+import logging
+from typing import List, Optional, Tuple
+
+class Notifier:
+    """Destination of the user-facing messages emitted by the processing modules"""
+    
+    def error(self, message: str):
+        raise NotImplementedError
+    
+    def warning(self, message: str):
+        raise NotImplementedError
+    
+    def info(self, message: str):
+        raise NotImplementedError
+    
+    def success(self, message: str):
+        raise NotImplementedError
+
+class LoggingNotifier(Notifier):
+    """Send messages to a logger, for headless runs"""
+    
+    def __init__(self, logger_name: str = "harmonic.pipeline"):
+        self.logger = logging.getLogger(logger_name)
+    
+    def error(self, message: str):
+        self.logger.error(message)
+    
+    def warning(self, message: str):
+        self.logger.warning(message)
+    
+    def info(self, message: str):
+        self.logger.info(message)
+    
+    def success(self, message: str):
+        self.logger.info(message)
+
+class StreamlitNotifier(Notifier):
+    """Show messages as Streamlit alerts (the default); outside a script run they are logged"""
+    
+    def __init__(self, fallback: Optional[Notifier] = None):
+        self.fallback = fallback or LoggingNotifier()
+    
+    def _emit(self, level: str, message: str):
+        # Streamlit is imported on first use so headless processes never load it
+        import streamlit as st
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        
+        # Background threads have no page to show the alert on
+        if get_script_run_ctx(suppress_warning=True) is None:
+            getattr(self.fallback, level)(message)
+        else:
+            getattr(st, level)(message)
+    
+    def error(self, message: str):
+        self._emit('error', message)
+    
+    def warning(self, message: str):
+        self._emit('warning', message)
+    
+    def info(self, message: str):
+        self._emit('info', message)
+    
+    def success(self, message: str):
+        self._emit('success', message)
+
+class CollectingNotifier(Notifier):
+    """Keep messages in memory to inspect or report them afterwards"""
+    
+    def __init__(self):
+        self.messages: List[Tuple[str, str]] = []  # (level, message)
+    
+    def error(self, message: str):
+        self.messages.append(('error', message))
+    
+    def warning(self, message: str):
+        self.messages.append(('warning', message))
+    
+    def info(self, message: str):
+        self.messages.append(('info', message))
+    
+    def success(self, message: str):
+        self.messages.append(('success', message))
+    
+    def get_messages(self, level: Optional[str] = None) -> List[str]:
+        """Get the collected messages, optionally of a single level"""
+        return [message for message_level, message in self.messages if level is None or message_level == level]
+    
+    def clear(self):
+        """Forget the collected messages"""
+        self.messages.clear()
+
+_notifier = StreamlitNotifier()
+
+def get_notifier() -> Notifier:
+    """Get the process-wide notifier used by components created without one"""
+    return _notifier
+
+def set_notifier(notifier: Notifier):
+    """Replace the process-wide notifier"""
+    global _notifier
+    _notifier = notifier
@@ -0,0 +1,52 @@
+import time
+from typing import Dict, List, Optional
+
+# Fixed cost of a table in rows, so many small tables still move the progress bar
+TABLE_OVERHEAD_ROWS = 500
+
+def largest_first(weights: Dict[str, float]) -> List[str]:
+    """Order work items from the heaviest down, so parallel workers finish close together"""
+    return sorted(weights, key=lambda name: -weights[name])
+
+class ProgressEstimate:
+    """Progress and remaining time of a run, weighted by the estimated size of each item"""
+    
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = dict(weights)
+        self.total = float(sum(self.weights.values())) or 1.0
+        self.done = 0.0
+        self._completed = set()
+        self._start_time = time.perf_counter()
+        self._start_done = 0.0  # work already done when the clock started (resumed runs)
+    
+    def restart_clock(self):
+        """Measure the rate from now on, e.g. when a stopped run is resumed"""
+        self._start_time = time.perf_counter()
+        self._start_done = self.done
+    
+    def complete(self, name: str):
+        """Mark an item as done"""
+        if name not in self._completed:
+            self._completed.add(name)
+            self.done += self.weights.get(name, 0.0)
+    
+    @property
+    def fraction(self) -> float:
+        return min(self.done / self.total, 1.0)
+    
+    def eta_seconds(self) -> Optional[float]:
+        """Seconds left at the rate measured so far, None until there is a rate"""
+        done = self.done - self._start_done
+        if done <= 0.01 * self.total:
+            return None  # a few tiny tables say nothing about the rate
+        elapsed = time.perf_counter() - self._start_time
+        return max(self.total - self.done, 0.0) * elapsed / done
+
+def format_eta(seconds: float) -> str:
+    """Remaining time for display: ~45s, ~3m 20s, ~1h 05m"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"~{seconds}s"
+    if seconds < 3600:
+        return f"~{seconds // 60}m {seconds % 60:02d}s"
+    return f"~{seconds // 3600}h {seconds % 3600 // 60:02d}m"
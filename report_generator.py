@@ -1,7 +1,8 @@
+import html
 import os
 import webbrowser
-from typing import List, Dict, Callable
-import streamlit as st
+from typing import List, Dict, Callable, Optional
+from notifier import Notifier, get_notifier
 import plotly.io as pio
 import base64
 from io import BytesIO
@@ -9,23 +10,28 @@ import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 import plotly.graph_objects as go
+from chart_generator import ChartGenerator
+from compliance import get_violation_key
+from distortion import format_distortion
 
 class ReportGenerator:
     """Generate professional HTML reports with optimized performance and progress tracking"""
     
-    def __init__(self):
+    def __init__(self, notifier: Optional[Notifier] = None):
+        self.notifier = notifier or get_notifier()
         self.standard_width = 600  # Reduced for faster processing
         self.standard_height = 400  # Reduced for faster processing
         self.max_workers = 4  # Parallel processing
         self.conversion_timeout = 30  # Timeout per chart conversion
-        
+        self.max_summary_rows = 200  # Rows of the violation and resonance summaries
+    
     def generate_html_report(self, charts_data: List[Dict], db_name: str, output_filename: str, 
                            background_color: str = "#ffffff", use_static_images: bool = False,
                            progress_callback: Callable = None) -> bool:
         """Generate an optimized HTML report for PDF printing with interactive charts"""
         try:
             if not charts_data:
-                st.error("❌ No hay gráficos para generar el reporte")
+                self.notifier.error("❌ No hay gráficos para generar el reporte")
                 return False
             
             total_charts = len(charts_data)
@@ -37,7 +43,7 @@ class ReportGenerator:
             
             # Force interactive mode for PDF printing optimization
             use_static_images = False
-            st.info("📄 Generando reporte HTML optimizado para impresión en PDF")
+            self.notifier.info("📄 Generando reporte HTML optimizado para impresión en PDF")
             
             # Calculate statistics quickly
             total_points = sum(chart['info'].get('data_points', 0) for chart in charts_data)
@@ -46,6 +52,12 @@ class ReportGenerator:
                 chart_type = chart['type']
                 type_counts[chart_type] = type_counts.get(chart_type, 0) + 1
             
+            # Worst THD among the order spectra, when any was computed
+            thd_charts = [chart for chart in charts_data if chart['info'].get('thd') is not None]
+            worst_thd_chart = max(thd_charts, key=lambda chart: chart['info']['thd']) if thd_charts else None
+            violations = self._collect_violations(charts_data)
+            resonances = self._collect_resonances(charts_data)
+            
             if progress_callback:
                 progress_callback(10, total_charts, "Preparando estructura HTML...", time.time() - start_time)
             
@@ -58,7 +70,7 @@ class ReportGenerator:
             # Generate HTML content optimized for printing
             html_content = self._generate_html_structure(
                 db_name, total_charts, total_points, type_counts, processed_charts, 
-                background_color, use_static_images
+                background_color, use_static_images, worst_thd_chart, violations, resonances
             )
             
             if progress_callback:
@@ -72,14 +84,34 @@ class ReportGenerator:
                 elapsed = time.time() - start_time
                 progress_callback(total_charts, total_charts, f"Completado en {elapsed:.1f}s", elapsed)
             
-            st.success(f"✅ Reporte HTML generado: {output_filename}")
-            st.info("📋 Para convertir a PDF: Abrir en navegador → Ctrl+P → Guardar como PDF")
+            self.notifier.success(f"✅ Reporte HTML generado: {output_filename}")
+            self.notifier.info("📋 Para convertir a PDF: Abrir en navegador → Ctrl+P → Guardar como PDF")
             return True
             
         except Exception as e:
-            st.error(f"❌ Error generando reporte: {e}")
+            self.notifier.error(f"❌ Error generando reporte: {e}")
             return False
     
+    @staticmethod
+    def _collect_violations(charts_data: List[Dict]) -> List[Dict]:
+        """Gather the limit violations of all charts, critical and largest excess first"""
+        # Heatmaps repeat the violations of their table's spectra, and VHDReport those of HABusTabulationFund;
+        # keep each one once
+        unique = {}
+        for chart in charts_data:
+            for violation in chart['info'].get('violations', ()):
+                unique.setdefault(get_violation_key(violation), violation)
+        
+        return sorted(unique.values(), key=lambda violation: (
+            violation['level'] != 'critical', -violation['value'] / violation['limit'] if violation['limit'] else 0.0
+        ))
+    
+    @staticmethod
+    def _collect_resonances(charts_data: List[Dict]) -> List[Dict]:
+        """Gather the frequency scan resonances of all charts, highest impedance first"""
+        resonances = [resonance for chart in charts_data for resonance in chart['info'].get('resonances', ())]
+        return sorted(resonances, key=lambda resonance: -resonance['magnitude'])
+    
     def _convert_charts_parallel(self, charts_data: List[Dict], progress_callback: Callable, start_time: float) -> List[Dict]:
         """Convert charts to images with improved error handling"""
         processed_charts = []
@@ -89,7 +121,7 @@ class ReportGenerator:
         
         # First try a few charts sequentially to test conversion
         test_charts = charts_data[:3]  # Test first 3 charts
-        st.info("🧪 Probando conversión con algunos gráficos...")
+        self.notifier.info("🧪 Probando conversión con algunos gráficos...")
         
         test_success = 0
         for i, chart in enumerate(test_charts):
@@ -99,10 +131,10 @@ class ReportGenerator:
         
         # If test conversion fails, use interactive mode
         if test_success == 0:
-            st.warning("⚠️ Conversión de imágenes falló en pruebas, usando modo interactivo")
+            self.notifier.warning("⚠️ Conversión de imágenes falló en pruebas, usando modo interactivo")
             return charts_data
         
-        st.success(f"✅ Conversión de prueba exitosa ({test_success}/{len(test_charts)})")
+        self.notifier.success(f"✅ Conversión de prueba exitosa ({test_success}/{len(test_charts)})")
         
         # Use threading for parallel processing with smaller batches
         batch_size = min(self.max_workers, 8)  # Limit batch size
@@ -159,9 +191,9 @@ class ReportGenerator:
         success_rate = (success_count / total_charts) * 100 if total_charts > 0 else 0
         
         if failed_count > 0:
-            st.warning(f"⚠️ {failed_count} gráficos no se pudieron convertir ({success_rate:.1f}% éxito)")
+            self.notifier.warning(f"⚠️ {failed_count} gráficos no se pudieron convertir ({success_rate:.1f}% éxito)")
         else:
-            st.success(f"✅ Todos los gráficos convertidos exitosamente")
+            self.notifier.success(f"✅ Todos los gráficos convertidos exitosamente")
         
         return processed_charts
     
@@ -266,72 +298,72 @@ class ReportGenerator:
     
     def _test_conversion_capability(self) -> bool:
         """Test if image conversion is working properly with detailed logging"""
-        st.info("🔧 [Test Conversion] Attempting to import plotly.graph_objects and plotly.io...")
+        self.notifier.info("🔧 [Test Conversion] Attempting to import plotly.graph_objects and plotly.io...")
         try:
             import plotly.graph_objects as go
             import plotly.io as pio
-            st.success("✅ [Test Conversion] Successfully imported Plotly libraries.")
+            self.notifier.success("✅ [Test Conversion] Successfully imported Plotly libraries.")
         except ImportError as e:
-            st.error(f"❌ [Test Conversion] Failed to import Plotly libraries: {e}")
+            self.notifier.error(f"❌ [Test Conversion] Failed to import Plotly libraries: {e}")
             return False
 
-        st.info("🔧 [Test Conversion] Checking for Kaleido engine availability...")
+        self.notifier.info("🔧 [Test Conversion] Checking for Kaleido engine availability...")
         try:
             if not hasattr(pio, 'kaleido'):
-                st.error("❌ [Test Conversion] pio.kaleido attribute not found. Kaleido might not be configured correctly with Plotly.")
+                self.notifier.error("❌ [Test Conversion] pio.kaleido attribute not found. Kaleido might not be configured correctly with Plotly.")
                 return False
             
-            st.info("🔧 [Test Conversion] pio.kaleido attribute found. Checking pio.kaleido.scope...")
+            self.notifier.info("🔧 [Test Conversion] pio.kaleido attribute found. Checking pio.kaleido.scope...")
             if pio.kaleido.scope is None:
-                st.warning("⚠️ [Test Conversion] pio.kaleido.scope is None. Attempting to initialize.")
+                self.notifier.warning("⚠️ [Test Conversion] pio.kaleido.scope is None. Attempting to initialize.")
                 try:
                     from kaleido.scopes.plotly import PlotlyScope
                     # Default parameters for PlotlyScope might try to download plotly.js if not found locally
                     # or specified. Plotly.py should handle providing its own plotly.js.
                     # Forcing a basic scope initialization:
                     pio.kaleido.scope = PlotlyScope()
-                    st.success("✅ [Test Conversion] Successfully initialized pio.kaleido.scope.")
+                    self.notifier.success("✅ [Test Conversion] Successfully initialized pio.kaleido.scope.")
                 except Exception as e_scope:
-                    st.error(f"❌ [Test Conversion] Failed to initialize pio.kaleido.scope: {e_scope}")
+                    self.notifier.error(f"❌ [Test Conversion] Failed to initialize pio.kaleido.scope: {e_scope}")
                     import traceback
-                    st.error(f"Traceback: {traceback.format_exc()}")
+                    self.notifier.error(f"Traceback: {traceback.format_exc()}")
                     return False
             else:
-                st.success("✅ [Test Conversion] pio.kaleido.scope is already available.")
+                self.notifier.success("✅ [Test Conversion] pio.kaleido.scope is already available.")
         except Exception as e:
-            st.error(f"❌ [Test Conversion] Error accessing or initializing Kaleido scope: {e}")
+            self.notifier.error(f"❌ [Test Conversion] Error accessing or initializing Kaleido scope: {e}")
             import traceback
-            st.error(f"Traceback: {traceback.format_exc()}")
+            self.notifier.error(f"Traceback: {traceback.format_exc()}")
             return False
 
-        st.info("🔧 [Test Conversion] Creating a simple test figure...")
+        self.notifier.info("🔧 [Test Conversion] Creating a simple test figure...")
         try:
             test_fig = go.Figure(data=go.Scatter(x=[1, 2, 3], y=[1, 4, 2]))
             test_fig.update_layout(width=300, height=200, title="Kaleido Test")
-            st.success("✅ [Test Conversion] Test figure created.")
+            self.notifier.success("✅ [Test Conversion] Test figure created.")
         except Exception as e:
-            st.error(f"❌ [Test Conversion] Error creating test figure: {e}")
+            self.notifier.error(f"❌ [Test Conversion] Error creating test figure: {e}")
             return False
 
-        st.info("⏳ [Test Conversion] Attempting to convert test figure to PNG using Kaleido... (This may take a moment)")
+        self.notifier.info("⏳ [Test Conversion] Attempting to convert test figure to PNG using Kaleido... (This may take a moment)")
         img_bytes = None
         try:
             img_bytes = test_fig.to_image(format="png", width=300, height=200, engine="kaleido")
-            st.success("✅ [Test Conversion] test_fig.to_image() call completed.")
+            self.notifier.success("✅ [Test Conversion] test_fig.to_image() call completed.")
         except Exception as e:
-            st.error(f"❌ [Test Conversion] Error during test_fig.to_image(): {e}")
+            self.notifier.error(f"❌ [Test Conversion] Error during test_fig.to_image(): {e}")
             import traceback
-            st.error(f"Traceback: {traceback.format_exc()}")
+            self.notifier.error(f"Traceback: {traceback.format_exc()}")
             return False
 
         if img_bytes and len(img_bytes) > 100:
-            st.success("🎉 [Test Conversion] Kaleido image conversion test successful. Image bytes received.")
+            self.notifier.success("🎉 [Test Conversion] Kaleido image conversion test successful. Image bytes received.")
             return True
         elif img_bytes is not None:
-            st.error(f"❌ [Test Conversion] Kaleido image conversion test produced an empty or too small image (size: {len(img_bytes)} bytes). Check Kaleido installation and dependencies.")
+            self.notifier.error(f"❌ [Test Conversion] Kaleido image conversion test produced an empty or too small image (size: {len(img_bytes)} bytes). Check Kaleido installation and dependencies.")
             return False
         else:
-            st.error("❌ [Test Conversion] Kaleido image conversion test failed: to_image() returned None. Check Kaleido logs or run a simple Kaleido script outside Streamlit.")
+            self.notifier.error("❌ [Test Conversion] Kaleido image conversion test failed: to_image() returned None. Check Kaleido logs or run a simple Kaleido script outside Streamlit.")
             return False
     
     def _convert_figure_to_image(self, figure, format='png') -> str:
@@ -355,7 +387,7 @@ class ReportGenerator:
             return f"data:image/png;base64,{img_base64}"
                 
         except Exception as e:
-            st.warning(f"⚠️ Error convirtiendo gráfico a imagen: {e}")
+            self.notifier.warning(f"⚠️ Error convirtiendo gráfico a imagen: {e}")
             return None
     
     def _get_professional_colors(self, background_color: str) -> Dict[str, str]:
@@ -391,7 +423,10 @@ class ReportGenerator:
     
     def _generate_html_structure(self, db_name: str, total_charts: int, 
                                 total_points: int, type_counts: Dict, charts_data: List[Dict],
-                                background_color: str = "#ffffff", use_static_images: bool = False) -> str:
+                                background_color: str = "#ffffff", use_static_images: bool = False,
+                                worst_thd_chart: Optional[Dict] = None,
+                                violations: Optional[List[Dict]] = None,
+                                resonances: Optional[List[Dict]] = None) -> str:
         """Generate the complete HTML structure optimized for PDF printing"""
         
         colors = self._get_professional_colors(background_color)
@@ -401,6 +436,18 @@ class ReportGenerator:
         text_color = colors['text_primary']
         secondary_text_color = colors['text_secondary']
         
+        # Highest THD of the analysis as an extra statistic
+        thd_card = ""
+        if worst_thd_chart is not None:
+            thd_card = f"""
+                    <div class="stat-card">
+                        <span class="stat-number">{worst_thd_chart['info']['thd']:.2f}%</span>
+                        <div class="stat-label">THD Máximo • {worst_thd_chart['table_name']}</div>
+                    </div>"""
+        
+        violations_html = self._generate_violations_table(violations) if violations else ""
+        resonances_html = self._generate_resonances_table(resonances) if resonances else ""
+        
         # HTML header with PDF-optimized styling
         html_start = f"""
         <!DOCTYPE html>
@@ -540,6 +587,48 @@ class ReportGenerator:
                     font-weight: 500;
                 }}
                 
+                /* Limit violation and resonance summaries */
+                .summary-section {{
+                    background: {colors['card_bg']} !important;
+                    padding: 1.5rem;
+                    border-radius: 6px;
+                    margin-bottom: 2rem;
+                    border: 1px solid {colors['border']};
+                    page-break-after: always;
+                    -webkit-print-color-adjust: exact;
+                    print-color-adjust: exact;
+                }}
+                
+                .summary-section h3 {{
+                    margin-bottom: 1rem;
+                    color: {text_color} !important;
+                    font-size: 14pt;
+                    font-weight: 600;
+                }}
+                
+                .summary-table {{
+                    width: 100%;
+                    border-collapse: collapse;
+                    font-size: 9pt;
+                    color: {text_color} !important;
+                }}
+                
+                .summary-table th, .summary-table td {{
+                    padding: 0.35rem 0.6rem;
+                    border-bottom: 1px solid {colors['border']};
+                    text-align: left;
+                }}
+                
+                .summary-table span.level-critical {{
+                    color: #dc3545 !important;
+                    font-weight: 600;
+                }}
+                
+                .summary-table span.level-marginal {{
+                    color: #fd7e14 !important;
+                    font-weight: 600;
+                }}
+                
                 /* Chart containers - optimized for A4 pages */
                 .chart-container {{
                     background: {background_color} !important;
@@ -881,8 +970,13 @@ class ReportGenerator:
                         <span class="stat-number">{total_points // total_charts if total_charts > 0 else 0:,}</span>
                         <div class="stat-label">Promedio por Gráfico</div>
                     </div>
+                    {thd_card}
                 </div>
                 
+                {violations_html}
+                
+                {resonances_html}
+                
                 <div class="search-container">
                     <h3>🔍 Navegación y Filtros (Solo en pantalla)</h3>
                     <input type="text" id="searchInput" class="search-input" placeholder="Buscar por nombre de tabla...">
@@ -895,6 +989,10 @@ class ReportGenerator:
             'waveform': '📈',
             'spectrum_hz': '📊',
             'spectrum_order': '📊',
+            'heatmap': '🌡️',
+            'frequency_scan': '🔔',
+            'fft_hz': '🧮',
+            'fft_order': '🧮',
             'generic': '📊'
         }
         
@@ -920,8 +1018,8 @@ class ReportGenerator:
             
             emoji = chart_type_emoji.get(chart_type, '📊')
             
-            # Optimize figure for printing with proper colors and integer formatting
-            figure_copy = figure
+            # Optimize a copy for printing with proper colors and integer formatting
+            figure_copy = ChartGenerator.copy_figure(figure)
             figure_copy.update_layout(
                 plot_bgcolor='rgba(0,0,0,0)',
                 paper_bgcolor='rgba(0,0,0,0)',
@@ -1004,6 +1102,7 @@ class ReportGenerator:
                         <div class="chart-meta">
                             <span class="chart-badge">{chart_type.replace('_', ' ').title()}</span>
                             <span>📊 {info.get('data_points', 0):,} puntos de datos</span>
+                            {f"<span>{format_distortion(info)}</span>" if info.get('thd') is not None else ""}
                             <span style="margin-left: auto;">📄 Página {i + 2} de {len(charts_data) + 1}</span>
                         </div>
                     </div>
@@ -1188,6 +1287,67 @@ class ReportGenerator:
         
         return html_start + charts_html + html_end
     
+    def _generate_violations_table(self, violations: List[Dict]) -> str:
+        """Generate the summary table of limit violations"""
+        level_names = {'critical': "Crítico", 'marginal': "Marginal"}
+        critical_count = sum(1 for violation in violations if violation['level'] == 'critical')
+        rows = [[
+            html.escape(violation['element']),
+            html.escape(violation['table']),
+            violation['check'],
+            f"{violation['order']:g}" if violation['order'] is not None else "Total",
+            f"{violation['value']:.2f}%",
+            f"{violation['limit']:.2f}%",
+            f'<span class="level-{violation["level"]}">{level_names.get(violation["level"], violation["level"])}</span>'
+        ] for violation in violations[:self.max_summary_rows]]
+        
+        return self._generate_summary_table(
+            f"🚨 Violaciones de Límites ({critical_count:,} críticas de {len(violations):,})",
+            ["Elemento", "Tabla", "Verificación", "Orden", "Medido", "Límite", "Estado"],
+            rows, len(violations)
+        )
+    
+    def _generate_resonances_table(self, resonances: List[Dict]) -> str:
+        """Generate the summary table of frequency scan resonances"""
+        rows = [[
+            html.escape(resonance['element']),
+            html.escape(resonance['table']),
+            f"{resonance['frequency']:g} Hz",
+            f"{resonance['order']:.2f}" if resonance['order'] is not None else "-",
+            f"{resonance['magnitude']:.4g}",
+            f"{resonance['prominence']:.4g}"
+        ] for resonance in resonances[:self.max_summary_rows]]
+        
+        return self._generate_summary_table(
+            f"🔔 Resonancias ({len(resonances):,})",
+            ["Elemento", "Tabla", "Frecuencia", "Orden", "Impedancia", "Prominencia"],
+            rows, len(resonances)
+        )
+    
+    def _generate_summary_table(self, title: str, headers: List[str], rows: List[List[str]], total: int) -> str:
+        """Generate a summary table section from already formatted cells"""
+        header_html = "".join(f"<th>{header}</th>" for header in headers)
+        rows_html = "".join(
+            "\n                            <tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows
+        )
+        
+        # Very large studies only list the first rows
+        remaining = total - len(rows)
+        footer = f'<p class="chart-meta">… y {remaining:,} más</p>' if remaining > 0 else ""
+        
+        return f"""
+                <div class="summary-section">
+                    <h3>{title}</h3>
+                    <table class="summary-table">
+                        <thead>
+                            <tr>{header_html}</tr>
+                        </thead>
+                        <tbody>{rows_html}
+                        </tbody>
+                    </table>
+                    {footer}
+                </div>"""
+    
     def _is_dark_background(self, background_color: str) -> bool:
         """Determine if a background color is dark"""
         # Convert hex to RGB and calculate luminance
@@ -1211,4 +1371,4 @@ class ReportGenerator:
         try:
             webbrowser.open(f"file://{os.path.abspath(report_path)}")
         except Exception as e:
-            st.error(f"❌ Error abriendo el reporte: {e}") 
\ No newline at end of file
+            self.notifier.error(f"❌ Error abriendo el reporte: {e}") 
\ No newline at end of file
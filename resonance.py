@@ -0,0 +1,139 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+def find_resonances(ids: np.ndarray, frequencies: np.ndarray, magnitudes: np.ndarray,
+                    min_relative_prominence: float = 0.1) -> Dict[str, np.ndarray]:
+    """Find the impedance peaks of every ID of a frequency scan at once (rows grouped by ID, sorted by frequency)"""
+    ids = np.asarray(ids, dtype=object)
+    frequencies = np.asarray(frequencies, dtype=float)
+    magnitudes = np.asarray(magnitudes, dtype=float)
+    count = ids.size
+    empty = {'rows': np.array([], dtype=int), 'segment': np.array([], dtype=int),
+             'frequency': np.array([]), 'magnitude': np.array([]), 'prominence': np.array([])}
+    if count < 3:
+        return empty
+    
+    starts = np.concatenate(([0], np.flatnonzero(ids[1:] != ids[:-1]) + 1))
+    segment = np.repeat(np.arange(starts.size), np.diff(np.append(starts, count)))
+    
+    # Local maxima inside each ID: strictly above the previous sample, not below the next (first point of a plateau)
+    same_previous = np.zeros(count, dtype=bool)
+    same_previous[1:] = segment[1:] == segment[:-1]
+    same_next = np.zeros(count, dtype=bool)
+    same_next[:-1] = same_previous[1:]
+    with np.errstate(invalid='ignore'):
+        is_peak = (same_previous & same_next
+                   & (magnitudes > np.roll(magnitudes, 1)) & (magnitudes >= np.roll(magnitudes, -1)))
+    peaks = np.flatnonzero(is_peak)
+    local_maxima = peaks
+    
+    # Required prominence scales with each ID's own range, so low-level ripple never counts
+    with np.errstate(invalid='ignore'):
+        spread = np.fmax.reduceat(magnitudes, starts) - np.fmin.reduceat(magnitudes, starts)
+    threshold = min_relative_prominence * spread
+    
+    # Drop ripples: a peak whose valley towards a higher neighbour (or the scan end) is shallow can never be
+    # prominent, so all of them go at once; the valleys of the survivors deepen until none is left to drop
+    while peaks.size:
+        left_depth, right_depth, left_higher, right_higher = _neighbour_valleys(peaks, starts, segment, magnitudes)
+        shallow = threshold[segment[peaks]]
+        removable = (((left_depth < shallow) & left_higher) | ((right_depth < shallow) & right_higher)
+                     | np.isnan(left_depth) | np.isnan(right_depth))
+        if not removable.any():
+            break
+        peaks = peaks[~removable]
+    
+    if peaks.size == 0:
+        return empty
+    
+    return {
+        'rows': peaks,
+        'segment': segment[peaks],
+        'frequency': frequencies[peaks],
+        'magnitude': magnitudes[peaks],
+        'prominence': _prominences(peaks, local_maxima, starts, segment, magnitudes)
+    }
+
+def _neighbour_valleys(peaks: np.ndarray, starts: np.ndarray, segment: np.ndarray,
+                       magnitudes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Depth of each peak over its left and right valleys, and whether each side ends at a higher peak or the ID's end"""
+    # Intervals start at every peak and every ID start, so no minimum crosses two IDs
+    boundaries = np.union1d(peaks, starts)
+    valleys = np.fmin.reduceat(magnitudes, boundaries)
+    position = np.searchsorted(boundaries, peaks)
+    heights = magnitudes[peaks]
+    left_depth = heights - valleys[position - 1]  # peaks never sit on an ID start, so position >= 1
+    right_depth = heights - valleys[position]
+    
+    # Ties go to the left peak, so one of two equal peaks always survives
+    peak_segment = segment[peaks]
+    left_higher = np.ones(peaks.size, dtype=bool)
+    right_higher = np.ones(peaks.size, dtype=bool)
+    same = peak_segment[1:] == peak_segment[:-1]
+    left_higher[1:] = ~same | (heights[:-1] >= heights[1:])
+    right_higher[:-1] = ~same | (heights[1:] > heights[:-1])
+    return left_depth, right_depth, left_higher, right_higher
+
+def _prominences(peaks: np.ndarray, local_maxima: np.ndarray, starts: np.ndarray, segment: np.ndarray,
+                 magnitudes: np.ndarray) -> np.ndarray:
+    """Height of each peak over the higher of its two bases (topographic prominence)"""
+    # Each side's base is the lowest sample before the nearest strictly higher local maximum or the ID's end;
+    # the first sample above the peak always climbs to such a maximum without dipping, so the minimum is the same
+    heights = magnitudes[local_maxima]
+    peak_segment = segment[local_maxima]
+    index = np.arange(local_maxima.size)
+    left = _nearest_higher(index - 1, -1, heights, peak_segment)
+    right = _nearest_higher(index + 1, local_maxima.size, heights, peak_segment)
+    
+    chosen = np.searchsorted(local_maxima, peaks)
+    ends = np.append(starts[1:], magnitudes.size) - 1
+    left_edge = np.where(left[chosen] >= 0, local_maxima[np.maximum(left[chosen], 0)], starts[segment[peaks]])
+    right_edge = np.where(right[chosen] < local_maxima.size,
+                          local_maxima[np.minimum(right[chosen], local_maxima.size - 1)], ends[segment[peaks]])
+    
+    # Pairs of (range start, range end + 1) reduced at once; the padding keeps every index in bounds
+    padded = np.append(magnitudes, np.nan)
+    left_base = np.fmin.reduceat(padded, np.column_stack((left_edge, peaks + 1)).ravel())[::2]
+    right_base = np.fmin.reduceat(padded, np.column_stack((peaks, right_edge + 1)).ravel())[::2]
+    return magnitudes[peaks] - np.fmax(left_base, right_base)
+
+def _nearest_higher(pointer: np.ndarray, none: int, heights: np.ndarray, peak_segment: np.ndarray) -> np.ndarray:
+    """Index of the nearest strictly higher local maximum of the same ID in one direction, or none"""
+    pointer = pointer.copy()
+    while True:
+        target = np.clip(pointer, 0, heights.size - 1)
+        pointer[(pointer != none) & (peak_segment[target] != peak_segment)] = none
+        # Everything skipped is no higher than the maximum jumped over, so jumps are safe to chain
+        lower = (pointer != none) & (heights[target] <= heights)
+        if not lower.any():
+            return pointer
+        pointer[lower] = pointer[target[lower]]
+
+def collect_resonances(result: Dict[str, np.ndarray], table_name: str, series_ids: List[str],
+                       fundamental_frequency: Optional[float] = None) -> List[List[Dict]]:
+    """Resonances of every ID of a find_resonances result"""
+    resonances = [[] for _ in range(len(series_ids))]
+    found = zip(result['segment'].tolist(), result['frequency'].tolist(), result['magnitude'].tolist(),
+                result['prominence'].tolist())
+    for index, frequency, magnitude, prominence in found:
+        resonances[index].append({
+            'table': table_name,
+            'element': str(series_ids[index]),
+            'frequency': frequency,
+            'order': frequency / fundamental_frequency if fundamental_frequency else None,
+            'magnitude': magnitude,
+            'prominence': prominence
+        })
+    return resonances
+
+def format_resonances(info: Dict) -> str:
+    """One-line resonance summary of a chart's info for display"""
+    resonances = info['resonances']
+    if not resonances:
+        return "🔔 Sin resonancias"
+    parts = []
+    for resonance in sorted(resonances, key=lambda item: -item['magnitude'])[:3]:
+        order = f" (h {resonance['order']:.1f})" if resonance['order'] is not None else ""
+        parts.append(f"{resonance['frequency']:g} Hz{order}")
+    more = f" y {len(resonances) - 3} más" if len(resonances) > 3 else ""
+    return f"🔔 Resonancias: {', '.join(parts)}{more}"
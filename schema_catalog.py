@@ -0,0 +1,127 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from data_processor import DataProcessor
+from long_format_adapter import get_long_format_adapter
+
+def read_schema(connection: sqlite3.Connection) -> Tuple[str, Dict[str, List[str]]]:
+    """Get the schema fingerprint and the columns of every table, without reading any rows"""
+    rows = connection.execute("SELECT name, sql FROM sqlite_master WHERE type='table'").fetchall()
+    # Same tables with the same definitions give the same hash, whatever their order or contents
+    fingerprint = hashlib.sha256(
+        "\n".join(f"{name}\t{sql}" for name, sql in sorted(rows, key=lambda row: row[0])).encode('utf-8')
+    ).hexdigest()
+    
+    columns = {name: [] for name, _ in rows}
+    try:
+        # Every table's columns in one query through the table-valued pragma
+        cursor = connection.execute(
+            "SELECT m.name, p.name FROM sqlite_master AS m JOIN pragma_table_info(m.name) AS p "
+            "WHERE m.type='table' ORDER BY m.name, p.cid"
+        )
+        for table_name, column in cursor:
+            columns[table_name].append(column)
+    except sqlite3.Error:
+        # SQLite before 3.16 has no table-valued pragmas
+        for table_name in columns:
+            columns[table_name] = [row[1] for row in connection.execute(f'PRAGMA table_info("{table_name}")')]
+    return fingerprint, columns
+
+def read_row_estimates(connection: sqlite3.Connection, table_names: List[str]) -> Dict[str, Tuple[int, str]]:
+    """Estimate the rows of every table without counting them: (rows, source) per table"""
+    estimates = {}
+    wanted = set(table_names)
+    
+    # sqlite_stat1 (written by ANALYZE): the first number of a table's stat is its row count
+    try:
+        for table_name, stat in connection.execute("SELECT tbl, stat FROM sqlite_stat1"):
+            if table_name in wanted and table_name not in estimates and stat:
+                estimates[table_name] = (int(str(stat).split()[0]), 'sqlite_stat1')
+    except (sqlite3.Error, ValueError):
+        pass
+    
+    # MAX(rowid) of all remaining tables in one query; exact for append-only tables and O(log n) each
+    missing = [name for name in table_names if name not in estimates]
+    if missing:
+        query = " UNION ALL ".join(f'SELECT ?, MAX(rowid) FROM "{name}"' for name in missing)
+        try:
+            for table_name, max_rowid in connection.execute(query, missing):
+                estimates[table_name] = (int(max_rowid or 0), 'max_rowid')
+        except sqlite3.Error:
+            # A WITHOUT ROWID table fails the whole query; retry one by one
+            for name in missing:
+                try:
+                    max_rowid = connection.execute(f'SELECT MAX(rowid) FROM "{name}"').fetchone()[0]
+                    estimates[name] = (int(max_rowid or 0), 'max_rowid')
+                except sqlite3.Error:
+                    pass
+    
+    # dbstat walks every page, so it only counts the leaf cells of the tables left (WITHOUT ROWID)
+    missing = {name for name in table_names if name not in estimates}
+    if missing:
+        try:
+            cursor = connection.execute(
+                "SELECT name, SUM(ncell) FROM dbstat WHERE pagetype = 'leaf' GROUP BY name"
+            )
+            for table_name, cells in cursor:
+                if table_name in missing:
+                    estimates[table_name] = (int(cells or 0), 'dbstat')
+        except sqlite3.Error:
+            pass  # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB
+    return estimates
+
+def classify_schema(columns: Dict[str, List[str]], data_processor: DataProcessor) -> Dict:
+    """Decide how every table is handled from its name and columns, and the processing order"""
+    omitted = {name.lower() for name in data_processor.tables_to_omit}
+    tables = {}
+    for table_name, table_columns in columns.items():
+        adapter = get_long_format_adapter(table_columns)
+        if table_name.lower() in omitted:
+            entry = {'handler': 'skip'}
+        elif adapter is not None:
+            entry = {'handler': 'long_format', 'adapter': adapter}
+        elif {'ValueX', 'ValueY'}.issubset(table_columns):
+            entry = {'handler': 'xy', 'chart_type': data_processor.get_table_type(table_name)}
+        else:
+            entry = {'handler': 'skip'}  # nothing to plot, never read
+        tables[table_name] = entry
+    
+    table_names = list(columns)
+    return {
+        'tables': tables,
+        'plan': data_processor.get_sorted_table_list(table_names) if table_names else []
+    }
+
+class ClassificationCache:
+    """Table classifications of recently seen schemas, shared by every file with the same schema"""
+    
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, fingerprint: str, columns: Dict[str, List[str]], data_processor: DataProcessor) -> Dict:
+        """Get the classification of a schema, computing it on the first sight of its fingerprint"""
+        with self._lock:
+            if fingerprint in self._entries:
+                self._entries.move_to_end(fingerprint)
+                return self._entries[fingerprint]
+        
+        classification = classify_schema(columns, data_processor)
+        with self._lock:
+            self._entries[fingerprint] = classification
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return classification
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+_classification_cache = ClassificationCache()
+
+def get_table_classification(fingerprint: str, columns: Dict[str, List[str]], data_processor: DataProcessor) -> Dict:
+    """Get the classification of a database's tables from its schema (see DatabaseHandler.get_schema)"""
+    return _classification_cache.get(fingerprint, columns, data_processor)
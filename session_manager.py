@@ -1,21 +1,100 @@
 import sqlite3
 import json
 import uuid
-from datetime import datetime
-from typing import List, Dict, Optional
-import streamlit as st
+import hashlib
+from datetime import datetime, timedelta
+from typing import List, Dict, Mapping, Optional
+from notifier import Notifier, get_notifier
 import os
+import time
 import plotly.graph_objects as go
-import plotly.io as pio
 import pytz
+import logging
+from session_persistence import get_persistence_worker
+from chart_serializer import ChartSerializer, get_chart_serializer
+
+logger = logging.getLogger(__name__)
+
+# Session stores already checked for writes interrupted by a previous process
+_recovered_stores = set()
+
+# Retention settings that can be configured, and the environment variables overriding them
+# (e.g. HARMONIC_RETENTION_MAX_AGE_DAYS=30; "none" disables a rule)
+RETENTION_SETTING_TYPES = {
+    'max_age_days': float,
+    'max_sessions': int,
+    'keep_favorites': bool,
+    'max_size_mb': float,
+    'vacuum_pages': int,
+    'maintenance_interval_minutes': float
+}
+RETENTION_ENV_PREFIX = "HARMONIC_RETENTION_"
+
+def read_retention_policy(settings: Optional[Mapping] = None, environ: Optional[Mapping[str, str]] = None) -> Dict:
+    """Get retention overrides from a settings mapping (e.g. the [retention] secrets section) and the environment"""
+    environ = os.environ if environ is None else environ
+    raw = dict(settings or {})
+    for key in RETENTION_SETTING_TYPES:
+        value = environ.get(RETENTION_ENV_PREFIX + key.upper())
+        if value is not None:
+            raw[key] = value  # the environment wins over the settings file
+    
+    policy = {}
+    for key, value in raw.items():
+        if key not in RETENTION_SETTING_TYPES:
+            logger.warning("Ignoring unknown retention setting %s", key)
+            continue
+        try:
+            policy[key] = _parse_retention_value(value, RETENTION_SETTING_TYPES[key])
+        except (TypeError, ValueError):
+            logger.warning("Ignoring invalid retention setting %s=%r", key, value)
+    return policy
+
+def _parse_retention_value(value, kind: type):
+    """Convert one retention setting, given as text or as a TOML value"""
+    text = value.strip().lower() if isinstance(value, str) else None
+    if kind is bool:
+        if text is None:
+            return bool(value)
+        if text in ("1", "true", "yes", "on"):
+            return True
+        if text in ("0", "false", "no", "off"):
+            return False
+        raise ValueError(value)
+    if value is None or text in ("", "none", "off"):
+        return None
+    number = float(text if text is not None else value)
+    return int(number) if kind is int else number
 
 class SessionManager:
     """Manage analysis sessions in SQLite database"""
     
-    def __init__(self, db_path: str = "analysis_sessions.db"):
+    def __init__(self, db_path: str = "analysis_sessions.db", retention_policy: Optional[Dict] = None,
+                 serializer: Optional[ChartSerializer] = None, notifier: Optional[Notifier] = None):
         self.db_path = db_path
+        self.notifier = notifier or get_notifier()
         self.timezone = pytz.timezone('America/Santiago')
+        self.persistence_worker = get_persistence_worker()
+        self.serializer = serializer or get_chart_serializer()
+        
+        # Retention and size budget for the session store (None disables a rule)
+        self.retention_policy = {
+            'max_age_days': None,
+            'max_sessions': None,
+            'keep_favorites': True,
+            'max_size_mb': None,
+            'vacuum_pages': 0,  # 0 reclaims every free page
+            'maintenance_interval_minutes': 60  # Minimum time between maintenance runs triggered by saves
+        }
+        if retention_policy:
+            self.retention_policy.update(retention_policy)
+        
+        # Name suggestions keyed by uploaded filename, cleared whenever names change
+        self._name_suggestions = {}
+        self._last_maintenance = None
+        
         self.init_database()
+        self.run_maintenance()
     
     def init_database(self):
         """Initialize the sessions database"""
@@ -23,6 +102,12 @@ class SessionManager:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
+            # Incremental vacuum must be enabled before the first table is created
+            cursor.execute("PRAGMA auto_vacuum")
+            needs_vacuum_mode = cursor.fetchone()[0] != 2
+            if needs_vacuum_mode:
+                cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS analysis_sessions (
                     id TEXT PRIMARY KEY,
@@ -39,20 +124,65 @@ class SessionManager:
                 )
             """)
             
-            # Add favorites column to existing databases
-            try:
-                cursor.execute("ALTER TABLE analysis_sessions ADD COLUMN is_favorite INTEGER DEFAULT 0")
-            except sqlite3.OperationalError:
-                # Column already exists
-                pass
+            # Chart payloads are shared between sessions with identical content
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chart_payloads (
+                    id TEXT PRIMARY KEY,
+                    content_hash TEXT,
+                    charts_data TEXT,
+                    ref_count INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Add new columns to existing databases
+            for column_sql in (
+                "ALTER TABLE analysis_sessions ADD COLUMN is_favorite INTEGER DEFAULT 0",
+                "ALTER TABLE analysis_sessions ADD COLUMN content_hash TEXT",
+                "ALTER TABLE analysis_sessions ADD COLUMN payload_id TEXT",
+                "ALTER TABLE analysis_sessions ADD COLUMN last_accessed_at TIMESTAMP",
+                "ALTER TABLE analysis_sessions ADD COLUMN failure_reason TEXT"
+            ):
+                try:
+                    cursor.execute(column_sql)
+                except sqlite3.OperationalError:
+                    # Column already exists
+                    pass
+            
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_payloads_content_hash ON chart_payloads(content_hash)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_sessions_payload_id ON analysis_sessions(payload_id)"
+            )
+            
+            # Older stores may hold repeated names; rename them before enforcing uniqueness
+            self._rename_duplicate_session_names(cursor)
+            cursor.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_sessions_name ON analysis_sessions(session_name)"
+            )
+            
+            # Writes queued by this process are still running; only recover once per store
+            if self.db_path not in _recovered_stores:
+                self._recover_interrupted_sessions(cursor)
+                _recovered_stores.add(self.db_path)
             
             conn.commit()
+            
+            # Existing stores only switch vacuum mode after a full rebuild
+            if needs_vacuum_mode:
+                cursor.execute("VACUUM")
+            
             conn.close()
         except Exception as e:
-            st.error(f"Error initializing session database: {e}")
+            self.notifier.error(f"Error initializing session database: {e}")
     
     def generate_session_name_suggestion(self, filename: str) -> str:
         """Generate a unique session name suggestion"""
+        # Reruns for the same upload reuse the previous suggestion
+        if filename in self._name_suggestions:
+            return self._name_suggestions[filename]
+        
         # Clean filename
         clean_filename = filename.replace('.hfpdb', '').replace('.db', '').replace('.sqlite', '')
         clean_filename = clean_filename.replace('_', ' ').replace('-', ' ')
@@ -61,20 +191,54 @@ class SessionManager:
         now = datetime.now(self.timezone)
         timestamp = now.strftime("%Y%m%d_%H%M")
         
-        # Create suggestion
+        # Create suggestion and make it unique
         suggestion = f"{clean_filename} - {timestamp}"
         
-        # Check if name exists and make it unique
-        existing_names = self.get_existing_session_names()
-        counter = 1
-        original_suggestion = suggestion
-        
-        while suggestion in existing_names:
-            suggestion = f"{original_suggestion} ({counter})"
-            counter += 1
+        try:
+            conn = sqlite3.connect(self.db_path)
+            suggestion = self._next_available_name(conn.cursor(), suggestion)
+            conn.close()
+        except Exception as e:
+            self.notifier.error(f"Error checking session names: {e}")
         
+        self._name_suggestions[filename] = suggestion
         return suggestion
     
+    def _next_available_name(self, cursor, base_name: str) -> str:
+        """Return base_name or base_name with the next free ' (n)' suffix"""
+        # A single range scan on the unique name index covers the name and all its suffixes
+        cursor.execute("""
+            SELECT 
+                SUM(session_name = :base),
+                MAX(CASE 
+                    WHEN substr(session_name, length(:base) + 1, 2) = ' (' 
+                         AND substr(session_name, -1) = ')'
+                    THEN CAST(substr(session_name, length(:base) + 3, 
+                                     length(session_name) - length(:base) - 3) AS INTEGER)
+                END)
+            FROM analysis_sessions 
+            WHERE session_name >= :base AND session_name < :base || ' )'
+        """, {'base': base_name})
+        exact_count, max_suffix = cursor.fetchone()
+        
+        if not exact_count:
+            return base_name
+        return f"{base_name} ({(max_suffix or 0) + 1})"
+    
+    def _rename_duplicate_session_names(self, cursor):
+        """Give every repeated session name a numeric suffix, keeping the oldest as is"""
+        cursor.execute("""
+            SELECT id, session_name FROM analysis_sessions 
+            WHERE rowid NOT IN (SELECT MIN(rowid) FROM analysis_sessions GROUP BY session_name)
+            ORDER BY rowid
+        """)
+        for session_id, session_name in cursor.fetchall():
+            unique_name = self._next_available_name(cursor, session_name)
+            cursor.execute(
+                "UPDATE analysis_sessions SET session_name = ? WHERE id = ?",
+                (unique_name, session_id)
+            )
+    
     def get_existing_session_names(self) -> List[str]:
         """Get all existing session names"""
         try:
@@ -88,7 +252,7 @@ class SessionManager:
             return names
             
         except Exception as e:
-            st.error(f"Error getting session names: {e}")
+            self.notifier.error(f"Error getting session names: {e}")
             return []
     
     def _get_santiago_timestamp(self) -> str:
@@ -96,6 +260,19 @@ class SessionManager:
         now = datetime.now(self.timezone)
         return now.strftime("%Y-%m-%d %H:%M:%S %Z")
     
+    @staticmethod
+    def compute_content_hash(uploaded_file, version: str = "", chunk_size: int = 1024 * 1024) -> str:
+        """Compute a streamed SHA-256 of an uploaded file and the pipeline version without copying it in memory"""
+        # Charts cached under an older pipeline version get a different key and are analyzed again
+        digest = hashlib.sha256(f"pipeline:{version}:".encode('utf-8') if version else b"")
+        uploaded_file.seek(0)
+        
+        for chunk in iter(lambda: uploaded_file.read(chunk_size), b''):
+            digest.update(chunk)
+        
+        uploaded_file.seek(0)
+        return digest.hexdigest()
+    
     def _serialize_chart_data(self, charts_data: List[Dict]) -> str:
         """Serialize chart data with proper Plotly figure handling"""
         serializable_data = []
@@ -103,31 +280,166 @@ class SessionManager:
         for chart in charts_data:
             chart_copy = chart.copy()
             
-            # Convert Plotly figure to JSON
-            if 'figure' in chart_copy and hasattr(chart_copy['figure'], 'to_json'):
-                chart_copy['figure_json'] = chart_copy['figure'].to_json()
+            # Store the raw figure dict; the codec encodes it in a single pass
+            if 'figure' in chart_copy and isinstance(chart_copy['figure'], go.Figure):
+                chart_copy['figure_dict'] = self.serializer.figure_to_dict(chart_copy['figure'])
                 del chart_copy['figure']  # Remove the original figure object
             
             serializable_data.append(chart_copy)
         
-        return json.dumps(serializable_data, default=str)
+        return self.serializer.dumps(serializable_data)
     
     def _deserialize_chart_data(self, charts_json: str) -> List[Dict]:
         """Deserialize chart data and reconstruct Plotly figures"""
         try:
-            charts_data = json.loads(charts_json)
+            charts_data = self.serializer.loads(charts_json)
             
             for chart in charts_data:
-                # Reconstruct Plotly figure from JSON
-                if 'figure_json' in chart:
-                    chart['figure'] = pio.from_json(chart['figure_json'])
-                    del chart['figure_json']  # Clean up
+                # Reconstruct Plotly figure from the stored dict
+                if 'figure_dict' in chart:
+                    chart['figure'] = self.serializer.figure_from_dict(chart.pop('figure_dict'))
+                elif 'figure_json' in chart:
+                    # Sessions saved before the codec layer: full validation decodes typed arrays
+                    chart['figure'] = go.Figure(self.serializer.loads(chart.pop('figure_json')), skip_invalid=True)
             
             return charts_data
         except Exception as e:
-            st.error(f"Error deserializing chart data: {e}")
+            self.notifier.error(f"Error deserializing chart data: {e}")
             return []
     
+    def _get_payload_id_by_hash(self, cursor, content_hash: str) -> Optional[str]:
+        """Find the shared chart payload stored for a content hash"""
+        if not content_hash:
+            return None
+        
+        cursor.execute(
+            "SELECT id FROM chart_payloads WHERE content_hash = ? LIMIT 1",
+            (content_hash,)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def _ensure_session_payload(self, cursor, session_id: str) -> Optional[str]:
+        """Move inline chart data of a legacy session into a shared payload"""
+        cursor.execute(
+            "SELECT payload_id, content_hash, charts_data FROM analysis_sessions WHERE id = ?",
+            (session_id,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        
+        payload_id, content_hash, charts_json = row
+        if payload_id:
+            return payload_id
+        
+        payload_id = str(uuid.uuid4())
+        cursor.execute("""
+            INSERT INTO chart_payloads (id, content_hash, charts_data, ref_count)
+            VALUES (?, ?, ?, 1)
+        """, (payload_id, content_hash, charts_json))
+        cursor.execute("""
+            UPDATE analysis_sessions 
+            SET payload_id = ?, charts_data = NULL 
+            WHERE id = ?
+        """, (payload_id, session_id))
+        
+        return payload_id
+    
+    def _release_payload(self, cursor, payload_id: str):
+        """Drop one reference to a payload and delete it when unused"""
+        if not payload_id:
+            return
+        
+        cursor.execute(
+            "UPDATE chart_payloads SET ref_count = ref_count - 1 WHERE id = ?",
+            (payload_id,)
+        )
+        cursor.execute(
+            "DELETE FROM chart_payloads WHERE id = ? AND ref_count <= 0",
+            (payload_id,)
+        )
+    
+    def load_charts_by_hash(self, content_hash: str) -> Optional[List[Dict]]:
+        """Load previously generated charts for identical uploaded content"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "SELECT charts_data FROM chart_payloads WHERE content_hash = ? LIMIT 1",
+                (content_hash,)
+            )
+            row = cursor.fetchone()
+            conn.close()
+            
+            if row and row[0]:
+                return self._deserialize_chart_data(row[0])
+            return None
+        
+        except Exception as e:
+            self.notifier.error(f"Error looking up cached charts: {e}")
+            return None
+    
+    def _summarize_charts(self, charts_data: List[Dict]):
+        """Count chart types and data points for the session summary columns"""
+        chart_types = {}
+        total_points = 0
+        
+        for chart in charts_data:
+            chart_type = chart.get('type', 'unknown')
+            chart_types[chart_type] = chart_types.get(chart_type, 0) + 1
+            total_points += chart.get('info', {}).get('data_points', 0)
+        
+        return chart_types, total_points
+    
+    def _store_payload(self, cursor, session_data: Dict) -> str:
+        """Reuse the payload of identical content, otherwise store a new one"""
+        content_hash = session_data.get('content_hash')
+        payload_id = self._get_payload_id_by_hash(cursor, content_hash)
+        
+        if payload_id:
+            cursor.execute(
+                "UPDATE chart_payloads SET ref_count = ref_count + 1 WHERE id = ?",
+                (payload_id,)
+            )
+        else:
+            payload_id = content_hash or str(uuid.uuid4())
+            charts_json = self._serialize_chart_data(session_data.get('charts_generated', []))
+            cursor.execute("""
+                INSERT INTO chart_payloads (id, content_hash, charts_data, ref_count)
+                VALUES (?, ?, ?, 1)
+            """, (payload_id, content_hash, charts_json))
+        
+        return payload_id
+    
+    def _insert_session_row(self, cursor, session_id: str, session_data: Dict, session_name: str,
+                            status: str, payload_id: str = None):
+        """Insert the metadata row of a session"""
+        charts_data = session_data.get('charts_generated', [])
+        chart_types, total_points = self._summarize_charts(charts_data)
+        session_name = self._next_available_name(cursor, session_name)
+        self._name_suggestions.clear()
+        
+        cursor.execute("""
+            INSERT INTO analysis_sessions 
+            (id, session_name, original_filename, file_size, created_at, charts_count, 
+             total_data_points, chart_types, status, content_hash, payload_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            session_id,
+            session_name,
+            session_data.get('filename', 'Unknown'),
+            session_data.get('file_size', 0),
+            self._get_santiago_timestamp(),
+            len(charts_data),
+            total_points,
+            json.dumps(chart_types),
+            status,
+            session_data.get('content_hash'),
+            payload_id
+        ))
+    
     def save_session(self, session_data: Dict, session_name: str = None) -> str:
         """Save a new analysis session with custom name"""
         try:
@@ -140,45 +452,125 @@ class SessionManager:
                 filename = session_data.get('filename', 'Unknown')
                 session_name = self.generate_session_name_suggestion(filename)
             
-            # Prepare chart types summary
-            chart_types = {}
-            total_points = 0
+            payload_id = self._store_payload(cursor, session_data)
+            self._insert_session_row(cursor, session_id, session_data, session_name, 'completed', payload_id)
             
-            for chart in session_data.get('charts_generated', []):
-                chart_type = chart.get('type', 'unknown')
-                chart_types[chart_type] = chart_types.get(chart_type, 0) + 1
-                total_points += chart.get('info', {}).get('data_points', 0)
+            conn.commit()
+            conn.close()
             
-            # Serialize chart data properly
-            charts_json = self._serialize_chart_data(session_data.get('charts_generated', []))
+            self._maintain_after_save()
+            return session_id
+        
+        except Exception as e:
+            self.notifier.error(f"Error saving session: {e}")
+            return None
+    
+    def save_session_async(self, session_data: Dict, session_name: str = None) -> str:
+        """Register a session as pending and write its charts in the background"""
+        try:
+            session_id = str(uuid.uuid4())
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
             
-            # Get Santiago timestamp
-            santiago_timestamp = self._get_santiago_timestamp()
+            # Use provided name or generate default
+            if not session_name:
+                filename = session_data.get('filename', 'Unknown')
+                session_name = self.generate_session_name_suggestion(filename)
+            
+            # Only the metadata row is written here; serialization happens in the worker
+            self._insert_session_row(cursor, session_id, session_data, session_name, 'pending')
+            
+            conn.commit()
+            conn.close()
+            
+            self.persistence_worker.submit(self, session_id, session_data)
+            return session_id
+        
+        except Exception as e:
+            self.notifier.error(f"Error saving session: {e}")
+            return None
+    
+    def write_session_payload(self, session_id: str, session_data: Dict):
+        """Store the charts of a pending session and mark it as completed"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            payload_id = self._store_payload(cursor, session_data)
+            
+            cursor.execute("""
+                UPDATE analysis_sessions 
+                SET payload_id = ?, status = 'completed' 
+                WHERE id = ? AND status = 'pending'
+            """, (payload_id, session_id))
+            
+            # The session was deleted while queued: keep the payload untouched
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return
+            conn.commit()
+        finally:
+            conn.close()
+        
+        self._maintain_after_save()
+    
+    def mark_session_failed(self, session_id: str, reason: str = ""):
+        """Record that the background write of a session failed"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute(
+                "UPDATE analysis_sessions SET status = 'failed', failure_reason = ? WHERE id = ? AND status = 'pending'",
+                (reason or None, session_id)
+            )
+            conn.commit()
+            conn.close()
+        except sqlite3.Error:
+            # Nothing else can be done from the worker thread
+            pass
+    
+    def _recover_interrupted_sessions(self, cursor):
+        """Mark sessions left pending by a previous process as failed"""
+        cursor.execute("""
+            UPDATE analysis_sessions 
+            SET status = 'failed', failure_reason = 'Interrupted before the charts were written' 
+            WHERE status = 'pending' AND payload_id IS NULL AND charts_data IS NULL
+        """)
+    
+    def duplicate_session(self, session_id: str, new_name: str) -> Optional[str]:
+        """Duplicate a session by sharing its chart payload instead of copying it"""
+        self.persistence_worker.wait_for(session_id)
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
             
+            payload_id = self._ensure_session_payload(cursor, session_id)
+            if payload_id is None:
+                conn.close()
+                return None
+            
+            new_id = str(uuid.uuid4())
+            new_name = self._next_available_name(cursor, new_name)
+            self._name_suggestions.clear()
             cursor.execute("""
                 INSERT INTO analysis_sessions 
                 (id, session_name, original_filename, file_size, created_at, charts_count, 
-                 total_data_points, chart_types, charts_data)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                session_id,
-                session_name,
-                session_data.get('filename', 'Unknown'),
-                session_data.get('file_size', 0),
-                santiago_timestamp,
-                len(session_data.get('charts_generated', [])),
-                total_points,
-                json.dumps(chart_types),
-                charts_json
-            ))
+                 total_data_points, chart_types, status, content_hash, payload_id)
+                SELECT ?, ?, original_filename, file_size, ?, charts_count, 
+                       total_data_points, chart_types, status, content_hash, payload_id
+                FROM analysis_sessions 
+                WHERE id = ?
+            """, (new_id, new_name, self._get_santiago_timestamp(), session_id))
+            cursor.execute(
+                "UPDATE chart_payloads SET ref_count = ref_count + 1 WHERE id = ?",
+                (payload_id,)
+            )
             
             conn.commit()
             conn.close()
             
-            return session_id
-            
+            return new_id
+        
         except Exception as e:
-            st.error(f"Error saving session: {e}")
+            self.notifier.error(f"Error duplicating session: {e}")
             return None
     
     def get_sessions(self) -> List[Dict]:
@@ -189,7 +581,8 @@ class SessionManager:
             
             cursor.execute("""
                 SELECT id, session_name, original_filename, file_size, 
-                       created_at, charts_count, total_data_points, chart_types, is_favorite
+                       created_at, charts_count, total_data_points, chart_types, is_favorite, status,
+                       failure_reason
                 FROM analysis_sessions 
                 ORDER BY is_favorite DESC, created_at DESC
             """)
@@ -205,29 +598,44 @@ class SessionManager:
                     'charts_count': row[5],
                     'total_data_points': row[6],
                     'chart_types': json.loads(row[7]) if row[7] else {},
-                    'is_favorite': bool(row[8])
+                    'is_favorite': bool(row[8]),
+                    'status': row[9] or 'completed',
+                    'failure_reason': row[10]
                 })
             
             conn.close()
             return sessions
             
         except Exception as e:
-            st.error(f"Error loading sessions: {e}")
+            self.notifier.error(f"Error loading sessions: {e}")
             return []
     
     def load_session(self, session_id: str) -> Optional[Dict]:
         """Load a specific session"""
+        self.persistence_worker.wait_for(session_id)
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
-                SELECT session_name, original_filename, charts_data
-                FROM analysis_sessions 
-                WHERE id = ?
+                SELECT s.session_name, s.original_filename, 
+                       COALESCE(p.charts_data, s.charts_data), s.content_hash
+                FROM analysis_sessions s
+                LEFT JOIN chart_payloads p ON p.id = s.payload_id
+                WHERE s.id = ?
             """, (session_id,))
             
             row = cursor.fetchone()
+            
+            # Track access time for least-recently-used eviction
+            if row:
+                cursor.execute(
+                    "UPDATE analysis_sessions SET last_accessed_at = ? WHERE id = ?",
+                    (self._get_santiago_timestamp(), session_id)
+                )
+                conn.commit()
+            conn.close()
+            
             if row:
                 # Deserialize chart data properly
                 charts_data = self._deserialize_chart_data(row[2]) if row[2] else []
@@ -235,33 +643,54 @@ class SessionManager:
                 return {
                     'session_name': row[0],
                     'filename': row[1],
+                    'content_hash': row[3],
                     'charts_generated': charts_data
                 }
             
-            conn.close()
             return None
             
         except Exception as e:
-            st.error(f"Error loading session: {e}")
+            self.notifier.error(f"Error loading session: {e}")
             return None
     
+    def _delete_session_row(self, cursor, session_id: str):
+        """Delete a session row and release its chart payload"""
+        cursor.execute("SELECT payload_id FROM analysis_sessions WHERE id = ?", (session_id,))
+        row = cursor.fetchone()
+        
+        cursor.execute("DELETE FROM analysis_sessions WHERE id = ?", (session_id,))
+        
+        # Shared payloads are only removed when no session references them
+        if row:
+            self._release_payload(cursor, row[0])
+    
     def delete_session(self, session_id: str) -> bool:
         """Delete a session"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute("DELETE FROM analysis_sessions WHERE id = ?", (session_id,))
-            
+            self._delete_session_row(cursor, session_id)
             conn.commit()
+            
+            # Return the freed pages to the file system
+            self._incremental_vacuum(cursor)
             conn.close()
             
             return True
             
         except Exception as e:
-            st.error(f"Error deleting session: {e}")
+            self.notifier.error(f"Error deleting session: {e}")
             return False
     
+    def get_store_version(self) -> tuple:
+        """Get a cheap token that changes whenever the session store file is written"""
+        try:
+            stat = os.stat(self.db_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return (0, 0)
+    
     def get_session_stats(self) -> Dict:
         """Get session statistics"""
         try:
@@ -287,6 +716,9 @@ class SessionManager:
             cursor.execute("SELECT COUNT(*) FROM analysis_sessions WHERE is_favorite = 1")
             favorites_count = cursor.fetchone()[0]
             
+            # Get storage usage
+            storage = self._get_storage_usage(cursor)
+            
             conn.close()
             
             return {
@@ -294,17 +726,21 @@ class SessionManager:
                 'total_charts': total_charts,
                 'total_data_points': total_data_points,
                 'avg_charts_per_session': round(avg_charts, 1),
-                'favorites_count': favorites_count
+                'favorites_count': favorites_count,
+                'db_size_mb': round(storage['file_bytes'] / 1024 / 1024, 2),
+                'fragmentation_pct': round(storage['fragmentation'] * 100, 1)
             }
             
         except Exception as e:
-            st.error(f"Error getting session statistics: {e}")
+            self.notifier.error(f"Error getting session statistics: {e}")
             return {
                 'total_sessions': 0,
                 'total_charts': 0,
                 'total_data_points': 0,
                 'avg_charts_per_session': 0,
-                'favorites_count': 0
+                'favorites_count': 0,
+                'db_size_mb': 0,
+                'fragmentation_pct': 0
             }
     
     def update_session_name(self, session_id: str, new_name: str) -> bool:
@@ -323,10 +759,16 @@ class SessionManager:
             conn.commit()
             conn.close()
             
+            self._name_suggestions.clear()
             return success
             
+        except sqlite3.IntegrityError:
+            # Release the write lock held by the failed update
+            conn.close()
+            self.notifier.error(f"A session named '{new_name}' already exists")
+            return False
         except Exception as e:
-            st.error(f"Error updating session name: {e}")
+            self.notifier.error(f"Error updating session name: {e}")
             return False
     
     def toggle_favorite(self, session_id: str) -> bool:
@@ -360,7 +802,7 @@ class SessionManager:
             return success
             
         except Exception as e:
-            st.error(f"Error toggling favorite: {e}")
+            self.notifier.error(f"Error toggling favorite: {e}")
             return False
     
     def get_favorite_sessions(self) -> List[Dict]:
@@ -371,7 +813,8 @@ class SessionManager:
             
             cursor.execute("""
                 SELECT id, session_name, original_filename, file_size, 
-                       created_at, charts_count, total_data_points, chart_types, is_favorite
+                       created_at, charts_count, total_data_points, chart_types, is_favorite, status,
+                       failure_reason
                 FROM analysis_sessions 
                 WHERE is_favorite = 1
                 ORDER BY created_at DESC
@@ -388,12 +831,179 @@ class SessionManager:
                     'charts_count': row[5],
                     'total_data_points': row[6],
                     'chart_types': json.loads(row[7]) if row[7] else {},
-                    'is_favorite': bool(row[8])
+                    'is_favorite': bool(row[8]),
+                    'status': row[9] or 'completed',
+                    'failure_reason': row[10]
                 })
             
             conn.close()
             return sessions
+        
+        except Exception as e:
+            self.notifier.error(f"Error getting favorite sessions: {e}")
+            return []
+    
+    def _get_storage_usage(self, cursor) -> Dict:
+        """Get file size, live bytes and free-page ratio of the session store"""
+        cursor.execute("PRAGMA page_size")
+        page_size = cursor.fetchone()[0]
+        cursor.execute("PRAGMA page_count")
+        page_count = cursor.fetchone()[0]
+        cursor.execute("PRAGMA freelist_count")
+        freelist_count = cursor.fetchone()[0]
+        
+        return {
+            'file_bytes': page_count * page_size,
+            'used_bytes': (page_count - freelist_count) * page_size,
+            'fragmentation': freelist_count / page_count if page_count else 0
+        }
+    
+    def _incremental_vacuum(self, cursor) -> int:
+        """Release free pages back to the file system and return how many were freed"""
+        cursor.execute("PRAGMA freelist_count")
+        free_before = cursor.fetchone()[0]
+        
+        # executescript steps the pragma to completion; execute() frees a single page
+        pages = int(self.retention_policy.get('vacuum_pages') or 0)
+        if pages > 0:
+            cursor.executescript(f"PRAGMA incremental_vacuum({pages});")
+        else:
+            cursor.executescript("PRAGMA incremental_vacuum;")
+        
+        cursor.execute("PRAGMA freelist_count")
+        return free_before - cursor.fetchone()[0]
+    
+    def _select_evictable_sessions(self, cursor, extra_filter: str = "", params: tuple = ()) -> List[str]:
+        """List finished sessions that retention may delete, least recently used first"""
+        favorite_filter = "AND is_favorite = 0" if self.retention_policy.get('keep_favorites', True) else ""
+        cursor.execute(f"""
+            SELECT id FROM analysis_sessions 
+            WHERE status != 'pending' {favorite_filter} {extra_filter}
+            ORDER BY COALESCE(last_accessed_at, created_at) ASC
+        """, params)
+        return [row[0] for row in cursor.fetchall()]
+    
+    def cleanup_orphan_payloads(self, cursor) -> int:
+        """Recount payload references and delete payloads no session uses"""
+        cursor.execute("""
+            UPDATE chart_payloads 
+            SET ref_count = (
+                SELECT COUNT(*) FROM analysis_sessions 
+                WHERE analysis_sessions.payload_id = chart_payloads.id
+            )
+        """)
+        cursor.execute("DELETE FROM chart_payloads WHERE ref_count <= 0")
+        return cursor.rowcount
+    
+    def _maintain_after_save(self):
+        """Run maintenance after a save only when a retention rule is set and the interval has passed"""
+        policy = self.retention_policy
+        if not any(policy.get(rule) for rule in ('max_age_days', 'max_sessions', 'max_size_mb')):
+            return
+        interval = (policy.get('maintenance_interval_minutes') or 0) * 60
+        if self._last_maintenance is not None and time.monotonic() - self._last_maintenance < interval:
+            return
+        self.run_maintenance()
+    
+    def _get_reclaimable_bytes(self, cursor, session_ids: List[str]) -> int:
+        """Get the chart bytes, shared or legacy inline, that deleting the given sessions could free"""
+        if not session_ids:
+            return 0
+        placeholders = ",".join("?" * len(session_ids))
+        cursor.execute(f"""
+            SELECT COALESCE((
+                SELECT SUM(length(charts_data)) FROM chart_payloads 
+                WHERE id IN (SELECT payload_id FROM analysis_sessions WHERE id IN ({placeholders}))
+            ), 0) + COALESCE((
+                SELECT SUM(length(charts_data)) FROM analysis_sessions WHERE id IN ({placeholders})
+            ), 0)
+        """, tuple(session_ids) * 2)
+        return cursor.fetchone()[0]
+    
+    def _get_session_overhead_bytes(self, cursor, used_bytes: int) -> float:
+        """Estimate the bytes each session takes besides its charts (row, indexes), as an even share"""
+        cursor.execute("""
+            SELECT COUNT(*), COALESCE(SUM(length(charts_data)), 0) 
+                + (SELECT COALESCE(SUM(length(charts_data)), 0) FROM chart_payloads)
+            FROM analysis_sessions
+        """)
+        session_count, chart_bytes = cursor.fetchone()
+        return max(used_bytes - chart_bytes, 0) / session_count if session_count else 0.0
+    
+    def run_maintenance(self) -> Dict:
+        """Apply retention rules, enforce the size budget and reclaim free space"""
+        report = {'expired': 0, 'trimmed': 0, 'evicted': 0, 'orphans': 0, 'pages_reclaimed': 0}
+        policy = self.retention_policy
+        
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
             
+            # Retention by age
+            if policy.get('max_age_days'):
+                cutoff = datetime.now(self.timezone) - timedelta(days=policy['max_age_days'])
+                expired = self._select_evictable_sessions(
+                    cursor, "AND substr(created_at, 1, 19) < ?", (cutoff.strftime("%Y-%m-%d %H:%M:%S"),)
+                )
+                for session_id in expired:
+                    self._delete_session_row(cursor, session_id)
+                report['expired'] = len(expired)
+            
+            # Retention by count
+            if policy.get('max_sessions'):
+                cursor.execute("SELECT COUNT(*) FROM analysis_sessions")
+                excess = cursor.fetchone()[0] - policy['max_sessions']
+                if excess > 0:
+                    trimmed = self._select_evictable_sessions(cursor)[:excess]
+                    for session_id in trimmed:
+                        self._delete_session_row(cursor, session_id)
+                    report['trimmed'] = len(trimmed)
+            
+            report['orphans'] = self.cleanup_orphan_payloads(cursor)
+            conn.commit()
+            
+            # Size budget: evict least recently used sessions until live data fits
+            if policy.get('max_size_mb'):
+                budget_bytes = policy['max_size_mb'] * 1024 * 1024
+                used_bytes = self._get_storage_usage(cursor)['used_bytes']
+                if used_bytes > budget_bytes:
+                    # Sessions sharing their payload with another session free nothing when deleted
+                    candidates = self._select_evictable_sessions(cursor, """
+                        AND NOT EXISTS (
+                            SELECT 1 FROM analysis_sessions AS other 
+                            WHERE other.payload_id = analysis_sessions.payload_id 
+                            AND other.id != analysis_sessions.id
+                        )
+                    """)
+                    
+                    # Protected sessions alone exceed the budget: deleting the rest would not help
+                    overhead_bytes = self._get_session_overhead_bytes(cursor, used_bytes)
+                    reclaimable_bytes = self._get_reclaimable_bytes(cursor, candidates) + overhead_bytes * len(candidates)
+                    if used_bytes - reclaimable_bytes > budget_bytes:
+                        logger.warning("Session store exceeds its %s MB budget with sessions that cannot be evicted",
+                                       policy['max_size_mb'])
+                        candidates = []
+                    
+                    # Deleting a small session may free no whole page: estimate the bytes each deletion
+                    # releases, then re-measure the pages and continue while the store is still over budget
+                    next_candidate = 0
+                    while next_candidate < len(candidates) and used_bytes > budget_bytes:
+                        overhead_bytes = self._get_session_overhead_bytes(cursor, used_bytes)
+                        expected_bytes = used_bytes
+                        while next_candidate < len(candidates) and expected_bytes > budget_bytes:
+                            session_id = candidates[next_candidate]
+                            next_candidate += 1
+                            expected_bytes -= self._get_reclaimable_bytes(cursor, [session_id]) + overhead_bytes
+                            self._delete_session_row(cursor, session_id)
+                            report['evicted'] += 1
+                        conn.commit()
+                        used_bytes = self._get_storage_usage(cursor)['used_bytes']
+            
+            report['pages_reclaimed'] = self._incremental_vacuum(cursor)
+            conn.close()
+            self._last_maintenance = time.monotonic()
+        
         except Exception as e:
-            st.error(f"Error getting favorite sessions: {e}")
-            return [] 
\ No newline at end of file
+            logger.warning("Session store maintenance failed: %s", e)
+        
+        return report
@@ -0,0 +1,102 @@
+import atexit
+import logging
+import queue
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class SessionPersistenceWorker:
+    """Write analysis sessions to the session store from a background thread"""
+    
+    def __init__(self, shutdown_timeout: float = 30.0):
+        self.shutdown_timeout = shutdown_timeout
+        self._queue = queue.Queue()
+        self._pending = {}  # session_id -> threading.Event set when the write finishes
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+    
+    def start(self):
+        """Start the worker thread if it is not running yet"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(
+                target=self._run, name="session-persistence", daemon=True
+            )
+            self._thread.start()
+    
+    def submit(self, session_manager, session_id: str, session_data: Dict):
+        """Queue the chart payload of an already registered session for writing"""
+        with self._lock:
+            self._pending[session_id] = threading.Event()
+        self.start()
+        self._queue.put((session_manager, session_id, session_data))
+    
+    def is_pending(self, session_id: str) -> bool:
+        """Check whether a session is still waiting to be written"""
+        with self._lock:
+            return session_id in self._pending
+    
+    def wait_for(self, session_id: str, timeout: Optional[float] = None) -> bool:
+        """Block until a queued session has been written"""
+        with self._lock:
+            done_event = self._pending.get(session_id)
+        if done_event is None:
+            return True
+        return done_event.wait(timeout)
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued session has been written"""
+        with self._lock:
+            events = list(self._pending.values())
+        for done_event in events:
+            if not done_event.wait(timeout):
+                return False
+        return True
+    
+    def shutdown(self):
+        """Flush queued sessions and stop the worker thread"""
+        with self._lock:
+            thread = self._thread
+            if thread is None or self._stopped:
+                return
+            self._stopped = True
+        
+        self._queue.put(None)
+        thread.join(self.shutdown_timeout)
+        if thread.is_alive():
+            logger.warning("Session persistence did not finish within %.0fs", self.shutdown_timeout)
+    
+    def _run(self):
+        """Worker loop: persist queued sessions until the shutdown sentinel arrives"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            
+            session_manager, session_id, session_data = item
+            try:
+                session_manager.write_session_payload(session_id, session_data)
+            except Exception as e:
+                logger.exception("Error persisting session %s", session_id)
+                session_manager.mark_session_failed(session_id, str(e))
+            finally:
+                with self._lock:
+                    done_event = self._pending.pop(session_id, None)
+                if done_event is not None:
+                    done_event.set()
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def get_persistence_worker() -> SessionPersistenceWorker:
+    """Get the process-wide persistence worker, flushed when the interpreter exits"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = SessionPersistenceWorker()
+            atexit.register(_worker.shutdown)
+        return _worker
@@ -0,0 +1,127 @@
+import sqlite3
+from itertools import chain
+from typing import Iterator, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 65536
+
+def iter_xy_chunks(connection: sqlite3.Connection, table_name: str,
+                   chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Yield the numeric (ValueX, ValueY) columns of a table chunk by chunk; memory stays at one chunk"""
+    cursor = connection.execute(f'SELECT ValueX, ValueY FROM "{table_name}"')
+    cursor.arraysize = chunk_rows
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            break
+        
+        try:
+            # Flat iterator straight into the array, without an intermediate list of floats
+            chunk = np.fromiter(chain.from_iterable(rows), dtype=float, count=2 * len(rows)).reshape(-1, 2)
+        except (TypeError, ValueError):
+            # NULL or text that is not a number: coerce like pd.to_numeric, invalid values become NaN
+            chunk = pd.DataFrame(rows).apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        yield chunk[:, 0], chunk[:, 1]
+
+def read_xy_arrays(connection: sqlite3.Connection, table_name: str, expected_rows: int = 0,
+                   chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+    """Read the full (ValueX, ValueY) columns into two float arrays preallocated from the row estimate"""
+    x = np.empty(max(expected_rows, chunk_rows))
+    y = np.empty_like(x)
+    count = 0
+    for chunk_x, chunk_y in iter_xy_chunks(connection, table_name, chunk_rows):
+        end = count + chunk_x.size
+        if end > x.size:
+            # The row estimate was short: grow geometrically
+            x = np.resize(x, max(end, 2 * x.size))
+            y = np.resize(y, x.size)
+        x[count:end] = chunk_x
+        y[count:end] = chunk_y
+        count = end
+    return x[:count], y[:count]
+
+def read_x_bounds(connection: sqlite3.Connection, table_name: str) -> Optional[Tuple[float, float]]:
+    """Get the range of the numeric ValueX values, scanned inside SQLite"""
+    row = connection.execute(
+        f'SELECT MIN(ValueX), MAX(ValueX) FROM "{table_name}" WHERE typeof(ValueX) IN (\'integer\', \'real\')'
+    ).fetchone()
+    if row is None or row[0] is None:
+        return None
+    return float(row[0]), float(row[1])
+
+class MinMaxDecimator:
+    """Streaming min-max reduction onto fixed ValueX buckets; memory follows the buckets, not the rows"""
+    
+    def __init__(self, x_min: float, x_max: float, buckets: int):
+        self.x_min = x_min
+        self.buckets = max(1, buckets)
+        self.scale = self.buckets / (x_max - x_min) if x_max > x_min else 0.0
+        self.rows = 0
+        self.min_x = np.full(self.buckets, np.nan)
+        self.min_y = np.full(self.buckets, np.inf)
+        self.max_x = np.full(self.buckets, np.nan)
+        self.max_y = np.full(self.buckets, -np.inf)
+    
+    def update(self, x: np.ndarray, y: np.ndarray):
+        """Fold one chunk of points into the buckets"""
+        valid = np.isfinite(x) & np.isfinite(y)
+        x = x[valid]
+        y = y[valid]
+        if x.size == 0:
+            return
+        self.rows += x.size
+        
+        # Values outside the bounds (e.g. stored as text) fall into the edge buckets
+        index = np.clip(((x - self.x_min) * self.scale).astype(np.intp), 0, self.buckets - 1)
+        
+        # Sorted by bucket, then value: the first row of each bucket is its minimum, the last its maximum
+        order = np.lexsort((y, index))
+        sorted_index = index[order]
+        boundary = sorted_index[1:] != sorted_index[:-1]
+        lowest = order[np.concatenate(([True], boundary))]
+        highest = order[np.concatenate((boundary, [True]))]
+        hit = index[lowest]
+        
+        lower = y[lowest] < self.min_y[hit]
+        self.min_y[hit[lower]] = y[lowest[lower]]
+        self.min_x[hit[lower]] = x[lowest[lower]]
+        higher = y[highest] > self.max_y[hit]
+        self.max_y[hit[higher]] = y[highest[higher]]
+        self.max_x[hit[higher]] = x[highest[higher]]
+    
+    def result(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the kept points sorted by ValueX, each bucket's extremes once"""
+        filled = np.isfinite(self.min_y)
+        x = np.concatenate((self.min_x[filled], self.max_x[filled]))
+        y = np.concatenate((self.min_y[filled], self.max_y[filled]))
+        order = np.lexsort((y, x))
+        x = x[order]
+        y = y[order]
+        
+        # A bucket with a single point has it as both extremes
+        distinct = np.ones(x.size, dtype=bool)
+        distinct[1:] = (x[1:] != x[:-1]) | (y[1:] != y[:-1])
+        return x[distinct], y[distinct]
+
+def read_decimated_xy(connection: sqlite3.Connection, table_name: str, max_points: int,
+                      chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Stream a table through a min-max decimator: (x, y) of at most max_points points and the rows read"""
+    bounds = read_x_bounds(connection, table_name)
+    if bounds is None:
+        # No numeric storage at all: one extra pass to find the range of the coerced values
+        x_min, x_max = np.inf, -np.inf
+        for chunk_x, _ in iter_xy_chunks(connection, table_name, chunk_rows):
+            finite = chunk_x[np.isfinite(chunk_x)]
+            if finite.size:
+                x_min = min(x_min, finite.min())
+                x_max = max(x_max, finite.max())
+        if x_min > x_max:
+            return np.array([]), np.array([]), 0
+        bounds = (x_min, x_max)
+    
+    decimator = MinMaxDecimator(*bounds, max_points // 2)
+    for chunk_x, chunk_y in iter_xy_chunks(connection, table_name, chunk_rows):
+        decimator.update(chunk_x, chunk_y)
+    x, y = decimator.result()
+    return x, y, decimator.rows
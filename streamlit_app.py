@@ -1,14 +1,21 @@
 import streamlit as st
+import html
 import os
+import shutil
 import tempfile
 from pathlib import Path
 import time
-from database_handler import DatabaseHandler
-from data_processor import DataProcessor
-from chart_generator import ChartGenerator
+import uuid
 from report_generator import ReportGenerator
-from session_manager import SessionManager
+from session_manager import SessionManager, read_retention_policy
 from chart_viewer import ChartViewer
+from data_processor import DataProcessor
+from chart_generator import ChartGenerator
+from job_runner import JobRegistry, get_job_registry
+from analysis_pipeline import PIPELINE_VERSION
+from progress_estimate import format_eta
+from comparison import build_comparison_charts, compute_comparison_hash, get_comparison_ingestor
+from instrumentation import get_render_timer
 
 # Page configuration
 st.set_page_config(
@@ -460,6 +467,40 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_session_manager() -> SessionManager:
+    """Session store shared by every browser session of this process, with the configured retention policy"""
+    try:
+        settings = st.secrets.get("retention", {})
+    except FileNotFoundError:
+        settings = {}  # No secrets.toml: environment variables and defaults only
+    return SessionManager(retention_policy=read_retention_policy(settings))
+
+@st.cache_resource
+def get_data_processor() -> DataProcessor:
+    """Shared table processor"""
+    return DataProcessor()
+
+@st.cache_resource
+def get_chart_generator() -> ChartGenerator:
+    """Shared chart generator"""
+    return ChartGenerator()
+
+@st.cache_resource
+def get_analysis_registry() -> JobRegistry:
+    """Background job registry sharing the cached chart components"""
+    return get_job_registry(get_data_processor(), get_chart_generator())
+
+@st.cache_data(ttl=300, max_entries=16, show_spinner=False)
+def load_session_stats(store_version: tuple) -> dict:
+    """Session store statistics, recomputed only when the store file changes"""
+    return get_session_manager().get_session_stats()
+
+@st.cache_data(ttl=300, max_entries=16, show_spinner=False)
+def load_session_list(store_version: tuple) -> list:
+    """Saved sessions, reloaded only when the store file changes"""
+    return get_session_manager().get_sessions()
+
 def initialize_session_state():
     """Initialize session state variables"""
     if 'processing_status' not in st.session_state:
@@ -473,11 +514,17 @@ def initialize_session_state():
     if 'current_session_id' not in st.session_state:
         st.session_state.current_session_id = None
     if 'session_manager' not in st.session_state:
-        st.session_state.session_manager = SessionManager()
+        st.session_state.session_manager = get_session_manager()
     if 'chart_viewer' not in st.session_state:
         st.session_state.chart_viewer = ChartViewer(charts_per_page=8)  # Reduced for better performance
     if 'view_mode' not in st.session_state:
         st.session_state.view_mode = "new_analysis"  # "new_analysis", "view_session", "session_list"
+    if 'charts_key' not in st.session_state:
+        st.session_state.charts_key = None  # identifies charts_generated for the derived data caches
+    if 'active_job_id' not in st.session_state:
+        st.session_state.active_job_id = None  # content hash of the background analysis being followed
+    if 'browser_session_id' not in st.session_state:
+        st.session_state.browser_session_id = str(uuid.uuid4())  # subscriber id of this tab in the job registry
 
 def render_header():
     """Render the main header"""
@@ -501,7 +548,7 @@ def render_navigation():
     with col2:
         if st.button("📊 Ver Sesión Actual", use_container_width=True,
                     type="primary" if st.session_state.view_mode == "view_session" else "secondary",
-                    disabled=not st.session_state.charts_generated):
+                    disabled=not (st.session_state.charts_generated or st.session_state.active_job_id)):
             st.session_state.view_mode = "view_session"
             st.rerun()
     
@@ -513,7 +560,7 @@ def render_navigation():
     
     with col4:
         # Session stats
-        stats = st.session_state.session_manager.get_session_stats()
+        stats = load_session_stats(st.session_state.session_manager.get_store_version())
         st.metric("💾 Sesiones Guardadas", stats['total_sessions'])
 
 def render_sidebar():
@@ -522,7 +569,7 @@ def render_sidebar():
         st.markdown("### ℹ️ Información del Sistema")
         
         # Session statistics
-        stats = st.session_state.session_manager.get_session_stats()
+        stats = load_session_stats(st.session_state.session_manager.get_store_version())
         
         st.markdown(f"""
         <div class="session-card">
@@ -532,9 +579,17 @@ def render_sidebar():
             <p><strong>Gráficos:</strong> {stats['total_charts']:,}</p>
             <p><strong>Datos:</strong> {stats['total_data_points']:,} puntos</p>
             <p><strong>Promedio:</strong> {stats['avg_charts_per_session']} gráficos/sesión</p>
+            <p><strong>Almacenamiento:</strong> {stats['db_size_mb']:.2f} MB</p>
+            <p><strong>Fragmentación:</strong> {stats['fragmentation_pct']:.1f}%</p>
         </div>
         """, unsafe_allow_html=True)
         
+        if st.button("🧹 Optimizar almacenamiento", use_container_width=True,
+                     help="Aplica la política de retención y libera el espacio no utilizado"):
+            report = st.session_state.session_manager.run_maintenance()
+            removed = report['expired'] + report['trimmed'] + report['evicted']
+            st.success(f"✅ {removed} sesiones eliminadas • {report['pages_reclaimed']} páginas liberadas")
+        
         st.markdown("""
         <div class="feature-card">
             <h4>🔧 Características Principales</h4>
@@ -588,6 +643,10 @@ def render_sidebar():
             </div>
             """, unsafe_allow_html=True)
         
+        # Render timings for diagnostics (open the app with ?perf=1)
+        if st.query_params.get("perf") == "1":
+            render_performance_panel()
+        
         # Help section
         st.markdown("""
         <div class="feature-card">
@@ -615,27 +674,46 @@ def render_sidebar():
         </div>
         """, unsafe_allow_html=True)
 
+def render_performance_panel():
+    """Show rerun latency per scope collected by the render timer"""
+    summary = get_render_timer().summary()
+    scope_labels = {
+        'app': "Página completa",
+        'chart_overview': "Galería de gráficos"
+    }
+    with st.expander("⏱️ Tiempos de renderizado", expanded=True):
+        if not summary:
+            st.caption("Sin mediciones todavía")
+        for scope, timing in summary.items():
+            st.markdown(
+                f"**{scope_labels.get(scope, scope)}:** {timing['median_ms']:.0f} ms mediana • "
+                f"{timing['max_ms']:.0f} ms máx • {timing['count']} ejecuciones"
+            )
+        if st.button("🔄 Reiniciar mediciones", use_container_width=True):
+            get_render_timer().reset()
+
 def render_file_upload():
     """Render file upload section"""
     st.markdown("""
     <div class="step-indicator">
         <span class="step-number">1</span>
-        <strong>Seleccionar Base de Datos .hfpdb</strong>
+        <strong>Seleccionar Base de Datos .hfpdb / .HA1S</strong>
     </div>
     """, unsafe_allow_html=True)
     
     # Add information about supported file types
     st.markdown("""
     <div style="margin-bottom: 1rem;">
-        <p>📁 <strong>Formato de base de datos soportado:</strong></p>
+        <p>📁 <strong>Formatos de base de datos soportados:</strong></p>
         <span class="info-badge">.hfpdb</span>
+        <span class="info-badge">.HA1S</span>
     </div>
     """, unsafe_allow_html=True)
     
     uploaded_file = st.file_uploader(
-        "Seleccione su archivo de base de datos .hfpdb",
-        type=['hfpdb'],
-        help="Formato soportado: .hfpdb (base de datos SQLite especializada)"
+        "Seleccione su archivo de base de datos .hfpdb o .HA1S",
+        type=['hfpdb', 'ha1s'],
+        help="Formatos soportados: .hfpdb (base de datos SQLite especializada) y .HA1S (resultados de armónicos ETAP)"
     )
     
     if uploaded_file is not None:
@@ -691,144 +769,341 @@ def render_file_upload():
     return False
 
 def process_database(uploaded_file):
-    """Process the uploaded database file with optimizations"""
-    # Save uploaded file to temporary location
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp_file:
-        tmp_file.write(uploaded_file.getvalue())
-        temp_db_path = tmp_file.name
+    """Start the background analysis of the uploaded database"""
+    session_manager = st.session_state.session_manager
+    
+    # Identical uploads reuse the charts already stored for their content
+    content_hash = session_manager.compute_content_hash(uploaded_file, PIPELINE_VERSION)
+    cached_charts = session_manager.load_charts_by_hash(content_hash)
+    if cached_charts:
+        st.info("♻️ Este archivo ya fue analizado: reutilizando los gráficos guardados")
+        return finalize_analysis(uploaded_file.name, uploaded_file.size, content_hash,
+                                 cached_charts, len(cached_charts), 0)
+    
+    job_registry = get_analysis_registry()
+    custom_name = getattr(st.session_state, 'custom_session_name', None)
+    job = job_registry.get_job(content_hash)
     
     try:
-        # Initialize components
-        db_handler = DatabaseHandler(temp_db_path)
-        data_processor = DataProcessor()
-        chart_generator = ChartGenerator()
-        
-        # Connect to database
-        if not db_handler.connect():
-            st.error("❌ No se pudo conectar a la base de datos")
-            return False
-        
-        # Get tables
-        table_names = db_handler.get_table_names()
-        if not table_names:
-            st.error("❌ No se encontraron tablas en la base de datos")
-            return False
-        
-        # Enhanced info display
+        if job is not None and job.can_resume:
+            # A stopped analysis of the same content continues where it left off
+            job.session_name = custom_name or job.session_name
+            job_registry.resume(content_hash, session_manager, st.session_state.browser_session_id)
+        elif job is None or not job.is_active:
+            # The worker reads a private copy so the upload can change meanwhile
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp_file:
+                shutil.copyfileobj(uploaded_file, tmp_file)
+                temp_db_path = tmp_file.name
+            uploaded_file.seek(0)
+            
+            job = job_registry.submit(content_hash, uploaded_file.name, uploaded_file.size,
+                                      temp_db_path, session_manager, custom_name,
+                                      st.session_state.browser_session_id)
+    except Exception as e:
+        st.error(f"❌ Error iniciando el procesamiento: {e}")
+        return False
+    
+    st.session_state.active_job_id = job.job_id
+    st.session_state.current_session_id = None
+    
+    # Clean up the custom name
+    if hasattr(st.session_state, 'custom_session_name'):
+        delattr(st.session_state, 'custom_session_name')
+    
+    return True
+
+def get_active_job():
+    """Get the background analysis followed by this browser session"""
+    job = get_analysis_registry().get_job(st.session_state.active_job_id)
+    if job is None:
+        st.session_state.active_job_id = None
+    return job
+
+def complete_analysis_job(job):
+    """Move the results of a finished background job into the current session"""
+    status = job.get_status()
+    st.session_state.charts_generated = job.get_partial_charts()
+    st.session_state.charts_key = job.job_id
+    st.session_state.current_session_id = status['session_id']
+    st.session_state.processing_status = "completed"
+    st.session_state.view_mode = "view_session"
+    st.session_state.active_job_id = None
+    get_analysis_registry().release(job.job_id, st.session_state.browser_session_id)
+
+@st.fragment(run_every=1.0)
+def render_analysis_job_progress():
+    """Poll the running background analysis and show its progress"""
+    job = get_active_job()
+    if job is None:
+        return
+    
+    status = job.get_status()
+    if not job.is_active:
+        # Finished, cancelled or failed: redraw the whole page for the new state
+        if status['status'] == "completed":
+            complete_analysis_job(job)
+        st.rerun()
+    
+    st.markdown("### 🔄 Procesando Tablas")
+    st.progress(status['progress'])
+    if status['current_table']:
+        st.markdown(f"**📊 Procesando:** `{status['current_table']}` "
+                    f"({status['done_tables'] + 1}/{status['total_tables']})")
+    else:
+        st.markdown("**📂 Preparando base de datos...**")
+    eta = (f"{format_eta(status['eta_seconds'])} restantes" if status['eta_seconds'] is not None
+           else "calculando tiempo restante")
+    st.markdown(f"**Progreso:** {status['progress']*100:.1f}% completado • ⏱️ {eta} • "
+                f"📊 {status['processed_count']} gráficos • ⏭️ {status['skipped_count']} omitidas")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("👁️ Ver resultados parciales", use_container_width=True,
+                     disabled=status['processed_count'] == 0, key="job_view_partial"):
+            st.session_state.view_mode = "view_session"
+            st.rerun()
+    with col2:
+        if st.button("⏹️ Cancelar análisis", use_container_width=True, key="job_cancel"):
+            get_analysis_registry().cancel(job.job_id)
+            st.info("⏹️ Cancelando después de la tabla actual...")
+
+def render_analysis_job():
+    """Render the background analysis of this browser session, if any"""
+    job = get_active_job()
+    if job is None:
+        return
+    
+    if job.is_active:
+        render_analysis_job_progress()
+        return
+    
+    status = job.get_status()
+    if status['status'] == "completed":
+        complete_analysis_job(job)
+        st.rerun()
+    
+    st.session_state.processing_status = "ready"
+    if status['status'] == "failed":
+        st.error(f"❌ Error durante el procesamiento: {status['error']}")
+    else:
         st.markdown(f"""
-        <div class="success-message">
-            🔍 <strong>Base de datos analizada exitosamente</strong><br>
-            <small>Encontradas {len(table_names)} tablas para procesar</small>
+        <div class="warning-message">
+            ⏹️ <strong>Análisis cancelado</strong><br>
+            <small>{status['done_tables']}/{status['total_tables']} tablas procesadas •
+            📊 {status['processed_count']} gráficos generados</small>
         </div>
         """, unsafe_allow_html=True)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("▶️ Reanudar", use_container_width=True, type="primary",
+                     disabled=not job.can_resume, key="job_resume"):
+            get_analysis_registry().resume(job.job_id, st.session_state.session_manager,
+                                           st.session_state.browser_session_id)
+            st.session_state.processing_status = "processing"
+            st.rerun()
+    with col2:
+        if st.button("👁️ Ver resultados parciales", use_container_width=True,
+                     disabled=status['processed_count'] == 0, key="job_stopped_view_partial"):
+            st.session_state.view_mode = "view_session"
+            st.rerun()
+    with col3:
+        if st.button("🗑️ Descartar", use_container_width=True, key="job_discard"):
+            get_analysis_registry().release(job.job_id, st.session_state.browser_session_id)
+            st.session_state.active_job_id = None
+            st.session_state.processing_status = "ready"
+            st.rerun()
+
+def render_detached_jobs():
+    """List background analyses not followed by this browser session (e.g. after a refresh)"""
+    jobs = [job for job in get_analysis_registry().list_jobs()
+            if job.job_id != st.session_state.active_job_id and job.status != "completed"]
+    if not jobs:
+        return
+    
+    st.markdown("#### ⏳ Análisis en segundo plano")
+    for job in jobs:
+        status = job.get_status()
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.markdown(f"**{job.filename}** • {status['status']} • "
+                        f"{status['done_tables']}/{status['total_tables']} tablas")
+        with col2:
+            if st.button("📡 Seguir", key=f"attach_job_{job.job_id}", use_container_width=True):
+                get_analysis_registry().attach(job.job_id, st.session_state.browser_session_id)
+                st.session_state.active_job_id = job.job_id
+                st.session_state.processing_status = "processing"
+                st.rerun()
+
+def render_comparison_upload():
+    """Render the multi-file upload of the comparative analysis"""
+    st.markdown("""
+    <div class="step-indicator">
+        <span class="step-number">1</span>
+        <strong>Seleccionar Casos de Estudio a Comparar</strong>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    uploaded_files = st.file_uploader(
+        "Seleccione dos o más archivos .hfpdb o .HA1S",
+        type=['hfpdb', 'ha1s'],
+        accept_multiple_files=True,
+        help="Las tablas con el mismo nombre se superponen en un solo gráfico por tabla; "
+             "en archivos .HA1S, un gráfico por elemento (barra, rama o fuente)",
+        key="comparison_uploader"
+    )
+    
+    if not uploaded_files:
+        return []
+    
+    if len(uploaded_files) < 2:
+        st.info("📑 Agregue al menos un archivo más para comparar")
+        return []
+    
+    total_size = sum(uploaded_file.size for uploaded_file in uploaded_files) / 1024 / 1024  # MB
+    st.markdown(f"""
+    <div class="success-message">
+        ✅ <strong>{len(uploaded_files)} archivos cargados</strong> ({total_size:.2f} MB):
+        {", ".join(uploaded_file.name for uploaded_file in uploaded_files)}
+    </div>
+    """, unsafe_allow_html=True)
+    return uploaded_files
+
+def render_comparison_analysis():
+    """Render the comparative analysis workflow"""
+    uploaded_files = render_comparison_upload()
+    if not uploaded_files or st.session_state.processing_status != "ready":
+        return
+    
+    st.markdown("""
+    <div class="step-indicator">
+        <span class="step-number">2</span>
+        <strong>Comparar y Generar Gráficos Superpuestos</strong>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        suggested_name = st.session_state.session_manager.generate_session_name_suggestion(
+            f"Comparación {Path(uploaded_files[0].name).stem} (+{len(uploaded_files) - 1})"
+        )
+        session_name = st.text_input(
+            "📝 Nombre de la sesión (opcional)",
+            value=suggested_name,
+            help="Deja el nombre sugerido o personalízalo como prefieras",
+            key="comparison_session_name_input"
+        )
         
-        # Sort tables
-        sorted_tables = data_processor.get_sorted_table_list(table_names)
-        
-        # Progress tracking with enhanced visuals
-        st.markdown("### 🔄 Procesando Tablas")
-        progress_container = st.container()
-        
-        with progress_container:
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            progress_info = st.empty()
-            
-        charts_data = []
-        processed_count = 0
-        skipped_count = 0
-        
-        # Process each table with optimizations
-        for i, table_name in enumerate(sorted_tables):
-            progress = (i + 1) / len(sorted_tables)
-            progress_bar.progress(progress)
-            status_text.markdown(f"**📊 Procesando:** `{table_name}` ({i+1}/{len(sorted_tables)})")
-            progress_info.markdown(f"**Progreso:** {progress*100:.1f}% completado")
-            
-            # Read table data
-            df = db_handler.read_table(table_name)
-            if df is None:
-                skipped_count += 1
-                continue
-            
-            # Prepare data for plotting
-            df_prepared, is_valid = data_processor.prepare_dataframe_for_plotting(df, table_name)
-            if not is_valid:
-                skipped_count += 1
-                continue
-            
-            # Determine chart type
-            chart_type = data_processor.get_table_type(table_name)
-            
-            # Create chart with grid height for better performance
-            figure = chart_generator.create_chart(df_prepared, table_name, chart_type, height=300)
-            if figure is None:
-                skipped_count += 1
-                continue
-            
-            # Get chart info
-            chart_info = chart_generator.get_chart_info(df_prepared)
-            
-            # Store chart data
-            charts_data.append({
-                'table_name': table_name,
-                'figure': figure,
-                'type': chart_type,
-                'info': chart_info
-            })
-            
-            processed_count += 1
-        
-        # Clean up
-        db_handler.disconnect()
-        os.unlink(temp_db_path)
-        
-        # Update session state
-        st.session_state.charts_generated = charts_data
-        st.session_state.processing_status = "completed"
+        st.markdown("<br>", unsafe_allow_html=True)
         
-        # Save session automatically
-        session_data = {
-            'filename': uploaded_file.name,
-            'file_size': len(uploaded_file.getvalue()),
-            'charts_generated': charts_data
-        }
+        if st.button("🔀 Comparar Bases de Datos", type="primary", use_container_width=True):
+            st.session_state.processing_status = "processing"
+            st.session_state.custom_session_name = session_name if session_name.strip() else None
+            if process_comparison(uploaded_files):
+                st.session_state.view_mode = "view_session"
+                st.rerun()
+            else:
+                st.session_state.processing_status = "ready"
+
+def process_comparison(uploaded_files) -> bool:
+    """Ingest several databases concurrently and overlay their same-named tables"""
+    session_manager = st.session_state.session_manager
+    filename = " vs ".join(uploaded_file.name for uploaded_file in uploaded_files)
+    file_size = sum(uploaded_file.size for uploaded_file in uploaded_files)
+    content_hash = compute_comparison_hash(
+        [session_manager.compute_content_hash(uploaded_file, PIPELINE_VERSION) for uploaded_file in uploaded_files]
+    )
+    
+    cached_charts = session_manager.load_charts_by_hash(content_hash)
+    if cached_charts:
+        st.info("♻️ Esta comparación ya fue analizada: reutilizando los gráficos guardados")
+        return finalize_analysis(filename, file_size, content_hash, cached_charts, len(cached_charts), 0)
+    
+    temp_paths = []
+    try:
+        # Every file is read from a private copy by the shared ingestion pool
+        ingestor = get_comparison_ingestor()
+        futures = []
+        for uploaded_file in uploaded_files:
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp_file:
+                shutil.copyfileobj(uploaded_file, tmp_file)
+                temp_paths.append(tmp_file.name)
+            uploaded_file.seek(0)
+            futures.append(ingestor.submit(temp_paths[-1], Path(uploaded_file.name).stem))
         
-        # Use custom session name if provided
-        custom_name = getattr(st.session_state, 'custom_session_name', None)
-        session_id = st.session_state.session_manager.save_session(session_data, custom_name)
-        if session_id:
-            st.session_state.current_session_id = session_id
-            st.success(f"💾 Sesión guardada automáticamente (ID: {session_id[:8]}...)")
+        progress_bar = st.progress(0.0)
+        status_text = st.empty()
+        ingested = []
+        for index, future in enumerate(futures):
+            ingested.append(future.result())
+            progress_bar.progress((index + 1) / (len(futures) + 1))
+            status_text.markdown(f"**📂 Archivos leídos:** {index + 1}/{len(futures)}")
         
-        # Clean up the custom name
-        if hasattr(st.session_state, 'custom_session_name'):
-            delattr(st.session_state, 'custom_session_name')
+        for item in ingested:
+            if item['error']:
+                st.warning(f"⚠️ {item['label']}: {item['error']}")
+            elif not item['tables']:
+                st.warning(f"⚠️ {item['label']}: sin tablas graficables")
         
-        # Final status
+        status_text.markdown("**🔀 Alineando tablas entre archivos...**")
+        charts_data, left_out = build_comparison_charts(ingested, get_chart_generator())
         progress_bar.progress(1.0)
-        status_text.markdown("**✅ Procesamiento completado**")
-        
-        # Summary message
-        st.markdown(f"""
-        <div class="success-message">
-            🎉 <strong>Análisis completado exitosamente</strong><br>
-            <small>
-                📊 {processed_count} gráficos generados • 
-                ⏭️ {skipped_count} tablas omitidas • 
-                💾 Sesión guardada automáticamente
-            </small>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        return True
-        
+        status_text.empty()
     except Exception as e:
-        st.error(f"❌ Error durante el procesamiento: {e}")
-        # Clean up
-        if os.path.exists(temp_db_path):
-            os.unlink(temp_db_path)
+        st.error(f"❌ Error durante la comparación: {e}")
         return False
+    finally:
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+    
+    if not charts_data:
+        st.error("❌ Los archivos no tienen tablas graficables en común")
+        return False
+    
+    st.session_state.current_session_id = None
+    return finalize_analysis(filename, file_size, content_hash, charts_data, len(charts_data), left_out)
+
+def finalize_analysis(filename: str, file_size: int, content_hash: str, charts_data,
+                      processed_count: int, skipped_count: int) -> bool:
+    """Store analysis results in the UI state and save the session"""
+    # Update session state
+    st.session_state.charts_generated = charts_data
+    st.session_state.charts_key = content_hash
+    st.session_state.processing_status = "completed"
+    
+    # Save session automatically
+    session_data = {
+        'filename': filename,
+        'file_size': file_size,
+        'content_hash': content_hash,
+        'charts_generated': charts_data
+    }
+    
+    # Use custom session name if provided; the charts are written in the background
+    custom_name = getattr(st.session_state, 'custom_session_name', None)
+    session_id = st.session_state.session_manager.save_session_async(session_data, custom_name)
+    if session_id:
+        st.session_state.current_session_id = session_id
+        st.success(f"💾 Guardando sesión en segundo plano (ID: {session_id[:8]}...)")
+    
+    # Clean up the custom name
+    if hasattr(st.session_state, 'custom_session_name'):
+        delattr(st.session_state, 'custom_session_name')
+    
+    # Summary message
+    st.markdown(f"""
+    <div class="success-message">
+        🎉 <strong>Análisis completado exitosamente</strong><br>
+        <small>
+            📊 {processed_count} gráficos generados • 
+            ⏭️ {skipped_count} tablas omitidas • 
+            💾 Sesión guardada automáticamente
+        </small>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    return True
 
 def render_new_analysis():
     """Render new analysis workflow"""
@@ -852,13 +1127,26 @@ def render_new_analysis():
             if st.button("🆕 Iniciar Nuevo Análisis", use_container_width=True, type="primary"):
                 # Clear current session
                 st.session_state.charts_generated = []
+                st.session_state.charts_key = None
                 st.session_state.processing_status = "ready"
                 st.session_state.uploaded_file = None
                 st.session_state.current_session_id = None
                 st.rerun()
     
+    # Analyses started before a browser refresh keep running in the background
+    render_detached_jobs()
+    
+    comparison_mode = st.radio(
+        "Modo de análisis",
+        ["📄 Archivo único", "🔀 Comparar casos"],
+        horizontal=True,
+        key="analysis_mode"
+    ) == "🔀 Comparar casos"
+    if comparison_mode:
+        render_comparison_analysis()
+    
     # File upload
-    file_uploaded = render_file_upload()
+    file_uploaded = not comparison_mode and render_file_upload()
     
     # Processing
     if file_uploaded and st.session_state.processing_status == "ready":
@@ -878,6 +1166,7 @@ def render_new_analysis():
             <ul style="margin: 0.5rem 0; color: #ffffff;">
                 <li>✅ Archivo SQLite cargado correctamente</li>
                 <li>📊 Se analizarán todas las tablas con columnas ValueX/ValueY</li>
+                <li>🧮 Tablas .HA1S (ID, Order, Mag): un espectro por barra, rama o fuente</li>
                 <li>⚡ Optimización automática para datasets grandes</li>
                 <li>💾 La sesión se guardará automáticamente</li>
             </ul>
@@ -907,14 +1196,24 @@ def render_new_analysis():
                 st.session_state.custom_session_name = session_name if session_name.strip() else None
                 success = process_database(st.session_state.uploaded_file)
                 if success:
-                    st.session_state.processing_status = "completed"
-                    st.session_state.view_mode = "view_session"
+                    if not st.session_state.active_job_id:
+                        st.session_state.view_mode = "view_session"
                     st.rerun()
                 else:
                     st.session_state.processing_status = "ready"
+    
+    # Background analysis progress, cancel and resume
+    render_analysis_job()
 
 def render_session_view():
     """Render current session view with optimized chart display"""
+    # While a background analysis runs, the view shows its partial results
+    job = get_active_job()
+    if job is not None:
+        render_analysis_job()
+        st.session_state.charts_generated = job.get_partial_charts()
+        st.session_state.charts_key = f"{job.job_id}:partial"
+    
     if not st.session_state.charts_generated:
         st.warning("📊 No hay gráficos en la sesión actual. Inicia un nuevo análisis.")
         return
@@ -923,19 +1222,28 @@ def render_session_view():
     
     # Session info
     if st.session_state.current_session_id:
+        session_id = st.session_state.current_session_id
+        if st.session_state.session_manager.persistence_worker.is_pending(session_id):
+            save_label = "⏳ <strong>Guardando sesión en segundo plano:</strong>"
+        else:
+            save_label = "💾 <strong>Sesión guardada:</strong>"
         st.markdown(f"""
         <div class="success-message">
-            💾 <strong>Sesión guardada:</strong> ID {st.session_state.current_session_id[:8]}...
+            {save_label} ID {session_id[:8]}...
         </div>
         """, unsafe_allow_html=True)
     
     # Chart statistics
-    st.session_state.chart_viewer.render_chart_statistics(st.session_state.charts_generated)
+    st.session_state.chart_viewer.render_chart_statistics(
+        st.session_state.charts_generated, st.session_state.charts_key
+    )
     
     st.markdown("---")
     
     # Optimized chart viewer
-    st.session_state.chart_viewer.render_charts_overview(st.session_state.charts_generated)
+    st.session_state.chart_viewer.render_charts_overview(
+        st.session_state.charts_generated, st.session_state.charts_key
+    )
     
     # Report generation
     st.markdown("---")
@@ -945,7 +1253,7 @@ def render_session_list():
     """Render list of saved sessions with compact cards and favorites pinned on top"""
     st.markdown("### 📚 Historial de Sesiones")
     
-    sessions = st.session_state.session_manager.get_sessions()
+    sessions = load_session_list(st.session_state.session_manager.get_store_version())
     
     if not sessions:
         st.info("📝 No hay sesiones guardadas aún. Realiza tu primer análisis para comenzar.")
@@ -994,7 +1302,7 @@ def render_session_list():
     regular_sessions = [s for s in filtered_sessions if not s['is_favorite']]
     
     # Display session statistics with modern design
-    stats = st.session_state.session_manager.get_session_stats()
+    stats = load_session_stats(st.session_state.session_manager.get_store_version())
     
     # Enhanced stats bar with new CSS classes
     stats_html = f"""
@@ -1146,6 +1454,13 @@ def render_single_session_card(session, is_favorites_section):
         # Date
         st.markdown(f"<div style='color: #6b7280; font-size: 0.75rem; margin-bottom: 0.5rem;'>🕐 {formatted_date}</div>", unsafe_allow_html=True)
         
+        # Background persistence status
+        if session.get('status') == 'pending':
+            st.markdown("<div style='color: #fbbf24; font-size: 0.75rem; margin-bottom: 0.5rem;'>⏳ Guardando en segundo plano...</div>", unsafe_allow_html=True)
+        elif session.get('status') == 'failed':
+            reason = f": {html.escape(session['failure_reason'])}" if session.get('failure_reason') else ""
+            st.markdown(f"<div style='color: #f87171; font-size: 0.75rem; margin-bottom: 0.5rem;'>⚠️ Error al guardar los gráficos de esta sesión{reason}</div>", unsafe_allow_html=True)
+        
         st.markdown('</div>', unsafe_allow_html=True)
     
     # Action buttons below the card
@@ -1162,6 +1477,7 @@ def render_session_actions(session):
             session_data = st.session_state.session_manager.load_session(session['id'])
             if session_data:
                 st.session_state.charts_generated = session_data['charts_generated']
+                st.session_state.charts_key = session_data.get('content_hash') or session['id']
                 st.session_state.current_session_id = session['id']
                 st.session_state.view_mode = "view_session"
                 st.rerun()
@@ -1181,13 +1497,11 @@ def render_session_actions(session):
     
     with col4:
         if st.button("📋", key=f"duplicate_{session['id']}", help="Duplicar", use_container_width=True):
-            session_data = st.session_state.session_manager.load_session(session['id'])
-            if session_data:
-                duplicate_name = f"{session['session_name']} - Copia"
-                new_id = st.session_state.session_manager.save_session(session_data, duplicate_name)
-                if new_id:
-                    st.success("✅ Sesión duplicada")
-                    st.rerun()
+            duplicate_name = f"{session['session_name']} - Copia"
+            new_id = st.session_state.session_manager.duplicate_session(session['id'], duplicate_name)
+            if new_id:
+                st.success("✅ Sesión duplicada")
+                st.rerun()
     
     with col5:
         if st.button("🗑️", key=f"delete_{session['id']}", help="Eliminar", use_container_width=True, type="secondary"):
@@ -1366,7 +1680,7 @@ def render_report_generation():
     # Create a preview chart with the selected theme
     if st.session_state.charts_generated:
         preview_chart = st.session_state.charts_generated[0]['figure']
-        preview_chart_copy = preview_chart
+        preview_chart_copy = ChartGenerator.copy_figure(preview_chart)
         
         # Apply the selected theme to the preview
         preview_chart_copy.update_layout(
@@ -1726,7 +2040,7 @@ def generate_html_report(report_name: str, background_color: str = "#ffffff", us
         st.error(f"❌ Error generando el reporte: {e}")
         return False
 
-def main():
+def render_app():
     """Main application with improved navigation and session management"""
     initialize_session_state()
     render_header()
@@ -1773,5 +2087,14 @@ def main():
     </div>
     """, unsafe_allow_html=True)
 
+def main():
+    """Run the application and record how long the whole script run took"""
+    run_start = time.perf_counter()
+    try:
+        render_app()
+    finally:
+        # st.rerun() and st.stop() end a run by raising; those runs are timed too
+        get_render_timer().record("app", time.perf_counter() - run_start)
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,30 @@
+import sqlite3
+import numpy as np
+from long_format_adapter import get_long_format_adapter
+
+def source_table(fundamentals):
+    """In-memory source tabulation: one 3-order spectrum per (ID, FundA) row group"""
+    connection = sqlite3.connect(":memory:")
+    connection.execute('CREATE TABLE HASourceTabulationFund ("ID" TEXT, "FundA" REAL, "Order" REAL, "Mag" REAL)')
+    rows = [(element, fundamental, order, 10.0 * index + order)
+            for index, (element, fundamental) in enumerate(fundamentals) for order in (1, 5, 7)]
+    connection.executemany('INSERT INTO HASourceTabulationFund VALUES (?, ?, ?, ?)', rows)
+    return connection
+
+def read_series(fundamentals):
+    connection = source_table(fundamentals)
+    adapter = get_long_format_adapter(["ID", "FundA", "Order", "Mag"])
+    return adapter.read_series(connection, "HASourceTabulationFund")
+
+def test_series_sharing_an_id_get_fundamental_labels():
+    series = read_series([("UPS-1", 519.79), ("UPS-1", 12.5), ("UPS-2", 519.79)])
+    assert [label for label, _, _ in series] == ["UPS-1 [12.50 A]", "UPS-1 [519.79 A]", "UPS-2"]
+
+def test_fundamentals_equal_to_two_decimals_stay_separate_series():
+    series = read_series([("UPS-1", 519.791), ("UPS-1", 519.794)])
+    labels = [label for label, _, _ in series]
+    assert len(series) == 2
+    assert len(set(labels)) == 2
+    for _, orders, magnitudes in series:
+        np.testing.assert_array_equal(orders, [1, 5, 7])
+        assert magnitudes.size == 3
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from resonance import find_resonances
+
+def reference_prominence(trace: np.ndarray, peak: int) -> float:
+    """Brute-force prominence: lowest sample on each side before a strictly higher one, higher base wins"""
+    height = trace[peak]
+    left = peak
+    while left > 0 and trace[left - 1] <= height:
+        left -= 1
+    right = peak
+    while right < trace.size - 1 and trace[right + 1] <= height:
+        right += 1
+    return height - max(trace[left:peak + 1].min(), trace[peak:right + 1].min())
+
+def check_against_reference(traces):
+    ids = np.concatenate([np.full(len(trace), index) for index, trace in enumerate(traces)])
+    magnitudes = np.concatenate([np.asarray(trace, dtype=float) for trace in traces])
+    starts = np.cumsum([0] + [len(trace) for trace in traces])
+    result = find_resonances(ids, np.arange(ids.size, dtype=float), magnitudes)
+    for row, segment, prominence in zip(result['rows'], result['segment'], result['prominence']):
+        trace = np.asarray(traces[segment], dtype=float)
+        assert prominence == pytest.approx(reference_prominence(trace, row - starts[segment]))
+    return result
+
+@pytest.mark.parametrize("trace, height, expected", [
+    ([0, 5, 1, 3, 2, 10, 0], 10, 10),
+    ([0, 10, 1, 6, 5, 6.5, 0], 6.5, 5.5)
+])
+def test_prominence_of_known_traces(trace, height, expected):
+    result = check_against_reference([trace])
+    assert result['prominence'][result['magnitude'] == height][0] == pytest.approx(expected)
+
+def test_prominence_matches_brute_force_on_random_scans():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        traces = [rng.integers(0, 12, rng.integers(3, 40)).astype(float) for _ in range(rng.integers(1, 6))]
+        check_against_reference(traces)
@@ -0,0 +1,56 @@
+import sqlite3
+import plotly.graph_objects as go
+from session_manager import SessionManager, read_retention_policy
+
+def small_session(index: int):
+    """Session data whose stored charts take far less than one database page"""
+    figure = go.Figure(go.Scatter(x=[0, 1], y=[index, index + 1]), layout_template=None)
+    return {
+        'filename': f'case_{index}.hfpdb',
+        'file_size': 1024,
+        'content_hash': f'hash_{index}',
+        'charts_generated': [{'table_name': 'Tabla', 'figure': figure, 'type': 'line', 'info': {}}]
+    }
+
+def used_bytes(db_path) -> int:
+    connection = sqlite3.connect(db_path)
+    page_size, page_count, freelist = (connection.execute(f"PRAGMA {pragma}").fetchone()[0]
+                                       for pragma in ("page_size", "page_count", "freelist_count"))
+    connection.close()
+    return (page_count - freelist) * page_size
+
+def test_size_budget_evicts_many_sub_page_sessions(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    manager = SessionManager(db_path)
+    for index in range(300):
+        assert manager.save_session(small_session(index), f"Sesion {index}")
+    
+    budget_bytes = used_bytes(db_path) // 2
+    manager.retention_policy['max_size_mb'] = budget_bytes / 1024 / 1024
+    report = manager.run_maintenance()
+    
+    assert used_bytes(db_path) <= budget_bytes
+    assert 0 < report['evicted'] < 300
+    assert len(manager.get_sessions()) == 300 - report['evicted']
+
+def test_size_budget_is_opt_in(tmp_path):
+    manager = SessionManager(str(tmp_path / "sessions.db"))
+    for index in range(20):
+        manager.save_session(small_session(index), f"Sesion {index}")
+    
+    assert manager.retention_policy['max_size_mb'] is None
+    assert manager.run_maintenance()['evicted'] == 0
+    assert len(manager.get_sessions()) == 20
+
+def test_retention_policy_from_settings_and_environment():
+    settings = {'max_age_days': 90, 'max_sessions': 200, 'keep_favorites': False, 'unknown': 1}
+    environ = {'HARMONIC_RETENTION_MAX_SESSIONS': '50', 'HARMONIC_RETENTION_MAX_SIZE_MB': '250.5',
+               'HARMONIC_RETENTION_MAX_AGE_DAYS': 'none', 'HARMONIC_RETENTION_VACUUM_PAGES': 'many'}
+    policy = read_retention_policy(settings, environ)
+    assert policy == {'max_age_days': None, 'max_sessions': 50, 'keep_favorites': False, 'max_size_mb': 250.5}
+
+def test_retention_policy_defaults_without_settings(tmp_path):
+    assert read_retention_policy({}, {}) == {}
+    manager = SessionManager(str(tmp_path / "sessions.db"), read_retention_policy({}, {}))
+    assert manager.retention_policy['max_size_mb'] is None
+    assert manager.retention_policy['keep_favorites'] is True
@@ -0,0 +1,111 @@
+import base64
+from typing import Optional, Tuple
+import numpy as np
+import plotly.graph_objects as go
+
+DEFAULT_COLOR = '#667eea'
+
+def minmax_decimate(x: np.ndarray, y: np.ndarray, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the min and max of each bucket so peaks survive the reduction"""
+    n = len(y)
+    if n <= max_points:
+        return x, y
+    
+    buckets = max(1, max_points // 2)
+    bucket_size = n // buckets
+    usable = buckets * bucket_size
+    blocks = y[:usable].reshape(buckets, bucket_size)
+    offsets = np.arange(buckets) * bucket_size
+    
+    # Positions of each bucket's extremes, kept in their original order
+    keep = np.concatenate([offsets + np.nanargmin(blocks, axis=1), offsets + np.nanargmax(blocks, axis=1)])
+    keep = np.unique(np.append(keep, n - 1))
+    return x[keep], y[keep]
+
+def _trace_arrays(trace) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Get numeric x/y arrays of a trace, or None when it has no plottable data"""
+    if trace.type == 'heatmap':
+        # Highest value of each column, i.e. the worst case of every harmonic order
+        try:
+            z = np.asarray(trace.z, dtype=float)
+        except (TypeError, ValueError):
+            return None
+        if z.ndim != 2 or np.isnan(z).all():
+            return None
+        y = np.fmax.reduce(z, axis=0)  # NaN only for columns without any value
+        x = np.arange(y.size, dtype=float)
+        valid = np.isfinite(y)
+        return x[valid], y[valid]
+    
+    if trace.y is None:
+        return None
+    try:
+        y = np.asarray(trace.y, dtype=float)
+    except (TypeError, ValueError):
+        return None
+    if y.size == 0:
+        return None
+    
+    try:
+        x = np.asarray(trace.x, dtype=float) if trace.x is not None else np.arange(y.size, dtype=float)
+    except (TypeError, ValueError):
+        x = np.arange(y.size, dtype=float)  # categorical axis: use the position
+    if x.size != y.size:
+        x = np.arange(y.size, dtype=float)
+    
+    valid = np.isfinite(x) & np.isfinite(y)
+    if not valid.any():
+        return None
+    return x[valid], y[valid]
+
+def _trace_color(trace) -> str:
+    line = getattr(trace, 'line', None)
+    if line is not None and isinstance(line.color, str):
+        return line.color
+    marker = getattr(trace, 'marker', None)
+    if marker is not None and isinstance(marker.color, str):
+        return marker.color
+    return DEFAULT_COLOR
+
+def figure_to_sparkline_svg(figure: go.Figure, width: int = 240, height: int = 90,
+                            max_points: int = 160) -> str:
+    """Draw a small static SVG of the figure's first trace from decimated data"""
+    pad = 4
+    svg_open = (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                f'viewBox="0 0 {width} {height}">'
+                f'<rect width="{width}" height="{height}" rx="6" fill="#f8f9fa" stroke="#dfe6e9"/>')
+    
+    trace = figure.data[0] if figure.data else None
+    arrays = _trace_arrays(trace) if trace is not None else None
+    if arrays is None:
+        return svg_open + '</svg>'
+    
+    x, y = minmax_decimate(*arrays, max_points)
+    is_bar = trace.type in ('bar', 'heatmap')
+    
+    # Scale to the drawing area; bars grow from zero when it is in range
+    x_min, x_max = float(x.min()), float(x.max())
+    y_min, y_max = float(y.min()), float(y.max())
+    if is_bar:
+        y_min, y_max = min(y_min, 0.0), max(y_max, 0.0)
+    x_span = (x_max - x_min) or 1.0
+    y_span = (y_max - y_min) or 1.0
+    px = pad + (x - x_min) / x_span * (width - 2 * pad)
+    py = height - pad - (y - y_min) / y_span * (height - 2 * pad)
+    
+    color = _trace_color(trace)
+    if is_bar:
+        baseline = height - pad - (0.0 - y_min) / y_span * (height - 2 * pad)
+        bar_width = max(1.0, min(6.0, (width - 2 * pad) / max(len(px), 1) * 0.6))
+        path = ''.join(f'M{a:.1f} {baseline:.1f}V{b:.1f}' for a, b in zip(px, py))
+        shape = f'<path d="{path}" stroke="{color}" stroke-width="{bar_width:.1f}" fill="none"/>'
+    else:
+        points = ' '.join(f'{a:.1f},{b:.1f}' for a, b in zip(px, py))
+        shape = (f'<polyline points="{points}" fill="none" stroke="{color}" '
+                 f'stroke-width="1.2" stroke-linejoin="round"/>')
+    
+    return svg_open + shape + '</svg>'
+
+def svg_data_uri(svg: str) -> str:
+    """Encode an SVG document as a data URI for <img> tags"""
+    return "data:image/svg+xml;base64," + base64.b64encode(svg.encode('utf-8')).decode('ascii')
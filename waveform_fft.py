@@ -0,0 +1,74 @@
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+def resample_uniform(t: np.ndarray, y: np.ndarray, tolerance: float = 1e-6) -> Tuple[np.ndarray, float]:
+    """Get the samples of a sorted waveform on a uniform time grid and its sample spacing"""
+    steps = np.diff(t)
+    step = (t[-1] - t[0]) / (t.size - 1)
+    if np.abs(steps - step).max() <= tolerance * abs(step):
+        return y, step
+    
+    # Same number of points over the same span, linearly interpolated
+    grid = np.linspace(t[0], t[-1], t.size)
+    return np.interp(grid, t, y), step
+
+def compute_waveform_spectra(waveforms: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                             fundamental_frequency: Optional[float] = None, max_order: int = 50,
+                             min_relative_amplitude: float = 1e-2) -> Dict[str, Dict[str, np.ndarray]]:
+    """Compute the Hz and harmonic order spectra of several waveforms, one FFT per group of same-length waveforms"""
+    # Waveforms sharing length and sample spacing share their frequency bins
+    groups = defaultdict(list)
+    samples = {}
+    for name, (t, y) in waveforms.items():
+        if t.size < 8:
+            continue
+        uniform, step = resample_uniform(t, y)
+        if step <= 0:
+            continue
+        samples[name] = uniform
+        groups[(t.size, float(np.float32(step)))].append(name)
+    
+    spectra = {}
+    for (size, step), names in groups.items():
+        # One 2-D rfft for the whole group; peak amplitudes of each bin (DC and Nyquist are not doubled)
+        matrix = np.stack([samples[name] for name in names])
+        amplitudes = np.abs(np.fft.rfft(matrix, axis=1)) / size
+        amplitudes[:, 1:(size + 1) // 2] *= 2
+        frequencies = np.fft.rfftfreq(size, step)
+        resolution = frequencies[1]
+        
+        # Each waveform's strongest component is its fundamental; the system frequency replaces it only when both
+        # fall in the same bin, so a waveform recorded at another frequency still gets its own orders
+        peaks = 1 + np.argmax(amplitudes[:, 1:], axis=1)
+        fundamentals = frequencies[peaks]
+        if fundamental_frequency:
+            close = peaks == np.rint(fundamental_frequency / resolution)
+            fundamentals = np.where(close, float(fundamental_frequency), fundamentals)
+        
+        for row, name in enumerate(names):
+            spectra[name] = _split_spectrum(frequencies, amplitudes[row], fundamentals[row], resolution,
+                                            max_order, min_relative_amplitude)
+    return spectra
+
+def _split_spectrum(frequencies: np.ndarray, amplitudes: np.ndarray, fundamental: float, resolution: float,
+                    max_order: int, min_relative_amplitude: float) -> Dict[str, np.ndarray]:
+    """Hz bins and harmonic order amplitudes of one waveform's spectrum"""
+    top = min(frequencies[-1], fundamental * (max_order + 0.5))
+    in_range = (frequencies > 0) & (frequencies <= top)
+    # Only bins that carry energy; a bar per FFT bin would bury the harmonics
+    significant = in_range & (amplitudes >= min_relative_amplitude * amplitudes[in_range].max(initial=0.0))
+    
+    # Harmonic h sits on bin h·f1/Δf; with several bins per cycle the leakage neighbours are included
+    orders = np.arange(1, int(top // fundamental) + 1, dtype=float)
+    centers = np.rint(orders * fundamental / resolution).astype(int)
+    spread = 1 if fundamental / resolution >= 4 else 0
+    neighbours = np.clip(centers[:, None] + np.arange(-spread, spread + 1), 0, amplitudes.size - 1)
+    
+    return {
+        'hz': frequencies[significant],
+        'hz_amplitude': amplitudes[significant],
+        'orders': orders,
+        'order_amplitude': amplitudes[neighbours].max(axis=1),
+        'fundamental': fundamental
+    }